@@ -5,6 +5,7 @@ from flask import Flask
 from dotenv import load_dotenv
 
 from app import main
+from app.database import migrate_renames
 
 logging.basicConfig(format="%(asctime)s - %(message)s", level=logging.DEBUG)
 
@@ -14,6 +15,8 @@ load_dotenv()
 def create_app(test_config=None):
     app = Flask(__name__, instance_relative_config=True)
     app.secret_key = os.environ["APP_SECRET_KEY"]
+    # Run the pushes in the request instead of in the background (for the tests).
+    app.config["PUSH_JOBS_SYNC"] = False
 
     try:
         os.makedirs(app.instance_path)
@@ -21,5 +24,6 @@ def create_app(test_config=None):
         pass
 
     app.register_blueprint(main.bp)
+    app.cli.add_command(migrate_renames)
 
     return app
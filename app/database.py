@@ -1,8 +1,192 @@
 import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Protocol, Tuple, Union
 
+import click
 from pysondb import PysonDB
 from dotenv import load_dotenv
 
+from bourso2ynab.ledger import ImportLedger
+
 load_dotenv()
 
 db = PysonDB(os.environ["DB_FILEPATH"])
+
+# Optional: the import IDs already pushed to YNAB, so that they aren't sent again.
+ledger = (
+    ImportLedger(os.environ["LEDGER_FILEPATH"])
+    if os.environ.get("LEDGER_FILEPATH")
+    else None
+)
+
+
+class PayeeRenameStore(Protocol):
+    """Where the payee renames of the app (`original → adjusted`) are stored: see
+    `SqlitePayeeRenames` and `PayeeRenames` (PysonDB)."""
+
+    def get(self, original: str) -> Optional[str]: ...
+
+    def set_many(self, renames: Mapping[str, str]): ...
+
+
+class SqlitePayeeRenames:
+    """Payee renames stored in SQLite, indexed by original payee. Unlike PysonDB,
+    which rewrites its whole file for every change, a write only touches the rows
+    it changes. The database is in WAL mode, so that the gunicorn workers can keep
+    reading while one of them writes. Within a worker, the threads share a single
+    connection, used under a lock."""
+
+    def __init__(self, filepath: Union[str, Path] = ":memory:", timeout: float = 5.0):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        # `timeout`: how long a write waits for the one of another worker.
+        self._connection = sqlite3.connect(
+            str(filepath), timeout=timeout, check_same_thread=False
+        )
+        with self._lock, self._connection:
+            if str(filepath) != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                # Safe in WAL mode: a crash can only lose the last transactions.
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS payee_renames ("
+                " original TEXT NOT NULL PRIMARY KEY,"
+                " adjusted TEXT NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    def get(self, original: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT adjusted FROM payee_renames WHERE original = ?", [original]
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, original: str, adjusted: str):
+        self.set_many({original: adjusted})
+
+    def set_many(self, renames: Mapping[str, str]):
+        """Adds or updates the renames, in a single transaction."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO payee_renames (original, adjusted) VALUES (?, ?)"
+                " ON CONFLICT (original) DO UPDATE SET adjusted = excluded.adjusted",
+                renames.items(),
+            )
+
+    def items(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(
+                self._connection.execute("SELECT original, adjusted FROM payee_renames")
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> "SqlitePayeeRenames":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PayeeRenames:
+    """An `original → adjusted` index of the payee renames stored in `db`, so that
+    renaming a payee is a dict lookup instead of a scan of the whole file (which
+    PysonDB reads again for every query). It is loaded once, kept up to date by
+    `set_many`, and loaded again when the file is changed by someone else (e.g.
+    another gunicorn worker)."""
+
+    def __init__(self, db: PysonDB):
+        self.db = db
+        self._lock = threading.Lock()
+        # original -> (ID of the entry, adjusted). The first entry of a payee wins.
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        self._version = None
+
+    def get(self, original: str) -> Optional[str]:
+        with self._lock:
+            entry = self._load().get(original)
+        return entry[1] if entry is not None else None
+
+    def set(self, original: str, adjusted: str):
+        self.set_many({original: adjusted})
+
+    def set_many(self, renames: Mapping[str, str]):
+        """Adds or updates the entries, in the DB and in the index. PysonDB has no
+        transactions: each of them rewrites the whole file."""
+        with self._lock:
+            entries = self._load()
+            for original, adjusted in renames.items():
+                entry = entries.get(original)
+                if entry is None:
+                    key = self.db.add({"original": original, "adjusted": adjusted})
+                else:
+                    key = entry[0]
+                    self.db.update_by_id(key, {"adjusted": adjusted})
+                entries[original] = (key, adjusted)
+            self._version = self._stat()
+
+    def _load(self) -> Dict[str, Tuple[str, str]]:
+        version = self._stat()
+        if version != self._version:
+            entries = {}
+            for key, data in self.db.get_all().items():
+                entries.setdefault(data["original"], (key, data["adjusted"]))
+            self._entries = entries
+            self._version = version
+        return self._entries
+
+    def _stat(self) -> Tuple[int, int, int]:
+        stat = os.stat(self.db.filename)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+_payee_renames: Dict[str, PayeeRenames] = {}
+_payee_renames_lock = threading.Lock()
+
+
+def get_payee_renames(db: PysonDB) -> PayeeRenames:
+    """Returns the index of the process for the file of `db`."""
+    filename = os.path.abspath(db.filename)
+    with _payee_renames_lock:
+        payee_renames = _payee_renames.get(filename)
+        if payee_renames is None:
+            payee_renames = _payee_renames[filename] = PayeeRenames(db)
+    return payee_renames
+
+
+def migrate_from_pysondb(
+    db_filepath: Union[str, Path], store: PayeeRenameStore
+) -> Dict[str, str]:
+    """Copies the renames of a PysonDB file (the `db.json` of the app) to `store`.
+    When a payee has several entries, the first one wins, like in the app.
+    Returns the renames that were copied."""
+    renames = {}
+    for entry in PysonDB(str(db_filepath)).get_all().values():
+        renames.setdefault(entry["original"], entry["adjusted"])
+    store.set_many(renames)
+    return renames
+
+
+@click.command("migrate-renames")
+@click.argument("db_filepath", type=click.Path(exists=True, dir_okay=False))
+@click.argument("sqlite_filepath", type=click.Path(dir_okay=False))
+def migrate_renames(db_filepath: str, sqlite_filepath: str):
+    """Copies the payee renames of DB_FILEPATH (the PysonDB file of the app) to the
+    SQLite file SQLITE_FILEPATH, which can then be used with RENAMES_FILEPATH."""
+    with SqlitePayeeRenames(sqlite_filepath) as store:
+        renames = migrate_from_pysondb(db_filepath, store)
+    print(f"Copied {len(renames)} payee renames to {sqlite_filepath}.")
+
+
+# Optional: the payee renames are stored in SQLite instead of `db` (see the
+# `migrate-renames` command of the app to copy them over).
+renames = (
+    SqlitePayeeRenames(os.environ["RENAMES_FILEPATH"])
+    if os.environ.get("RENAMES_FILEPATH")
+    else None
+)
@@ -0,0 +1,160 @@
+import json
+import uuid
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Literal, Optional, Union
+
+from loguru import logger
+
+JobStatus = Literal["pending", "running", "done", "failed"]
+
+
+@dataclass
+class Job:
+    id: str
+    status: JobStatus = "pending"
+    # What the job returned, once it's done.
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "results": self.results,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """The status of the jobs, stored in SQLite so that it can be polled from any
+    gunicorn worker (and survives their restarts), not only from the one that runs
+    the job. Within a worker, the threads share a single connection, used under a
+    lock."""
+
+    def __init__(self, filepath: Union[str, Path] = ":memory:"):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(filepath), timeout=5.0, check_same_thread=False
+        )
+        with self._lock, self._connection:
+            if str(filepath) != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " rank INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " id TEXT NOT NULL UNIQUE,"
+                " status TEXT NOT NULL,"
+                " results TEXT NOT NULL,"
+                " error TEXT"
+                ")"
+            )
+
+    def save(self, job: Job, max_jobs: Optional[int] = None):
+        """Adds or updates `job`. If `max_jobs` is given, only the last `max_jobs`
+        jobs are kept."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO jobs (id, status, results, error) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET status = excluded.status,"
+                " results = excluded.results, error = excluded.error",
+                [job.id, job.status, json.dumps(job.results), job.error],
+            )
+            if max_jobs is not None:
+                self._connection.execute(
+                    "DELETE FROM jobs WHERE rank <= (SELECT MAX(rank) FROM jobs) - ?",
+                    [max_jobs],
+                )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, results, error FROM jobs WHERE id = ?", [job_id]
+            ).fetchone()
+        if row is None:
+            return None
+        status, results, error = row
+        return Job(id=job_id, status=status, results=json.loads(results), error=error)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class JobQueue:
+    """Runs jobs (e.g. pushes to YNAB) on a pool of `max_workers` threads, so that
+    the requests that start them return right away. Their status can then be
+    polled with their ID. Only the last `max_jobs` jobs are kept.
+
+    Without a `store`, the status of the jobs is only kept in the memory of the
+    process: it can't be polled from another gunicorn worker."""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_jobs: int = 100,
+        store: Optional[JobStore] = None,
+    ):
+        self.max_jobs = max_jobs
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = OrderedDict()
+
+    def submit(
+        self, func: Callable[..., List[Dict[str, Any]]], *args, sync: bool = False
+    ) -> Job:
+        """Queues `func(*args)`, whose return value becomes the results of the job.
+        If `sync`, the job is run right away instead (e.g. for tests)."""
+        job = Job(id=uuid.uuid4().hex)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._save(job)
+
+        if sync:
+            self._run(job, func, *args)
+        else:
+            self._executor.submit(self._run, job, func, *args)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            # E.g. started by another worker.
+            job = self.store.get(job_id)
+        return job
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: Job, func: Callable[..., List[Dict[str, Any]]], *args):
+        job.status = "running"
+        self._save(job)
+        try:
+            job.results = func(*args)
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed")
+            job.error = repr(e)
+            job.status = "failed"
+        else:
+            job.status = "done"
+        self._save(job)
+
+    def _save(self, job: Job):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job, max_jobs=self.max_jobs)
+        except sqlite3.Error:
+            # The job still runs, and can still be polled from this worker.
+            logger.exception(f"Couldn't save the status of job {job.id}")
@@ -1,23 +1,100 @@
-from typing import List
+import os
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from copy import deepcopy
 
 from loguru import logger
 from werkzeug.datastructures import ImmutableMultiDict
-from flask import Blueprint, render_template, request, session
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    jsonify,
+    render_template,
+    request,
+    session,
+)
 
-from app.database import db
+from app.jobs import JobQueue, JobStore
+from app.database import (
+    PayeeRenameStore,
+    db,
+    get_payee_renames,
+    ledger,
+    renames,
+)
 
 from bourso2ynab.ynab import (
     get_all_available_usernames,
     get_all_available_account_types,
     get_ynab_id,
 )
-from bourso2ynab.ynab import push_to_ynab as _push_to_ynab
-from bourso2ynab.io import read_bourso_transactions
-from bourso2ynab.transaction import Transaction, transactions_to_html
+from bourso2ynab.ynab import (
+    MAX_CONCURRENT_REQUESTS,
+    NOTHING_TO_PUSH,
+    get_api_client,
+    push_succeeded,
+    send_to_ynab,
+    sync_from_ynab,
+)
+from bourso2ynab.dates import DateRange
+from bourso2ynab.io import ReadStats
+from bourso2ynab.ledger import DEFAULT_GRACE_DAYS, ImportLedger
+from bourso2ynab.pipeline import (
+    Pipeline,
+    dedupe_stage,
+    filter_stage,
+    parse_stage,
+    push_stage,
+    read_stage,
+    rename_stage,
+)
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.transaction import RowError, Transaction, transactions_to_html
 
 bp = Blueprint("main", __name__, url_prefix="/")
 
+GRACE_DAYS = int(os.environ.get("WATERMARK_GRACE_DAYS", DEFAULT_GRACE_DAYS))
+# Number of pushes (see `jobs`) that run at the same time.
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", 4))
+# Number of accounts (of a joint account) that a push sends to at the same time.
+MAX_CONCURRENT_PUSHES = int(os.environ.get("MAX_CONCURRENT_PUSHES", 4))
+# Whether the import IDs already in YNAB are fetched before pushing.
+DELTA_SYNC = bool(os.environ.get("YNAB_DELTA_SYNC"))
+# The pushes that run in the background (see `push_to_ynab`). Their status is
+# shared between the gunicorn workers if it is stored in a SQLite file.
+jobs = JobQueue(
+    max_workers=MAX_CONCURRENT_JOBS,
+    store=(
+        JobStore(os.environ["JOBS_FILEPATH"])
+        if os.environ.get("JOBS_FILEPATH")
+        else None
+    ),
+)
+
+
+def _get_api_client():
+    """The client shared by the pushes of the process. Each job pushes to
+    `MAX_CONCURRENT_PUSHES` accounts at a time, each with up to
+    `MAX_CONCURRENT_REQUESTS` requests: it keeps a connection for each of them."""
+    return get_api_client(
+        pool_maxsize=MAX_CONCURRENT_JOBS
+        * MAX_CONCURRENT_PUSHES
+        * MAX_CONCURRENT_REQUESTS
+    )
+
+
+def _push_to_ynab(transactions, account_id: str, budget_id: str):
+    """Every push goes through the app's ledger (if one is configured)."""
+    return send_to_ynab(
+        transactions,
+        account_id,
+        budget_id,
+        ledger=ledger,
+        api_client=_get_api_client(),
+    )
+
 
 @bp.route("/", methods=["GET"])
 def main():
@@ -35,12 +112,31 @@ def upload_csv():
     for key in ["username", "account-type"]:
         session[key] = request.form[key]
 
-    # Reading and saving the content of the csv file.
+    # Reading and saving the content of the csv file. The rows that were already
+    # pushed to all the accounts (see `_get_skip_range`) aren't even parsed.
     csv_file = request.files["transactions-file"]
-    df = read_bourso_transactions(filepath=csv_file.stream)
-    transactions = [Transaction.from_pandas(row) for _, row in df.iterrows()]
+    skip = _get_skip_range(session["username"], session["account-type"])
+    stats = ReadStats()
+    pipeline = Pipeline(
+        [
+            read_stage(csv_file.stream, skip=skip, stats=stats),
+            parse_stage(on_error=_log_row_errors),
+        ]
+    )
+    transactions = [t for batch in pipeline.run() for t in batch]
+    logger.debug(f"Read the file:\n{pipeline.report()}")
+    if stats.skipped:
+        logger.info(
+            f"Skipped {stats.skipped} rows operated within {skip}: already pushed."
+        )
     transactions = sorted(transactions, key=lambda x: x.date)
     session["transactions"] = transactions
+    # The range of dates that the file covers (see `_record_pushed_range`).
+    session["date-ops"] = (
+        [stats.oldest_date_op.isoformat(), stats.latest_date_op.isoformat()]
+        if stats.oldest_date_op is not None
+        else None
+    )
 
     transactions_to_display = _update_transactions_based_on_db(transactions)
     html_table = transactions_to_html(
@@ -62,25 +158,142 @@ def push_to_ynab():
 
     # Retrieving YNAB credentials.
     account_type = session["account-type"]
-    usernames = [session["username"]]
-    if account_type == "joint":
-        usernames = get_all_available_usernames()
+    usernames = _get_usernames(session["username"], account_type)
 
+    accounts = []
     for username in usernames:
         kwargs = {"username": username, "account_type": account_type}
         account_id = get_ynab_id(id_type="account", **kwargs)
         budget_id = get_ynab_id(id_type="budget", **kwargs)
+        accounts.append((username, account_id, budget_id))
+
+    # The push runs in the background, so that the request (and the worker that
+    # serves it) isn't blocked by YNAB. Its status is then polled by the page.
+    logger.debug(f"Pushing transactions to YNAB")
+    logger.debug(f"{account_type=}")
+    logger.debug(f"{updated_transactions=}")
+    job = jobs.submit(
+        _push_to_accounts,
+        updated_transactions,
+        accounts,
+        session.get("date-ops"),
+        sync=current_app.config["PUSH_JOBS_SYNC"],
+    )
+
+    return render_template("confirmation.html", job=job)
+
+
+@bp.route("/ynab/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
+def _push_to_accounts(
+    transactions: List[Transaction],
+    accounts: List[Tuple[str, str, str]],
+    date_ops: Optional[List[str]],
+) -> List[Dict]:
+    """Pushes `transactions` to each (username, account ID, budget ID). The pushes
+    to the accounts of a joint account are independent: they are sent at the same
+    time. Returns the result of each user."""
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PUSHES) as executor:
+        all_results = list(
+            executor.map(
+                lambda account: _push_to_account(transactions, *account), accounts
+            )
+        )
+
+    results = []
+    for (username, account_id, budget_id), account_results in zip(
+        accounts, all_results
+    ):
+        ok = all(map(push_succeeded, account_results))
+        if ok:
+            _record_pushed_range(account_id, budget_id, date_ops)
+        result = account_results[-1] if account_results else NOTHING_TO_PUSH
+        results.append({"username": username, "result": str(result), "ok": ok})
+    return results
+
+
+def _push_to_account(
+    transactions: List[Transaction], username: str, account_id: str, budget_id: str
+) -> List:
+    """Pushes `transactions` to the account of `username`. Returns the result of
+    each push (see `push_stage`)."""
+    known_import_ids = ledger
+    if DELTA_SYNC:
+        # Without a ledger, the import IDs fetched from YNAB are only kept for
+        # this push.
+        known_import_ids = ledger or ImportLedger()
+        sync_from_ynab(
+            known_import_ids, account_id, budget_id, api_client=_get_api_client()
+        )
+
+    pipeline = Pipeline(
+        [
+            dedupe_stage(),
+            filter_stage(known_import_ids, budget_id=budget_id, account_id=account_id),
+            push_stage(account_id, budget_id, push=_push_to_ynab),
+        ]
+    )
+    results = list(pipeline.run([transactions]))
 
-        logger.debug(f"Pushing transactions to YNAB")
-        logger.debug(f"{username=}")
-        logger.debug(f"{account_type=}")
-        logger.debug(f"{updated_transactions=}")
-        result = _push_to_ynab(updated_transactions, account_id, budget_id)
+    logger.debug(f"Transactions pushed.")
+    logger.debug(f"{username=}")
+    logger.debug(f"{results=}")
+    logger.debug(f"Pushed the transactions:\n{pipeline.report()}")
+    return results
 
-        logger.debug(f"Transactions pushed.")
-        logger.debug(f"{result=}")
 
-    return render_template("confirmation.html", result=result)
+def _log_row_errors(errors: List[RowError]):
+    for row_error in errors:
+        logger.warning(f"Skipping row {row_error.index}: {row_error.error!r}")
+
+
+def _get_usernames(username: str, account_type: str) -> List[str]:
+    # Joint accounts impact all users.
+    if account_type == "joint":
+        return get_all_available_usernames()
+    return [username]
+
+
+def _get_skip_range(username: str, account_type: str) -> Optional[DateRange]:
+    """The operation dates whose rows don't have to be read from uploaded files (see
+    `ImportLedger.get_skip_range`): the ones that were pushed to all the accounts
+    to push to."""
+    if ledger is None:
+        return None
+
+    skip_ranges = []
+    for username in _get_usernames(username, account_type):
+        kwargs = {"username": username, "account_type": account_type}
+        account_id = get_ynab_id(id_type="account", **kwargs)
+        budget_id = get_ynab_id(id_type="budget", **kwargs)
+        skip_ranges.append(
+            ledger.get_skip_range(budget_id, account_id, grace_days=GRACE_DAYS)
+        )
+
+    if not skip_ranges or None in skip_ranges:
+        return None
+    start = max(skip_range.start for skip_range in skip_ranges)
+    end = min(skip_range.end for skip_range in skip_ranges)
+    return DateRange(start, end) if end > start else None
+
+
+def _record_pushed_range(
+    account_id: str, budget_id: str, date_ops: Optional[List[str]]
+):
+    if ledger is None or date_ops is None:
+        return
+    oldest, newest = map(date.fromisoformat, date_ops)
+    # Transactions dated in the future aren't pushed: the range can't end later
+    # than today.
+    newest = min(newest, date.today())
+    if oldest <= newest:
+        ledger.record_pushed_range(oldest, newest, budget_id, account_id)
 
 
 def _get_transactions_from_session() -> List[Transaction]:
@@ -112,6 +325,8 @@ def _update_transactions_based_on_form(
 def _update_db_based_on_transactions_changes(
     transactions: List[Transaction], updated_transactions: List[Transaction]
 ):
+    payee_renames = _get_payee_renames()
+    changes = {}
     for old, new in zip(transactions, updated_transactions):
         if old.payee == "":
             # We don't want to update the DB based on an empty field.
@@ -120,30 +335,31 @@ def _update_db_based_on_transactions_changes(
             continue
 
         if old.payee != new.payee:
-            existing_entries = db.get_by_query(
-                lambda data: data["original"] == old.payee
-            )
-            if not existing_entries:
+            if payee_renames.get(old.payee) is None:
                 logger.info(
                     f"Adding a new entry in the DB: {old.payee} --> {new.payee}"
                 )
-                db.add({"original": old.payee, "adjusted": new.payee})
             else:
                 logger.info(f"Updating an entry in the DB: {old.payee} --> {new.payee}")
-                key = list(existing_entries.keys())[0]
-                db.update_by_id(key, {"adjusted": new.payee})
+            changes[old.payee] = new.payee
 
+    # Written at once: a single transaction with SQLite.
+    if changes:
+        payee_renames.set_many(changes)
 
-def _update_transactions_based_on_db(transactions: List[Transaction]):
-    updated_transactions = deepcopy(transactions)
 
-    for i, transaction in enumerate(updated_transactions):
-        entries = db.get_by_query(lambda data: data["original"] == transaction.payee)
-        if not entries:
-            continue
+def _update_transactions_based_on_db(
+    transactions: List[Transaction],
+) -> TransactionBatch:
+    # The updated transactions are only displayed, so a batch is enough (and much
+    # cheaper than a deep copy).
+    pipeline = Pipeline([rename_stage(_get_adjusted_payee)])
+    return next(pipeline.run([transactions]))
 
-        key = list(entries.keys())[0]
-        entry = db.get_by_id(key)
-        updated_transactions[i].payee = entry["adjusted"]
 
-    return updated_transactions
+def _get_adjusted_payee(payee: str) -> Optional[str]:
+    return _get_payee_renames().get(payee)
+
+
+def _get_payee_renames() -> PayeeRenameStore:
+    return renames if renames is not None else get_payee_renames(db)
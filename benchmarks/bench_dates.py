@@ -0,0 +1,65 @@
+"""Compares the per-row cost of parsing the dates of an export with `strptime` (or
+`pd.to_datetime` for whole columns) and with `bourso2ynab.dates`.
+
+Usage: python -m benchmarks.bench_dates
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.common import best_of
+from bourso2ynab.dates import (
+    ISO_FORMAT,
+    LABEL_FORMAT,
+    parse_date_column,
+    parse_iso_date,
+    parse_label_date,
+)
+
+N_ROWS = 100_000
+# About 10 transactions per day, like in `benchmarks.common.make_bourso_csv`.
+N_DAYS = N_ROWS // 10
+
+
+def main():
+    rng = random.Random(0)
+    days = [
+        date(2023, 11, 14) - timedelta(days=rng.randrange(N_DAYS))
+        for _ in range(N_ROWS)
+    ]
+    columns = {
+        "iso": [d.strftime(ISO_FORMAT) for d in days],
+        "label": [d.strftime(LABEL_FORMAT) for d in days],
+    }
+
+    print(f"{N_ROWS:,} rows, {N_DAYS:,} distinct dates")
+    print(f"{'':<30} {'strptime (ns/row)':>18} {'dates (ns/row)':>16}")
+    for kind, _format, parse in [
+        ("iso", ISO_FORMAT, parse_iso_date),
+        ("label", LABEL_FORMAT, parse_label_date),
+    ]:
+        values = columns[kind]
+        before = best_of(
+            lambda: [datetime.strptime(v, _format).date() for v in values], repeat=3
+        )
+        after = best_of(lambda: [parse(v) for v in values], repeat=3)
+        print(
+            f"{'per row, ' + kind:<30} {before / N_ROWS * 1e9:>18.0f} "
+            f"{after / N_ROWS * 1e9:>16.0f}"
+        )
+
+        series = pd.Series(values, dtype=object)
+        before = best_of(
+            lambda: pd.to_datetime(series, format=_format).dt.date.tolist(), repeat=3
+        )
+        after = best_of(lambda: parse_date_column(values, kind=kind), repeat=3)
+        print(
+            f"{'column, ' + kind + ' (vs pandas)':<30} {before / N_ROWS * 1e9:>18.0f} "
+            f"{after / N_ROWS * 1e9:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compares `make_import_ids_unique` with its original implementation (which reads
+`import_id` for every comparison) at 100k transactions.
+
+Usage: python -m benchmarks.bench_import_ids
+"""
+
+import random
+from datetime import date, timedelta
+
+from benchmarks.common import best_of
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.transaction import Transaction, make_import_ids_unique
+from tests.support.import_ids import original_make_import_ids_unique
+
+N_ROWS = 100_000
+
+
+def main():
+    rng = random.Random(0)
+    # About 10 transactions per day, with many duplicated amounts.
+    transactions = [
+        Transaction(
+            type="CARTE",
+            date=date(2023, 11, 14) - timedelta(days=i // 10),
+            amount=-rng.randint(1, 2_000) / 100,
+        )
+        for i in range(N_ROWS)
+    ]
+    batch = TransactionBatch.from_transactions(transactions)
+
+    results = {
+        "original": lambda: original_make_import_ids_unique(transactions),
+        "single pass": lambda: make_import_ids_unique(transactions),
+        "single pass, keep_order": lambda: make_import_ids_unique(
+            transactions, keep_order=True
+        ),
+        "TransactionBatch": lambda: make_import_ids_unique(batch),
+    }
+
+    print(f"{N_ROWS:,} transactions")
+    for name, func in results.items():
+        print(f"{name:<25} {best_of(func, repeat=3) * 1e3:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
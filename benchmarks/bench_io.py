@@ -0,0 +1,48 @@
+"""Compares the "pandas" and "csv" engines of `bourso2ynab.io`.
+
+Usage: python -m benchmarks.bench_io [--rows 100000]
+"""
+
+import sys
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from benchmarks.common import best_of, make_bourso_csv
+from bourso2ynab.io import ENGINES, parse_bourso_transactions
+
+COLD_START_SCRIPT = (
+    "from bourso2ynab.io import parse_bourso_transactions; "
+    "parse_bourso_transactions({filepath!r}, engine={engine!r})"
+)
+
+
+def cold_start(filepath: Path, engine: str) -> float:
+    """Time to import bourso2ynab and parse `filepath` in a fresh interpreter."""
+    script = COLD_START_SCRIPT.format(filepath=str(filepath), engine=engine)
+    return best_of(
+        lambda: subprocess.run([sys.executable, "-c", script], check=True), repeat=3
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        small_filepath = make_bourso_csv(Path(dirpath) / "small.csv", n_rows=10)
+        filepath = make_bourso_csv(Path(dirpath) / "large.csv", n_rows=args.rows)
+
+        print(f"{'engine':<8} {'cold start (s)':>15} {'rows/s':>12}")
+        for engine in ENGINES:
+            startup = cold_start(small_filepath, engine)
+            duration = best_of(
+                lambda: parse_bourso_transactions(filepath, engine=engine), repeat=3
+            )
+            print(f"{engine:<8} {startup:>15.3f} {args.rows / duration:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
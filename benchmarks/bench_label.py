@@ -0,0 +1,50 @@
+"""Compares `parse_label` with the `TRANSACTION_LABEL_PROG` regex, on regular labels
+and on pathological ones that make the regex backtrack. `match_label` uses the regex
+up to `MAX_REGEX_LABEL_LENGTH` characters and `parse_label` above it.
+
+Usage: python -m benchmarks.bench_label
+"""
+
+from benchmarks.common import best_of
+from bourso2ynab.label import TRANSACTION_LABEL_PROG, match_label, parse_label
+
+REGULAR_LABELS = [
+    "CARTE 09/06/22 SNCF INTERNET CB*5537",
+    "CARTE 01/01/70 RELAY 340356SC 4 CB*0000",
+    "CARTE 01/01/70 PAYPAL *ROMAIN.S CB*0000",
+    "VIR Virement de Monsieur MACHIN",
+    "PRLV SEPA Bouygues Telecom",
+]
+
+
+def pathological_labels(n: int):
+    return {
+        f"digits then letters (n={n})": "CARTE " + "1" * n + "a" * n + "12",
+        f"numbered words (n={n})": "CARTE 01/01/70 " + "1 " * n + "\n",
+        f"mixed words (n={n})": "VIR " + "A1 " * n + "B\nC",
+    }
+
+
+def main():
+    print(f"{'label':<45} {'regex (µs)':>12} {'parser (µs)':>12} {'match (µs)':>12}")
+    labels = {label: label for label in REGULAR_LABELS}
+    for n in [10, 100, 1_000, 4_000]:
+        labels.update(pathological_labels(n))
+
+    for name, label in labels.items():
+        # The regex can take seconds on pathological labels: they're only run once.
+        repeat = 1_000 if label in REGULAR_LABELS else 1
+        regex = best_of(
+            lambda: [TRANSACTION_LABEL_PROG.match(label) for _ in range(repeat)],
+            repeat=5 if label in REGULAR_LABELS else 1,
+        )
+        parser = best_of(lambda: [parse_label(label) for _ in range(repeat)])
+        match = best_of(lambda: [match_label(label) for _ in range(repeat)])
+        print(
+            f"{name:<45} {regex / repeat * 1e6:>12.1f} {parser / repeat * 1e6:>12.1f}"
+            f" {match / repeat * 1e6:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
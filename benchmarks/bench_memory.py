@@ -0,0 +1,56 @@
+"""Compares the memory used by 100k parsed transactions, held as `Transaction`s,
+`CompactTransaction`s or a `TransactionBatch`.
+
+Usage: python -m benchmarks.bench_memory
+"""
+
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.common import make_bourso_csv
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.io import parse_bourso_transactions
+
+N_ROWS = 100_000
+
+
+def measure(func) -> float:
+    """Returns the memory still allocated by the result of `func`, in MiB."""
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 2**20
+
+
+def main():
+    with tempfile.TemporaryDirectory() as dirpath:
+        filepath = make_bourso_csv(Path(dirpath) / "export.csv", N_ROWS)
+        parse = lambda compact: parse_bourso_transactions(
+            filepath, engine="csv", compact=compact
+        )[0]
+        transactions = parse(compact=False)
+        compact_transactions = parse(compact=True)
+
+        # Only the containers are measured: the strings are shared by all three.
+        results = {
+            "Transaction": measure(
+                lambda: [t.copy_with_new_index(t.index) for t in transactions]
+            ),
+            "CompactTransaction": measure(
+                lambda: [t.copy_with_new_index(t.index) for t in compact_transactions]
+            ),
+            "TransactionBatch": measure(
+                lambda: TransactionBatch.from_transactions(transactions)
+            ),
+        }
+
+    print(f"{N_ROWS:,} transactions")
+    for name, mib in results.items():
+        print(f"{name:<20} {mib:>8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compares the bodies of the bulk-create requests built with the `SaveTransaction`
+models of `ynab_api` and the ones built by `bourso2ynab.payload`, at 20k
+transactions. The bodies encoded with `json` are checked to be the same, byte for
+byte (the ones encoded with `orjson` are the same JSON, but more compact).
+
+Usage: python -m benchmarks.bench_serialize
+"""
+
+import json
+import random
+from datetime import date, timedelta
+
+from ynab_api import ApiClient
+from ynab_api.model.save_transaction import SaveTransaction
+from ynab_api.model.save_transactions_wrapper import SaveTransactionsWrapper
+
+from benchmarks.common import LABELS, best_of
+from bourso2ynab import payload
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.transaction import Transaction
+
+N_ROWS = 20_000
+ACCOUNT_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+
+
+def model_body(transactions) -> bytes:
+    """What `TransactionsApi.create_transaction` sends."""
+    wrapper = SaveTransactionsWrapper(
+        transactions=[
+            SaveTransaction(
+                account_id=ACCOUNT_ID,
+                date=transaction.date,
+                amount=transaction.milliunits,
+                payee_name=transaction.payee,
+                memo=transaction.memo,
+                approved=True,
+                cleared="uncleared",
+                import_id=transaction.import_id,
+            )
+            for transaction in transactions
+        ]
+    )
+    return json.dumps(ApiClient.sanitize_for_serialization(wrapper)).encode("utf-8")
+
+
+def main():
+    rng = random.Random(0)
+    transactions = [
+        Transaction(
+            type="CARTE",
+            date=date(2023, 11, 14) - timedelta(days=i // 10),
+            amount=-rng.randint(1, 200_000) / 100,
+            payee=rng.choice(LABELS).split(" {date} ")[-1],
+            memo=rng.choice([None, "Memo"]),
+        )
+        for i in range(N_ROWS)
+    ]
+    batch = TransactionBatch.from_transactions(transactions)
+
+    json_body = lambda t: payload._json_dumps(
+        payload.transactions_payload(t, ACCOUNT_ID)
+    )
+    assert json_body(transactions) == json_body(batch) == model_body(transactions)
+
+    results = {
+        "SaveTransaction models": lambda: model_body(transactions),
+        "payload, json": lambda: json_body(transactions),
+        "payload, json, batch": lambda: json_body(batch),
+    }
+    if payload.orjson is not None:
+        results["payload, orjson"] = lambda: payload.serialize_transactions(
+            transactions, ACCOUNT_ID
+        )
+        results["payload, orjson, batch"] = lambda: payload.serialize_transactions(
+            batch, ACCOUNT_ID
+        )
+    else:
+        print("orjson isn't installed: only the json encoder is measured.")
+
+    print(f"{N_ROWS:,} transactions")
+    for name, func in results.items():
+        print(f"{name:<25} {best_of(func, repeat=3) * 1e3:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Measures the cold start of the CLI (`push --help`) and of a gunicorn worker
+(importing `app` and calling `create_app()`), each in a fresh interpreter. Also
+lists the slowest modules reported by `python -X importtime`, and the heavy
+dependencies that were imported although they aren't needed yet.
+
+Usage: python -m benchmarks.bench_startup [--repeat 10]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Only needed once a file is parsed with pandas, or pushed to YNAB.
+HEAVY_MODULES = ["pandas", "numpy", "ynab_api", "urllib3"]
+
+SCENARIOS = {
+    "CLI: push --help": (
+        "import sys\n"
+        "sys.argv = ['push', '--help']\n"
+        "from bourso2ynab.cli import push\n"
+        "push(standalone_mode=False)\n"
+    ),
+    # What gunicorn does with "app:create_app()".
+    "app: worker boot": "from app import create_app\ncreate_app()\n",
+}
+
+REPORT_HEAVY_MODULES = (
+    "\nimport sys\n"
+    "print('HEAVY', *[m for m in {modules!r} if m in sys.modules], file=sys.stderr)\n"
+)
+
+
+def run(code: str, env: Dict[str, str], importtime: bool = False) -> Tuple[float, str]:
+    """Runs `code` in a fresh interpreter. Returns its wall time and its stderr."""
+    args = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    start = time.perf_counter()
+    result = subprocess.run(
+        args + ["-c", code], env=env, capture_output=True, text=True, check=True
+    )
+    return time.perf_counter() - start, result.stderr
+
+
+def slowest_imports(stderr: str, n: int = 8) -> List[Tuple[int, str]]:
+    """The modules that took the longest to import, not counting their own
+    imports (self time, in µs)."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, _, name = line[len("import time:") :].split("|")
+        imports.append((int(self_time), name.strip()))
+    return sorted(imports, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        env = {
+            **os.environ,
+            "DB_FILEPATH": str(Path(dirpath) / "db.json"),
+            "APP_SECRET_KEY": "bench",
+            "PYTHONPATH": str(Path(__file__).parent.parent),
+        }
+        baseline = statistics.median(run("pass", env)[0] for _ in range(args.repeat))
+        print(f"Empty interpreter: {baseline * 1e3:.0f} ms")
+
+        for name, code in SCENARIOS.items():
+            timings = [run(code, env)[0] for _ in range(args.repeat)]
+            _, stderr = run(
+                code + REPORT_HEAVY_MODULES.format(modules=HEAVY_MODULES),
+                env,
+                importtime=True,
+            )
+            heavy = stderr.splitlines()[-1].split()[1:]
+
+            print(
+                f"\n{name}: {statistics.median(timings) * 1e3:.0f} ms "
+                f"(median of {args.repeat}, interpreter included)"
+            )
+            print(f"  Heavy modules imported: {', '.join(heavy) or 'none'}")
+            for self_time, module in slowest_imports(stderr):
+                print(f"  {module:<30} {self_time / 1e3:>6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
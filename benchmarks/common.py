@@ -0,0 +1,53 @@
+import time
+import random
+from pathlib import Path
+from typing import Callable, Union
+
+RESOURCES_DIRPATH = Path(__file__).parent.parent / "tests" / "resources"
+HEADER = (
+    "dateOp;dateVal;label;category;categoryParent;amount;comment;"
+    "accountNum;accountLabel;accountbalance"
+)
+LABELS = [
+    "CARTE {date} VELIB METROPOLE 2 CB*0000",
+    "CARTE {date} RATP CB*0000",
+    "CARTE {date} FRANPRIX 5196 CB*0000",
+    "CARTE {date} PAYPAL *ROMAIN.S CB*0000",
+    "CARTE {date} RELAY 340356SC 4 CB*0000",
+    "CARTE {date} ZTL*NM BURGER OPS CB*0000",
+    "PRLV SEPA Bouygues Telecom",
+    "VIR Virement de Monsieur Fromage",
+    "VIR INST ALAN SA",
+    "VIR Loyer",
+]
+
+
+def make_bourso_csv(filepath: Union[str, Path], n_rows: int, seed: int = 0) -> Path:
+    """Writes a synthetic Bourso export of `n_rows` rows, sorted newest-first like
+    the real ones, and spanning about 10 rows per day."""
+    rng = random.Random(seed)
+    lines = [HEADER]
+    for i in range(n_rows):
+        day = time.gmtime(1_700_000_000 - (i // 10) * 86_400)
+        date_op = time.strftime("%Y-%m-%d", day)
+        label_date = time.strftime("%d/%m/%y", day)
+        label = rng.choice(LABELS).format(date=label_date)
+        amount = f"-{rng.randint(1, 200_000) / 100:.2f}".replace(".", ",")
+        lines.append(
+            f'{date_op};{date_op};"{label}";"Category";"Parent";{amount};;0;'
+            '"BOURSORAMA BANQUE";0'
+        )
+
+    filepath = Path(filepath)
+    filepath.write_text("\n".join(lines), encoding="utf-8")
+    return filepath
+
+
+def best_of(func: Callable, repeat: int = 5) -> float:
+    """Returns the best wall time of `repeat` calls to `func`, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,33 @@
+"""Serves the fake YNAB API of `tests/support/fake_ynab.py` on its own, with optional
+latency, 429s and duplicates.
+
+Usage: python -m benchmarks.fake_ynab [--port 8000] [--latency 0.2] [--error-rate 0.1]
+Then point the CLI or the app to it with YNAB_API_HOST=http://127.0.0.1:8000
+"""
+
+import argparse
+
+from tests.support.fake_ynab import FakeYnab
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeYnab(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        duplicate_rate=args.duplicate_rate,
+        retry_after=args.retry_after,
+    )
+    print(f"Fake YNAB API on http://127.0.0.1:{args.port}")
+    fake.create_app().run(port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Load test of the pushes against the local YNAB stand-in (see
+`tests/support/fake_ynab.py`), with latency, 429s and duplicates injected: the CLI
+pushes a synthetic export, then the Flask push route pushes to a joint account.
+
+Usage: python -m benchmarks.load_test [--rows 5000] [--latency 0.05] [--error-rate 0.05]
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import make_bourso_csv
+from tests.support.fake_ynab import FakeYnab, FakeYnabServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=5_000)
+    # The transactions of the app are stored in the session cookie.
+    parser.add_argument("--app-rows", type=int, default=20)
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    fake = FakeYnab(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        duplicate_rate=args.duplicate_rate,
+    )
+    with FakeYnabServer(fake) as server, tempfile.TemporaryDirectory() as dirpath:
+        # Read when bourso2ynab and the app are imported.
+        os.environ.update(
+            {
+                "YNAB_API_HOST": server.url,
+                "YNAB_API_KEY": "load-test",
+                "YNAB_REQUESTS_PER_HOUR": str(1_000_000),
+                "DB_FILEPATH": str(Path(dirpath) / "db.json"),
+                "APP_SECRET_KEY": "load-test",
+            }
+        )
+        os.chdir(dirpath)
+
+        print(f"Fake YNAB API on {server.url}")
+        run_cli(Path(dirpath), args.rows, args.chunk_size)
+        run_app(Path(dirpath), args.app_rows, args.users)
+        print(f"Requests: {dict(fake.requests)}, 429s: {fake.throttled}")
+
+
+def run_cli(dirpath: Path, n_rows: int, chunk_size: int):
+    from click.testing import CliRunner
+
+    from bourso2ynab.cli import push
+
+    filepath = make_bourso_csv(dirpath / "export.csv", n_rows)
+    args = [str(filepath), "--budget-id", "budget", "--account-id", "account"]
+    args += ["--chunk-size", str(chunk_size), "--timings"]
+
+    start = time.perf_counter()
+    result = CliRunner().invoke(push, args)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nCLI: {n_rows:,} rows in {elapsed:.2f}s (exit code {result.exit_code})")
+    print(result.output)
+
+
+def run_app(dirpath: Path, n_rows: int, n_users: int):
+    usernames = [f"user{i}" for i in range(n_users)]
+    secrets = {
+        "budgets": {username: f"budget-{username}" for username in usernames},
+        "accounts": {
+            username: {"joint": f"joint-{username}"} for username in usernames
+        },
+    }
+    (dirpath / "secrets.json").write_text(json.dumps(secrets))
+
+    from loguru import logger
+
+    from app import create_app
+    from bourso2ynab.io import parse_bourso_transactions
+
+    logger.disable("app")
+
+    transactions, _ = parse_bourso_transactions(
+        make_bourso_csv(dirpath / "app.csv", n_rows, seed=1), engine="csv"
+    )
+    app = create_app()
+    # The route is timed until the pushes are over.
+    app.config["PUSH_JOBS_SYNC"] = True
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["transactions"] = transactions
+        session["username"] = usernames[0]
+        session["account-type"] = "joint"
+    form = {}
+    for i, transaction in enumerate(transactions):
+        form[f"payee-input-text-{i}"] = transaction.payee
+        form[f"memo-input-text-{i}"] = transaction.memo or ""
+
+    start = time.perf_counter()
+    response = client.post("/ynab/push", data=form)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"App: {n_rows:,} rows to {n_users} users in {elapsed:.2f}s "
+        f"(status {response.status_code})"
+    )
+
+
+if __name__ == "__main__":
+    main()
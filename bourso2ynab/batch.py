@@ -0,0 +1,250 @@
+import sys
+from array import array
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from bourso2ynab.transaction import CompactTransaction, Transaction, TransactionType
+
+# Transaction types are stored as small integer codes. 0 stands for None.
+TYPE_CODES: List[Optional[TransactionType]] = [None, "VIR", "CARTE", "RETRAIT", "PRLV"]
+_TYPE_TO_CODE: Dict[Optional[str], int] = {t: code for code, t in enumerate(TYPE_CODES)}
+
+# Ordinals start at 1 (0001-01-01), so 0 can stand for a missing date.
+_MISSING_DATE = 0
+# Transactions can be created without an amount.
+_MISSING_AMOUNT = -(2**63)
+
+
+class TransactionBatch:
+    """A list of transactions stored column by column: dates as int32 ordinals,
+    amounts as int64 milliunits, types as small codes and interned payees and memos.
+    This is much lighter than a list of `Transaction`s, and it can be copied,
+    sorted and filtered without creating an object per transaction.
+
+    Indexing or iterating over a batch gives `TransactionView`s, which behave like
+    `Transaction`s, so that a batch can be used wherever a list of transactions is
+    expected (e.g. `make_import_ids_unique` or `push_to_ynab`)."""
+
+    def __init__(self):
+        self.dates = array("i")
+        self.amounts = array("q")
+        self.types = array("b")
+        self.indices = array("i")
+        self.payees: List[Optional[str]] = []
+        self.memos: List[Optional[str]] = []
+
+    @staticmethod
+    def from_transactions(transactions: Iterable[Transaction]) -> "TransactionBatch":
+        batch = TransactionBatch()
+        batch.extend(transactions)
+        return batch
+
+    def append(self, transaction: Union[Transaction, CompactTransaction]):
+        self.dates.append(
+            transaction.date.toordinal()
+            if transaction.date is not None
+            else _MISSING_DATE
+        )
+        self.amounts.append(
+            transaction.milliunits
+            if transaction.amount is not None
+            else _MISSING_AMOUNT
+        )
+        self.types.append(_TYPE_TO_CODE[transaction.type])
+        self.indices.append(transaction.index)
+        self.payees.append(_intern(transaction.payee))
+        self.memos.append(_intern(transaction.memo))
+
+    def extend(self, transactions: Iterable[Transaction]):
+        for transaction in transactions:
+            self.append(transaction)
+
+    def take(self, positions: Iterable[int]) -> "TransactionBatch":
+        """Returns a new batch made of the transactions at `positions`, in order."""
+        positions = list(positions)
+        batch = TransactionBatch()
+        batch.dates = array("i", [self.dates[i] for i in positions])
+        batch.amounts = array("q", [self.amounts[i] for i in positions])
+        batch.types = array("b", [self.types[i] for i in positions])
+        batch.indices = array("i", [self.indices[i] for i in positions])
+        batch.payees = [self.payees[i] for i in positions]
+        batch.memos = [self.memos[i] for i in positions]
+        return batch
+
+    def copy(self) -> "TransactionBatch":
+        # The strings are immutable, so they can be shared.
+        batch = TransactionBatch()
+        batch.dates = array("i", self.dates)
+        batch.amounts = array("q", self.amounts)
+        batch.types = array("b", self.types)
+        batch.indices = array("i", self.indices)
+        batch.payees = list(self.payees)
+        batch.memos = list(self.memos)
+        return batch
+
+    def to_transactions(self) -> List[Transaction]:
+        return [view.to_transaction() for view in self]
+
+    def import_ids(self) -> List[str]:
+        """Same as `[t.import_id for t in batch]`, without going through the views.
+        Each distinct date is only formatted once."""
+        formatted_dates: Dict[int, str] = {}
+        import_ids = []
+        for ordinal, amount, index in zip(self.dates, self.amounts, self.indices):
+            formatted_date = formatted_dates.get(ordinal)
+            if formatted_date is None:
+                formatted_date = date.fromordinal(ordinal).strftime("%Y-%m-%d")
+                formatted_dates[ordinal] = formatted_date
+            import_ids.append(f"YNAB:{amount}:{formatted_date}:{index}")
+        return import_ids
+
+    def make_import_ids_unique(self, keep_order: bool = False) -> "TransactionBatch":
+        """Same as `bourso2ynab.transaction.make_import_ids_unique`."""
+        import_ids = self.import_ids()
+        positions = range(len(self))
+        if not keep_order:
+            positions = sorted(positions, key=import_ids.__getitem__)
+        batch = self.take(positions)
+
+        occurrences = {}
+        for i, position in enumerate(positions):
+            import_id = import_ids[position]
+            occurrence = occurrences[import_id] = occurrences.get(import_id, 0) + 1
+            if occurrence > 1:
+                batch.indices[i] += occurrence - 1
+        return batch
+
+    def remove_future_transactions(self) -> "TransactionBatch":
+        """Same as `bourso2ynab.transaction.remove_future_transactions`."""
+        today = datetime.today().date().toordinal()
+        return self.take(i for i, ordinal in enumerate(self.dates) if ordinal <= today)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(
+        self, position: Union[int, slice]
+    ) -> Union["TransactionView", "TransactionBatch"]:
+        if isinstance(position, slice):
+            return self.take(range(*position.indices(len(self))))
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("TransactionBatch index out of range")
+        return TransactionView(self, position)
+
+    def __iter__(self) -> Iterator["TransactionView"]:
+        for position in range(len(self)):
+            yield TransactionView(self, position)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TransactionBatch):
+            return (
+                self.dates == other.dates
+                and self.amounts == other.amounts
+                and self.types == other.types
+                and self.indices == other.indices
+                and self.payees == other.payees
+                and self.memos == other.memos
+            )
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and all(
+                view == transaction for view, transaction in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TransactionBatch({self.to_transactions()!r})"
+
+
+class TransactionView:
+    """A row of a `TransactionBatch`, with the same attributes and methods as a
+    `Transaction`. Setting `payee` or `memo` modifies the batch."""
+
+    __slots__ = ("batch", "position")
+
+    def __init__(self, batch: TransactionBatch, position: int):
+        self.batch = batch
+        self.position = position
+
+    @property
+    def type(self) -> Optional[TransactionType]:
+        return TYPE_CODES[self.batch.types[self.position]]
+
+    @property
+    def date(self) -> Optional[date]:
+        ordinal = self.batch.dates[self.position]
+        return date.fromordinal(ordinal) if ordinal != _MISSING_DATE else None
+
+    @property
+    def milliunits(self) -> Optional[int]:
+        amount = self.batch.amounts[self.position]
+        return amount if amount != _MISSING_AMOUNT else None
+
+    @property
+    def amount(self) -> Optional[float]:
+        milliunits = self.milliunits
+        return milliunits / 1_000 if milliunits is not None else None
+
+    @property
+    def index(self) -> int:
+        return self.batch.indices[self.position]
+
+    @property
+    def payee(self) -> Optional[str]:
+        return self.batch.payees[self.position]
+
+    @payee.setter
+    def payee(self, payee: Optional[str]):
+        self.batch.payees[self.position] = _intern(payee)
+
+    @property
+    def memo(self) -> Optional[str]:
+        return self.batch.memos[self.position]
+
+    @memo.setter
+    def memo(self, memo: Optional[str]):
+        self.batch.memos[self.position] = _intern(memo)
+
+    @property
+    def import_id(self) -> str:
+        return (
+            f"YNAB:{self.batch.amounts[self.position]}:"
+            f"{self.date:%Y-%m-%d}:{self.index}"
+        )
+
+    def to_transaction(self) -> Transaction:
+        return Transaction(
+            type=self.type,
+            date=self.date,
+            amount=self.amount,
+            payee=self.payee,
+            memo=self.memo,
+            index=self.index,
+        )
+
+    def copy_with_new_index(self, new_index: int) -> Transaction:
+        return self.to_transaction().copy_with_new_index(new_index)
+
+    def to_html(self, *args, **kwargs) -> str:
+        # `Transaction.to_html` only reads the attributes that views also have.
+        return Transaction.to_html(self, *args, **kwargs)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Transaction, TransactionView)):
+            return (
+                self.type == other.type
+                and self.date == other.date
+                and self.amount == other.amount
+                and self.payee == other.payee
+                and self.memo == other.memo
+                and self.index == other.index
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(self.to_transaction()).replace("Transaction(", "TransactionView(")
+
+
+def _intern(string: Optional[str]) -> Optional[str]:
+    return sys.intern(string) if string is not None else None
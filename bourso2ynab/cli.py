@@ -1,15 +1,46 @@
 import os
+import functools
 from pathlib import Path
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Tuple
 
 import click
 
-from bourso2ynab.ynab import push_to_ynab
-from bourso2ynab.transaction import Transaction
-from bourso2ynab.io import read_bourso_transactions
+from bourso2ynab.ynab import (
+    NOTHING_TO_PUSH,
+    close_api_clients,
+    get_rate_limiter,
+    push_succeeded,
+    send_to_ynab,
+    sync_from_ynab,
+)
+from bourso2ynab.dates import DateRange
+from bourso2ynab.ledger import DEFAULT_GRACE_DAYS, ImportLedger
+from bourso2ynab.transaction import (
+    CompactTransaction,
+    RowError,
+    merge_overlapping_exports,
+)
+from bourso2ynab.io import (
+    ENGINES,
+    Engine,
+    ReadStats,
+    list_bourso_exports,
+    parse_bourso_exports,
+)
+from bourso2ynab.pipeline import (
+    Pipeline,
+    Stage,
+    dedupe_stage,
+    filter_stage,
+    parse_stage,
+    push_stage,
+    read_stage,
+)
 
 
 @click.command()
-@click.argument("filepath", type=click.Path(exists=True))
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
 @click.option(
     "--budget-id",
     help="Budget ID used to send the Transaction to. "
@@ -20,11 +51,101 @@ from bourso2ynab.io import read_bourso_transactions
     help="Account ID used to send the Transaction to. "
     "Can also be provided with the YNAB_BUDGET_ID environment variable.",
 )
-def push(filepath: Path, budget_id: str, account_id: str):
-    """Reads FILEPATH which contains Boursorama transactions and pushes them to a YNAB account.
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    help="If provided, the export is read, parsed and pushed by batches of "
+    "BATCH_SIZE transactions instead of all at once. "
+    "Only available with a single export.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="pandas",
+    show_default=True,
+    help="Parser used to read the exports. "
+    "'csv' doesn't depend on pandas and starts faster.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    help="Number of processes used to parse several exports. "
+    "Defaults to the number of CPUs.",
+)
+@click.option(
+    "--ledger",
+    "ledger_filepath",
+    type=click.Path(dir_okay=False),
+    help="SQLite file in which the pushed import IDs are recorded, so that they "
+    "aren't sent again. Can also be provided with the LEDGER_FILEPATH "
+    "environment variable.",
+)
+@click.option(
+    "--grace-days",
+    type=click.IntRange(min=0),
+    default=DEFAULT_GRACE_DAYS,
+    show_default=True,
+    help="With a ledger, the rows operated within the range of dates that was "
+    "already fully pushed aren't read, except for its last GRACE_DAYS days (for "
+    "the transactions whose value date settles later).",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Reads the exports entirely, even the rows that the ledger says were "
+    "already pushed.",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    help="Number of transactions sent per request to YNAB. Can also be provided "
+    "with the YNAB_CHUNK_SIZE environment variable.",
+)
+@click.option(
+    "--max-concurrent-requests",
+    type=click.IntRange(min=1),
+    help="Number of requests sent to YNAB at the same time. Can also be provided "
+    "with the YNAB_MAX_CONCURRENT_REQUESTS environment variable.",
+)
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Before pushing, fetches the import IDs of the transactions that are "
+    "already in the YNAB account, so that they aren't sent again. With a ledger, "
+    "only the transactions that changed since the last sync are fetched.",
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Prints the time spent in each step, the number of transactions that "
+    "went through it and how the requests to YNAB were scheduled.",
+)
+def push(
+    paths: Tuple[str, ...],
+    budget_id: str,
+    account_id: str,
+    batch_size: int,
+    engine: Engine,
+    workers: int,
+    ledger_filepath: Optional[str],
+    grace_days: int,
+    full: bool,
+    chunk_size: Optional[int],
+    max_concurrent_requests: Optional[int],
+    sync: bool,
+    timings: bool,
+):
+    """Reads PATHS which contain Boursorama transactions and pushes them to a YNAB account.
+    PATHS can be exports or directories of exports (*.csv) of the same account: they
+    are parsed in parallel, and the rows that appear in several of them (e.g. when
+    their periods overlap) are only pushed once.
     Note: this script does not use the database of updated payee names.
     """
-    filepath = Path(filepath)
+    filepaths = list_bourso_exports(paths)
+    if not filepaths:
+        raise click.UsageError("No export (*.csv) found in PATHS.")
+    if batch_size is not None and len(filepaths) > 1:
+        raise click.UsageError("--batch-size can only be used with a single export.")
 
     if budget_id is None:
         assert (
@@ -37,10 +158,125 @@ def push(filepath: Path, budget_id: str, account_id: str):
         ), "You need to provide an Account ID."
         account_id = os.environ["YNAB_ACCOUNT_ID"]
 
-    df = read_bourso_transactions(filepath)
-    transactions = [Transaction.from_pandas(row) for _, row in df.iterrows()]
-    result = push_to_ynab(transactions, account_id=account_id, budget_id=budget_id)
-    print(result)
+    if ledger_filepath is None:
+        ledger_filepath = os.environ.get("LEDGER_FILEPATH")
+    ledger = ImportLedger(ledger_filepath) if ledger_filepath is not None else None
+
+    try:
+        skip = None
+        if ledger is not None and not full:
+            skip = ledger.get_skip_range(budget_id, account_id, grace_days=grace_days)
+        if sync:
+            if ledger is None:
+                # Only used to filter out the transactions of this push.
+                ledger = ImportLedger()
+            fetched = sync_from_ynab(ledger, account_id, budget_id)
+            if fetched is not None:
+                print(f"Fetched {fetched} import IDs from YNAB.")
+
+        # The transactions are only pushed, never edited: compact ones are enough.
+        stats = [ReadStats() for _ in filepaths]
+        if len(filepaths) == 1:
+            source = [
+                read_stage(
+                    filepaths[0],
+                    batch_size=batch_size,
+                    engine=engine,
+                    skip=skip,
+                    stats=stats[0],
+                ),
+                parse_stage(compact=True, on_error=_print_row_errors),
+            ]
+        else:
+            source = [_read_exports_stage(filepaths, engine, workers, skip, stats)]
+        pipeline = Pipeline(
+            source
+            + [
+                dedupe_stage(),
+                filter_stage(ledger, budget_id=budget_id, account_id=account_id),
+                push_stage(
+                    account_id,
+                    budget_id,
+                    push=functools.partial(
+                        send_to_ynab,
+                        ledger=ledger,
+                        chunk_size=chunk_size,
+                        max_concurrent_requests=max_concurrent_requests,
+                    ),
+                ),
+            ]
+        )
+
+        all_pushed, pushed_any = True, False
+        for result in pipeline.run():
+            print(result)
+            all_pushed = all_pushed and push_succeeded(result)
+            pushed_any = True
+        if not pushed_any:
+            print(NOTHING_TO_PUSH)
+        if timings:
+            print(pipeline.report())
+            print(get_rate_limiter().metrics)
+
+        skipped = sum(export_stats.skipped for export_stats in stats)
+        if skipped:
+            print(
+                f"{skipped} rows operated from {skip.start} to "
+                f"{skip.end - timedelta(days=1)} were already pushed: not read "
+                "(see --full)."
+            )
+        if ledger is not None and all_pushed:
+            _record_pushed_ranges(ledger, stats, budget_id, account_id)
+    finally:
+        if ledger is not None:
+            ledger.close()
+        close_api_clients()
+
+
+def _record_pushed_ranges(
+    ledger: ImportLedger, stats: List[ReadStats], budget_id: str, account_id: str
+):
+    """Records the range of dates covered by each export, from the oldest to the
+    most recent one (see `ImportLedger.record_pushed_range`)."""
+    ranges = sorted(
+        (s.oldest_date_op, s.latest_date_op)
+        for s in stats
+        if s.oldest_date_op is not None
+    )
+    for oldest, newest in ranges:
+        # Transactions dated in the future aren't pushed: the range can't end
+        # later than today.
+        newest = min(newest, date.today())
+        if oldest <= newest:
+            ledger.record_pushed_range(oldest, newest, budget_id, account_id)
+
+
+def _read_exports_stage(
+    filepaths: List[Path],
+    engine: Engine,
+    workers: Optional[int],
+    skip: Optional[DateRange],
+    stats: List[ReadStats],
+) -> Stage:
+    """Source stage that parses all the exports in parallel and yields a single,
+    consolidated batch. `stats` is filled in with the stats of each export."""
+
+    def read(_: Iterator) -> Iterator[List[CompactTransaction]]:
+        exports = parse_bourso_exports(
+            filepaths, engine=engine, compact=True, workers=workers, skip=skip
+        )
+        for filepath, (_, errors, _) in zip(filepaths, exports):
+            _print_row_errors(errors, filepath)
+        stats[:] = [export_stats for _, _, export_stats in exports]
+        yield merge_overlapping_exports(t for t, _, _ in exports)
+
+    return Stage("read", read)
+
+
+def _print_row_errors(errors: List[RowError], filepath: Optional[Path] = None):
+    location = f" of {filepath}" if filepath is not None else ""
+    for row_error in errors:
+        print(f"Skipping row {row_error.index}{location}: {row_error.error!r}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+from typing import List, Tuple
+
+import pandas as pd
+
+from bourso2ynab.dates import parse_date_column
+from bourso2ynab.label import LABEL_GROUPS, match_label
+from bourso2ynab.transaction import (
+    InvalidBoursoTransaction,
+    RowError,
+    Transaction,
+    UnknownTransactionType,
+)
+
+
+def transactions_from_dataframe(
+    df: pd.DataFrame, format: bool = True
+) -> Tuple[List[Transaction], List[RowError]]:
+    """See `Transaction.from_dataframe`."""
+    df = populate_dates_in_dataframe(df)
+    date_vals = _get_column(df, "dateVal")
+    labels = _get_column(df, "label")
+    amounts = _get_column(df, "amount")
+
+    is_valid = date_vals.notnull() & labels.notnull() & amounts.notnull()
+    errors = [
+        RowError(index=index, error=InvalidBoursoTransaction())
+        for index in df.index[~is_valid]
+    ]
+
+    date_vals = date_vals[is_valid]
+    labels = labels[is_valid].astype(str)
+    parsed_amounts = format_amount_column(amounts[is_valid])
+    # Exports only contain a few hundred distinct dates: parsing each of them once
+    # is faster than `pd.to_datetime`, and gives the same results as `from_pandas`.
+    parsed_date_vals = parse_date_column(date_vals.tolist(), errors="coerce")
+
+    if not format:
+        columns = {
+            "type": _to_list(infer_transaction_type_column(labels)),
+            "date": parsed_date_vals,
+            "payee": labels.tolist(),
+            "memo": [None] * len(labels),
+        }
+    else:
+        columns = parse_label_column(labels)
+        label_dates = columns["date"]
+        parsed_label_dates = parse_date_column(
+            label_dates, kind="label", errors="coerce"
+        )
+        columns["date"] = [
+            parsed_label_date if label_date is not None else parsed_date_val
+            for label_date, parsed_label_date, parsed_date_val in zip(
+                label_dates, parsed_label_dates, parsed_date_vals
+            )
+        ]
+        # A date that was found in the label but couldn't be parsed is an error,
+        # just like it is in `from_label`.
+        columns["is_invalid_label_date"] = [
+            label_date is not None and parsed_label_date is None
+            for label_date, parsed_label_date in zip(label_dates, parsed_label_dates)
+        ]
+
+    transactions = []
+    rows = zip(
+        labels.index,
+        labels.tolist(),
+        date_vals.tolist(),
+        amounts[is_valid].tolist(),
+        _to_list(parsed_amounts),
+        columns["type"],
+        columns["date"],
+        columns["payee"],
+        columns["memo"],
+        columns.get("is_invalid_label_date", [False] * len(labels)),
+    )
+    for (
+        index,
+        label,
+        date_val,
+        raw_amount,
+        amount,
+        _type,
+        _date,
+        payee,
+        memo,
+        is_invalid_label_date,
+    ) in rows:
+        if amount is None:
+            error = ValueError(f"Can't parse amount: {raw_amount}")
+        elif is_invalid_label_date:
+            error = ValueError(f"Can't parse date from label: {label}")
+        elif _date is None:
+            error = ValueError(f"Can't parse dateVal: {date_val}")
+        elif not format and _type is None:
+            error = UnknownTransactionType(label)
+        else:
+            transactions.append(
+                Transaction(
+                    type=_type, date=_date, amount=amount, payee=payee, memo=memo
+                )
+            )
+            continue
+        errors.append(RowError(index=index, error=error))
+
+    errors = sorted(errors, key=lambda row_error: row_error.index)
+    return transactions, errors
+
+
+def populate_dates_in_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """Same as `populate_dates`, for every row of `df` at once."""
+    if "dateOp" in df.columns and "dateVal" in df.columns:
+        df = df.assign(
+            dateVal=df["dateVal"].where(df["dateVal"].notnull(), df["dateOp"])
+        )
+    return df
+
+
+def _get_column(df: pd.DataFrame, key: str) -> pd.Series:
+    if key in df.columns:
+        return df[key]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def _to_list(series: pd.Series) -> list:
+    """Converts `series` to a list, with None for missing values (instead of NaN/NaT)."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.date
+    series = series.astype(object)
+    return series.where(series.notnull(), None).tolist()
+
+
+def parse_label_column(labels: pd.Series) -> dict:
+    """Vectorized version of `Transaction.from_label`. Returns a dict of columns
+    (as lists) for the type, date, payee and memo of each label. Dates are kept as
+    strings."""
+    # Exports contain a lot of identical labels, so each label is only parsed once.
+    stripped_labels = labels.str.strip()
+    groups = {label: match_label(label) or {} for label in stripped_labels.unique()}
+    parsed = pd.DataFrame(list(groups.values()), columns=LABEL_GROUPS, dtype=object)
+    parsed.index = list(groups.keys())
+    parsed = parsed.reindex(stripped_labels.tolist()).set_axis(labels.index)
+    is_parsed = parsed["transaction_type"].notnull()
+    is_VIR = parsed["transaction_type"] == "VIR"
+
+    raw_payees = parsed["payee"]
+    payees = raw_payees.str.strip()
+    # See `format_payee_from_label` for the VIR specific rules.
+    is_virement_de = payees.str.startswith("Virement de ").fillna(False).astype(bool)
+    vir_payees = payees.where(~is_virement_de, payees.str.slice(12))
+    vir_payees = vir_payees.where(is_virement_de | (payees == payees.str.upper()))
+    payees = vir_payees.where(is_VIR, payees).str.title()
+
+    memos = pd.Series([None] * len(labels), index=labels.index, dtype=object)
+    memos = memos.where(~(is_VIR & payees.isnull()), raw_payees)
+    memos = memos.where(is_VIR | parsed["is_paypal"].isnull(), "(via Paypal)")
+
+    # Unparsable labels are kept as-is.
+    payees = payees.where(is_parsed, labels)
+
+    return {
+        "type": _to_list(parsed["transaction_type"]),
+        "date": _to_list(parsed["date"]),
+        "payee": _to_list(payees),
+        "memo": _to_list(memos),
+    }
+
+
+def format_amount_column(amounts: pd.Series) -> pd.Series:
+    """Vectorized version of `format_amount`. Unparsable amounts are set to NaN."""
+    if pd.api.types.is_numeric_dtype(amounts):
+        return amounts.astype(float)
+
+    amounts = amounts.astype(str)
+    amounts = amounts.str.replace(",", ".", regex=False)
+    amounts = amounts.str.replace(" ", "", regex=False)
+    return pd.to_numeric(amounts, errors="coerce")
+
+
+def infer_transaction_type_column(labels: pd.Series) -> pd.Series:
+    """Vectorized version of `infer_transaction_type`. Unknown types are set to NaN."""
+    types = labels.str.strip().str.lower().str.extract(r"^(vir|carte|retrait) ")[0]
+    return types.str.upper()
@@ -0,0 +1,81 @@
+import functools
+from datetime import date, datetime
+from typing import Iterable, List, Literal, NamedTuple, Optional
+
+ISO_FORMAT = "%Y-%m-%d"  # `dateOp` and `dateVal` fields, e.g. "2022-06-09"
+LABEL_FORMAT = "%d/%m/%y"  # Dates found in labels, e.g. "09/06/22"
+
+DateKind = Literal["iso", "label"]
+
+
+class DateRange(NamedTuple):
+    """The dates from `start` (included) to `end` (excluded)."""
+
+    start: date
+    end: date
+
+    def includes(self, day: date) -> bool:
+        return self.start <= day < self.end
+
+
+def parse_iso_date(value: str) -> date:
+    """Same as `datetime.strptime(value, ISO_FORMAT).date()`, with a fast path for
+    zero-padded dates, which is what Bourso exports contain."""
+    if (
+        len(value) == 10
+        and value[4] == value[7] == "-"
+        and _is_ascii_number(value[:4] + value[5:7] + value[8:])
+    ):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass  # Let `strptime` raise its usual error.
+    return datetime.strptime(value, ISO_FORMAT).date()
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_label_date(value: str) -> date:
+    """Same as `datetime.strptime(value, LABEL_FORMAT).date()`. An export only
+    contains a few hundred distinct dates, so the results are memoized."""
+    if (
+        len(value) == 8
+        and value[2] == value[5] == "/"
+        and _is_ascii_number(value[:2] + value[3:5] + value[6:])
+    ):
+        day, month, year = int(value[:2]), int(value[3:5]), int(value[6:])
+        # Same pivot as `%y`: 69-99 are 1969-1999 and 00-68 are 2000-2068.
+        year += 1900 if year >= 69 else 2000
+        try:
+            return date(year, month, day)
+        except ValueError:
+            pass
+    return datetime.strptime(value, LABEL_FORMAT).date()
+
+
+def parse_date_column(
+    values: Iterable[Optional[str]],
+    kind: DateKind = "iso",
+    errors: Literal["coerce", "raise"] = "raise",
+) -> List[Optional[date]]:
+    """Parses a whole column of dates, each distinct value being parsed only once.
+    Missing values (None) stay None. With `errors="coerce"`, the values that can't
+    be parsed are replaced by None instead of raising."""
+    parse = parse_label_date if kind == "label" else parse_iso_date
+    values = list(values)
+
+    parsed = {}
+    for value in dict.fromkeys(values):
+        if value is None:
+            continue
+        try:
+            parsed[value] = parse(value)
+        except (ValueError, TypeError):
+            if errors == "raise":
+                raise
+            parsed[value] = None
+
+    return [parsed.get(value) if value is not None else None for value in values]
+
+
+def _is_ascii_number(string: str) -> bool:
+    return string.isascii() and string.isdigit()
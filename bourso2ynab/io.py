@@ -1,9 +1,303 @@
+import io
+import os
 import csv
-from typing import Union
+import contextlib
+import functools
+import itertools
 from pathlib import Path
+from datetime import date
+from dataclasses import dataclass
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
 
-import pandas as pd
+from bourso2ynab.dates import DateRange, parse_iso_date
+from bourso2ynab.transaction import (
+    CompactTransaction,
+    InvalidBoursoTransaction,
+    RowError,
+    Transaction,
+    UnknownTransactionType,
+)
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def read_bourso_transactions(filepath: Union[str, Path]) -> pd.DataFrame:
-    return pd.read_csv(filepath, sep=";")
+FilepathOrBuffer = Union[str, Path, IO]
+# "pandas" parses the file with `pd.read_csv` and `Transaction.from_dataframe`.
+# "csv" only relies on the standard library, which makes it much faster to import.
+Engine = Literal["pandas", "csv"]
+ENGINES = ["pandas", "csv"]
+
+BOURSO_CSV_DELIMITER = ";"
+
+AnyTransaction = Union[Transaction, CompactTransaction]
+# A batch of rows that aren't parsed yet (see `iter_bourso_batches`).
+RawBatch = Union[List[Tuple[int, Dict[str, str]]], "pd.DataFrame"]
+
+
+@dataclass
+class ReadStats:
+    """Filled in while an export is read."""
+
+    # Number of rows that were read (not counting the skipped ones).
+    rows: int = 0
+    # The oldest and the most recent operation dates (`dateOp`) of the export,
+    # skipped rows included: the export covers this whole range.
+    oldest_date_op: Optional[date] = None
+    latest_date_op: Optional[date] = None
+    # Number of rows that weren't parsed because of `skip`.
+    skipped: int = 0
+
+    def update(self, date_ops: List[Optional[date]], skipped: int = 0):
+        """`date_ops` are those of the rows that were read, `skipped` of them
+        included."""
+        self.rows += len(date_ops) - skipped
+        self.skipped += skipped
+        known = [d for d in date_ops if d is not None]
+        if not known:
+            return
+        oldest, latest = min(known), max(known)
+        if self.oldest_date_op is None or oldest < self.oldest_date_op:
+            self.oldest_date_op = oldest
+        if self.latest_date_op is None or latest > self.latest_date_op:
+            self.latest_date_op = latest
+
+
+def read_bourso_transactions(
+    filepath: FilepathOrBuffer, chunksize: Optional[int] = None
+) -> Union["pd.DataFrame", Iterator["pd.DataFrame"]]:
+    """Reads a Bourso export. If `chunksize` is provided, an iterator of DataFrames
+    of (at most) `chunksize` rows is returned instead of a single DataFrame."""
+    import pandas as pd
+
+    return pd.read_csv(filepath, sep=BOURSO_CSV_DELIMITER, chunksize=chunksize)
+
+
+def read_bourso_rows(filepath: FilepathOrBuffer) -> Iterator[Dict[str, str]]:
+    """Reads a Bourso export with the `csv` module, one row (as a dict) at a time.
+    `filepath` can also be a file-like object, opened in text or binary mode."""
+    if isinstance(filepath, (str, os.PathLike)):
+        with open(filepath, "r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f, delimiter=BOURSO_CSV_DELIMITER)
+        return
+
+    if isinstance(filepath.read(0), str):
+        # The stream is already decoded. Only the BOM has to be removed.
+        lines = (
+            line.lstrip("\ufeff") if i == 0 else line for i, line in enumerate(filepath)
+        )
+        yield from csv.DictReader(lines, delimiter=BOURSO_CSV_DELIMITER)
+        return
+
+    f = io.TextIOWrapper(filepath, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(f, delimiter=BOURSO_CSV_DELIMITER)
+    finally:
+        # Otherwise, the underlying stream would be closed along with the wrapper.
+        f.detach()
+
+
+def transactions_from_rows(
+    rows: Iterable[Tuple[int, Dict[str, str]]],
+    format: bool = True,
+    compact: bool = False,
+) -> Tuple[List[AnyTransaction], List[RowError]]:
+    """Same as `Transaction.from_dataframe`, for (index, row) pairs read by
+    `read_bourso_rows`. If `compact`, `CompactTransaction`s are returned."""
+    from_csv_row = (
+        CompactTransaction.from_csv_row if compact else Transaction.from_csv_row
+    )
+    transactions, errors = [], []
+    for index, row in rows:
+        try:
+            transactions.append(from_csv_row(row, format=format))
+        except (InvalidBoursoTransaction, UnknownTransactionType, ValueError) as e:
+            errors.append(RowError(index=index, error=e))
+    return transactions, errors
+
+
+def parse_bourso_transactions(
+    filepath: FilepathOrBuffer,
+    engine: Engine = "pandas",
+    compact: bool = False,
+    skip: Optional[DateRange] = None,
+    stats: Optional[ReadStats] = None,
+) -> Tuple[List[AnyTransaction], List[RowError]]:
+    """Reads and parses a whole Bourso export with the given `engine`. See
+    `iter_bourso_transactions` for `skip` and `stats`."""
+    batches = iter_bourso_transactions(
+        filepath, None, engine=engine, compact=compact, skip=skip, stats=stats
+    )
+    return next(batches, ([], []))
+
+
+def iter_bourso_transactions(
+    filepath: FilepathOrBuffer,
+    batch_size: Optional[int] = 1_000,
+    engine: Engine = "pandas",
+    compact: bool = False,
+    skip: Optional[DateRange] = None,
+    stats: Optional[ReadStats] = None,
+) -> Iterator[Tuple[List[AnyTransaction], List[RowError]]]:
+    """Reads and parses a Bourso export by batches of `batch_size` rows, so that
+    only one batch is held in memory at a time. `filepath` can also be a file-like
+    object (e.g. the stream of a Flask upload).
+    Each batch is yielded along with the errors of its rows (see
+    `Transaction.from_dataframe`). If `batch_size` is None, the whole file is
+    yielded as a single batch.
+    If `compact`, `CompactTransaction`s are yielded instead of `Transaction`s.
+
+    If `skip` is provided, the rows operated within it (e.g. because they were
+    already pushed) are left out before being parsed. `stats`, if provided, is
+    filled in as the file is read."""
+    batches = iter_bourso_batches(
+        filepath, batch_size, engine=engine, skip=skip, stats=stats
+    )
+    for batch in batches:
+        yield parse_bourso_batch(batch, compact=compact)
+
+
+def iter_bourso_batches(
+    filepath: FilepathOrBuffer,
+    batch_size: Optional[int] = 1_000,
+    engine: Engine = "pandas",
+    skip: Optional[DateRange] = None,
+    stats: Optional[ReadStats] = None,
+) -> Iterator[RawBatch]:
+    """Same as `iter_bourso_transactions`, without parsing the batches: they are
+    lists of (index, row) pairs with the "csv" engine and DataFrames with the
+    "pandas" one. See `parse_bourso_batch`."""
+    stats = stats if stats is not None else ReadStats()
+    if engine == "csv":
+        rows = _read_rows(enumerate(read_bourso_rows(filepath)), skip, stats)
+        if batch_size is None:
+            yield list(rows)
+            return
+        while batch := list(itertools.islice(rows, batch_size)):
+            yield batch
+        return
+
+    yield from _read_dataframes(filepath, batch_size, skip, stats)
+
+
+def parse_bourso_batch(
+    batch: RawBatch, compact: bool = False
+) -> Tuple[List[AnyTransaction], List[RowError]]:
+    """Parses a batch yielded by `iter_bourso_batches`."""
+    if isinstance(batch, list):
+        return transactions_from_rows(batch, compact=compact)
+    return _maybe_compact(Transaction.from_dataframe(batch), compact)
+
+
+def _read_rows(
+    rows: Iterable[Tuple[int, Dict[str, str]]],
+    skip: Optional[DateRange],
+    stats: ReadStats,
+) -> Iterator[Tuple[int, Dict[str, str]]]:
+    for index, row in rows:
+        date_op = _parse_date_op(row.get("dateOp"))
+        skipped = _is_skipped(date_op, skip)
+        stats.update([date_op], skipped=int(skipped))
+        if not skipped:
+            yield index, row
+
+
+def _read_dataframes(
+    filepath: FilepathOrBuffer,
+    chunksize: Optional[int],
+    skip: Optional[DateRange],
+    stats: ReadStats,
+) -> Iterator["pd.DataFrame"]:
+    if chunksize is None:
+        reader = contextlib.nullcontext([read_bourso_transactions(filepath)])
+    else:
+        reader = read_bourso_transactions(filepath, chunksize=chunksize)
+
+    with reader as dfs:
+        for df in dfs:
+            date_ops = [None] * len(df)
+            if "dateOp" in df.columns:
+                date_ops = [_parse_date_op(date_op) for date_op in df["dateOp"]]
+            kept = [not _is_skipped(date_op, skip) for date_op in date_ops]
+            stats.update(date_ops, skipped=kept.count(False))
+            yield df if all(kept) else df[kept]
+
+
+def _is_skipped(date_op: Optional[date], skip: Optional[DateRange]) -> bool:
+    return skip is not None and date_op is not None and skip.includes(date_op)
+
+
+def _parse_date_op(date_op: Optional[str]) -> Optional[date]:
+    if not isinstance(date_op, str):
+        return None  # Missing (None or NaN).
+    try:
+        return parse_iso_date(date_op)
+    except ValueError:
+        return None
+
+
+def _maybe_compact(
+    parsed: Tuple[List[Transaction], List[RowError]], compact: bool
+) -> Tuple[List[AnyTransaction], List[RowError]]:
+    transactions, errors = parsed
+    if compact:
+        transactions = [CompactTransaction.from_transaction(t) for t in transactions]
+    return transactions, errors
+
+
+def list_bourso_exports(paths: Iterable[Union[str, Path]]) -> List[Path]:
+    """Expands `paths` into the list of exports they point to: files are kept as
+    they are, and directories are replaced by the CSV files they contain."""
+    filepaths = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            filepaths.extend(sorted(path.glob("*.csv")))
+        else:
+            filepaths.append(path)
+    return filepaths
+
+
+def parse_bourso_exports(
+    filepaths: List[Union[str, Path]],
+    engine: Engine = "pandas",
+    compact: bool = False,
+    workers: Optional[int] = None,
+    skip: Optional[DateRange] = None,
+) -> List[Tuple[List[AnyTransaction], List[RowError], ReadStats]]:
+    """Parses several exports in parallel, with a pool of `workers` processes (as
+    many as there are CPUs by default). The results are in the order of
+    `filepaths`, along with the `ReadStats` of each export."""
+    parse = functools.partial(_parse_export, engine=engine, compact=compact, skip=skip)
+    workers = min(workers or os.cpu_count() or 1, len(filepaths))
+    if workers <= 1:
+        # Not worth starting a pool.
+        return list(map(parse, filepaths))
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse, filepaths))
+
+
+def _parse_export(
+    filepath: Union[str, Path],
+    engine: Engine,
+    compact: bool,
+    skip: Optional[DateRange],
+) -> Tuple[List[AnyTransaction], List[RowError], ReadStats]:
+    # Defined at the module level so that it can be sent to the workers.
+    stats = ReadStats()
+    transactions, errors = parse_bourso_transactions(
+        filepath, engine=engine, compact=compact, skip=skip, stats=stats
+    )
+    return transactions, errors, stats
@@ -0,0 +1,263 @@
+import re
+import bisect
+import itertools
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+TRANSACTION_TYPES = ["CARTE", "VIR", "RETRAIT", "PRLV"]
+
+# Optional tokens that can follow the transaction type, in the order in which they
+# appear in a label. Each token is followed by the tokens after it, so e.g.
+# "VIR INST 01/01/70 Payee" or "CARTE 01/01/70 PAYPAL *Payee".
+DATE_TOKEN = "date"
+SPACE_TOKEN = "space"
+PAYPAL_TOKEN = "PAYPAL *"
+PREFIX_TOKENS = [
+    "INST ",  # In case of a VIR, the format is: "VIR INST 01/01/70 Payee ..."
+    "SEPA ",  # In case of a PRLV, the format is: "PRLV SEPA Payee ..."
+    DATE_TOKEN,
+    SPACE_TOKEN,
+    "ZTL*",
+    "IZ *",
+    "SUMUP *",
+    PAYPAL_TOKEN,
+]
+
+# Grammar of the Bourso labels. The regex can backtrack for a long time on long
+# labels, which `parse_label` parses in linear time with the same results.
+TRANSACTION_LABEL_PATTERN = (
+    r"^(?P<transaction_type>((CARTE)|(VIR)|(RETRAIT)|(PRLV)))\s"
+    r"(INST\s)?"  # In case of a VIR, the format is: "VIR INST 01/01/70 Payee ..."
+    r"(SEPA\s)?"  # In case of a PRLV, the format is: "PRLV SEPA Payee ..."
+    r"(?P<date>\d{2}/\d{2}/\d{2})?\s?"
+    r"(ZTL\*)?"
+    r"(IZ \*)?"
+    r"(SUMUP \*)?"
+    r"(?P<is_paypal>PAYPAL \*)?"
+    r"(?P<payee>.+?)\s?"
+    r"(SC\s?)?"
+    r"(SA\s?)?"
+    r"(PLC\s?)?"
+    r"(\d+(\D+)?\s?(\d\s?)?)?"  # Catches the random digits and letters after the payee name.
+    r"(-\s?)?"
+    r"(CB\*\d{4})?$"
+).strip()
+TRANSACTION_LABEL_PROG = re.compile(TRANSACTION_LABEL_PATTERN)
+
+LabelGroups = Dict[str, Optional[str]]
+LABEL_GROUPS = ["transaction_type", "date", "is_paypal", "payee"]
+
+# The regex is faster than `parse_label` on the labels found in exports, but its
+# worst case grows quickly with the length of the label (about 0.5ms at 64
+# characters, 6ms at 200, see benchmarks/bench_label.py).
+MAX_REGEX_LABEL_LENGTH = 64
+
+
+def match_label(label: str) -> Optional[LabelGroups]:
+    """Splits a (stripped) Bourso label into its groups, or returns None if the
+    label can't be parsed. Labels up to `MAX_REGEX_LABEL_LENGTH` characters are
+    matched with `TRANSACTION_LABEL_PROG`, longer ones with `parse_label`."""
+    if len(label) > MAX_REGEX_LABEL_LENGTH:
+        return parse_label(label)
+    result = TRANSACTION_LABEL_PROG.match(label)
+    if result is None:
+        return None
+    groups = result.groupdict()
+    return {key: groups[key] for key in LABEL_GROUPS}
+
+
+def parse_label(label: str) -> Optional[LabelGroups]:
+    """Splits a (stripped) Bourso label into its transaction type, date, payee and
+    Paypal marker. Returns the same groups as `TRANSACTION_LABEL_PROG.match(label)`,
+    or None if the label can't be parsed.
+
+    Unlike the regex, it runs in linear time whatever the label: the transaction
+    type is dispatched on first, then each way of stripping the known merchant
+    prefixes is tried (there is a bounded number of them) and the end of the payee
+    is found from the positions where the known suffixes can start, which are
+    computed in a single pass over the label."""
+    transaction_type = _parse_transaction_type(label)
+    if transaction_type is None:
+        return None
+
+    suffixes = _Suffixes(label)
+    position = len(transaction_type) + 1
+    # Stripping every prefix token that is found nearly always works, so that
+    # candidate is tried before going through all the others.
+    candidates = itertools.chain(
+        [_strip_prefix_tokens(label, position)],
+        _iter_payee_starts(label, position),
+    )
+    for start, date, is_paypal in candidates:
+        # Like `(?P<payee>.+?)`: the payee is the shortest non-empty string without
+        # a newline that is followed by the suffixes.
+        if start >= len(label):
+            continue
+        end = suffixes.first_start(start + 1)
+        newline = label.find("\n", start)
+        if newline != -1 and end > newline:
+            continue
+        return {
+            "transaction_type": transaction_type,
+            "date": date,
+            "is_paypal": is_paypal,
+            "payee": label[start:end],
+        }
+
+    return None
+
+
+def _parse_transaction_type(label: str) -> Optional[str]:
+    for transaction_type in TRANSACTION_TYPES:
+        n = len(transaction_type)
+        if label.startswith(transaction_type) and label[n : n + 1].isspace():
+            return transaction_type
+    return None
+
+
+def _strip_prefix_tokens(
+    label: str, position: int
+) -> Tuple[int, Optional[str], Optional[str]]:
+    """Same as the first candidate of `_iter_payee_starts`."""
+    date, is_paypal = None, None
+    for token in PREFIX_TOKENS:
+        end = _match_prefix_token(label, position, token)
+        if end is None:
+            continue
+        if token == DATE_TOKEN:
+            date = label[position:end]
+        elif token == PAYPAL_TOKEN:
+            is_paypal = label[position:end]
+        position = end
+    return position, date, is_paypal
+
+
+def _iter_payee_starts(
+    label: str, position: int, token_index: int = 0
+) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+    """Yields every possible (payee start, date, Paypal marker) once the optional
+    prefix tokens are stripped, starting at `position`. Like the regex, the
+    candidates where a token is stripped come before the ones where it isn't."""
+    if token_index == len(PREFIX_TOKENS):
+        yield position, None, None
+        return
+
+    token = PREFIX_TOKENS[token_index]
+    end = _match_prefix_token(label, position, token)
+    if end is not None:
+        for start, date, is_paypal in _iter_payee_starts(label, end, token_index + 1):
+            if token == DATE_TOKEN:
+                date = label[position:end]
+            elif token == PAYPAL_TOKEN:
+                is_paypal = label[position:end]
+            yield start, date, is_paypal
+    yield from _iter_payee_starts(label, position, token_index + 1)
+
+
+def _match_prefix_token(label: str, position: int, token: str) -> Optional[int]:
+    """Returns the position right after `token` if it is found at `position`."""
+    if token == DATE_TOKEN:
+        # dd/mm/yy
+        chunk = label[position : position + 8]
+        if (
+            len(chunk) == 8
+            and chunk[2] == chunk[5] == "/"
+            and (chunk[:2] + chunk[3:5] + chunk[6:]).isdecimal()
+        ):
+            return position + 8
+        return None
+
+    if token == SPACE_TOKEN or token.endswith(" "):
+        # Trailing spaces in tokens stand for any whitespace.
+        word = "" if token == SPACE_TOKEN else token[:-1]
+        end = position + len(word)
+        if label.startswith(word, position) and label[end : end + 1].isspace():
+            return end + 1
+        return None
+
+    if label.startswith(token, position):
+        return position + len(token)
+    return None
+
+
+class _Suffixes:
+    r"""Positions of `label` from which the rest of the label only consists of the
+    suffixes that come after a payee, i.e. matches:
+    `\s?(SC\s?)?(SA\s?)?(PLC\s?)?(\d+(\D+)?\s?(\d\s?)?)?(-\s?)?(CB\*\d{4})?$`
+
+    Apart from the digits group, the suffixes are at most a dozen characters long,
+    so they are handled as small sets of positions. The digits group is a run of
+    digits followed by a run of non-digits, i.e. intervals of positions that are
+    found with a single pass over the digit runs of the label."""
+
+    # Maximum length of `\s?(SC\s?)?(SA\s?)?(PLC\s?)?`.
+    MAX_WORDS_LENGTH = 11
+
+    def __init__(self, label: str):
+        self.label = label
+        n = len(label)
+
+        # (-\s?)?(CB\*\d{4})?$
+        cards = {n}
+        if n >= 7 and label.startswith("CB*", n - 7) and label[n - 4 :].isdecimal():
+            cards.add(n - 7)
+        self.tails = _add_word_before(label, cards, "-")
+
+        # \s?(\d\s?)? followed by the tails.
+        digit_tails = set(self.tails)
+        for tail in self.tails:
+            if _is_digit(label, tail - 1):
+                digit_tails.add(tail - 1)
+            if _is_digit(label, tail - 2) and _is_space(label, tail - 1):
+                digit_tails.add(tail - 2)
+        digit_tails = _add_word_before(label, digit_tails, "")
+
+        # \d+(\D+)? followed by the above: for each position, the last run of
+        # digits that starts before it (any character in between is a non-digit).
+        runs = [match.span() for match in re.finditer(r"\d+", label)]
+        run_starts = [start for start, _ in runs]
+        self.intervals = []
+        for tail in digit_tails:
+            i = bisect.bisect_right(run_starts, tail - 1) - 1
+            if i >= 0:
+                start, end = runs[i]
+                self.intervals.append((start, min(end, tail) - 1))
+
+    def first_start(self, lower: int) -> int:
+        """Returns the first position `p >= lower` from which the suffixes start."""
+        # `lower <= len(label)`, and the suffixes can always start at the end.
+        first = min(
+            [tail for tail in self.tails if tail >= lower]
+            + [max(lo, lower) for lo, hi in self.intervals if hi >= lower]
+        )
+
+        # The optional words before the digits group can only move the start of
+        # the suffixes a few characters to the left of `first`.
+        last = first + self.MAX_WORDS_LENGTH
+        positions = {tail for tail in self.tails if first <= tail <= last}
+        for lo, hi in self.intervals:
+            positions.update(range(max(lo, first), min(hi, last) + 1))
+        for word in ["PLC", "SA", "SC", ""]:
+            positions = _add_word_before(self.label, positions, word)
+        return min(p for p in positions if p >= lower)
+
+
+def _add_word_before(label: str, positions: Set[int], word: str) -> Set[int]:
+    r"""Adds the positions from which `word`, an optional whitespace, then one of
+    `positions` can be read. I.e. `(word\s?)?` followed by `positions`."""
+    new_positions = set(positions)
+    for p in positions:
+        before = label[p - 1] if p > 0 else ""
+        start = p - len(word)
+        if word and before == word[-1] and label.startswith(word, start) and start >= 0:
+            new_positions.add(start)
+        if before.isspace() and label.startswith(word, start - 1) and start >= 1:
+            new_positions.add(start - 1)
+    return new_positions
+
+
+def _is_digit(label: str, position: int) -> bool:
+    return 0 <= position < len(label) and label[position].isdecimal()
+
+
+def _is_space(label: str, position: int) -> bool:
+    return 0 <= position < len(label) and label[position].isspace()
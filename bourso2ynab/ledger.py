@@ -0,0 +1,198 @@
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Set, Tuple, TypeVar, Union
+
+from bourso2ynab.dates import DateRange
+
+T = TypeVar("T")
+
+# Number of days, before the end of the pushed range, whose rows are read again.
+DEFAULT_GRACE_DAYS = 7
+
+# SQLite limits the number of parameters of a query (999 in old versions).
+_MAX_PARAMETERS = 500
+
+
+class ImportLedger:
+    """A local record, stored in SQLite, of the import IDs that were already pushed
+    to YNAB for each budget and account. It lets the rows of overlapping exports be
+    skipped before any network call, instead of sending them again and relying on
+    YNAB to reject them as duplicates.
+    Every query goes through a single connection under a lock, so e.g. a pushed
+    range is read and merged with the new one without another write in between."""
+
+    def __init__(self, filepath: Union[str, Path] = ":memory:"):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(filepath), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pushed_import_ids ("
+                " budget_id TEXT NOT NULL,"
+                " account_id TEXT NOT NULL,"
+                " import_id TEXT NOT NULL,"
+                " PRIMARY KEY (budget_id, account_id, import_id)"
+                ") WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS server_knowledge ("
+                " budget_id TEXT NOT NULL,"
+                " account_id TEXT NOT NULL,"
+                " server_knowledge INTEGER NOT NULL,"
+                " PRIMARY KEY (budget_id, account_id)"
+                ")"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pushed_ranges ("
+                " budget_id TEXT NOT NULL,"
+                " account_id TEXT NOT NULL,"
+                " oldest TEXT NOT NULL,"
+                " newest TEXT NOT NULL,"
+                " PRIMARY KEY (budget_id, account_id)"
+                ")"
+            )
+
+    def known_import_ids(
+        self, import_ids: Iterable[str], budget_id: str, account_id: str
+    ) -> Set[str]:
+        """Returns those of `import_ids` that were already pushed to the account."""
+        import_ids = list(import_ids)
+        known = set()
+        with self._lock:
+            for start in range(0, len(import_ids), _MAX_PARAMETERS):
+                chunk = import_ids[start : start + _MAX_PARAMETERS]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    "SELECT import_id FROM pushed_import_ids"
+                    " WHERE budget_id = ? AND account_id = ?"
+                    f" AND import_id IN ({placeholders})",
+                    [budget_id, account_id, *chunk],
+                )
+                known.update(import_id for (import_id,) in rows)
+        return known
+
+    def filter_new(
+        self, transactions: Iterable[T], budget_id: str, account_id: str
+    ) -> List[T]:
+        """Returns the transactions whose import ID wasn't pushed to the account yet."""
+        transactions = list(transactions)
+        import_ids = [transaction.import_id for transaction in transactions]
+        known = self.known_import_ids(import_ids, budget_id, account_id)
+        return [
+            transaction
+            for transaction, import_id in zip(transactions, import_ids)
+            if import_id not in known
+        ]
+
+    def record(self, import_ids: Iterable[str], budget_id: str, account_id: str):
+        """Records that `import_ids` are now known to YNAB for the account."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO pushed_import_ids"
+                " (budget_id, account_id, import_id) VALUES (?, ?, ?)",
+                ((budget_id, account_id, import_id) for import_id in import_ids),
+            )
+
+    def get_server_knowledge(self, budget_id: str, account_id: str) -> Optional[int]:
+        """The `server_knowledge` of YNAB at the last sync of the account (see
+        `bourso2ynab.ynab.sync_from_ynab`), if any."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT server_knowledge FROM server_knowledge"
+                " WHERE budget_id = ? AND account_id = ?",
+                [budget_id, account_id],
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def record_sync(
+        self,
+        import_ids: Iterable[str],
+        server_knowledge: int,
+        budget_id: str,
+        account_id: str,
+    ):
+        """Records the import IDs fetched from YNAB along with the
+        `server_knowledge` they are up to date with, in a single transaction."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO pushed_import_ids"
+                " (budget_id, account_id, import_id) VALUES (?, ?, ?)",
+                ((budget_id, account_id, import_id) for import_id in import_ids),
+            )
+            self._connection.execute(
+                "INSERT INTO server_knowledge (budget_id, account_id, server_knowledge)"
+                " VALUES (?, ?, ?)"
+                " ON CONFLICT (budget_id, account_id) DO UPDATE"
+                " SET server_knowledge = excluded.server_knowledge",
+                [budget_id, account_id, server_knowledge],
+            )
+
+    def get_pushed_range(
+        self, budget_id: str, account_id: str
+    ) -> Optional[Tuple[date, date]]:
+        """The oldest and the newest operation dates (`dateOp`, both included)
+        between which the exports of the account were fully pushed, if any."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT oldest, newest FROM pushed_ranges"
+                " WHERE budget_id = ? AND account_id = ?",
+                [budget_id, account_id],
+            ).fetchone()
+        if row is None:
+            return None
+        return date.fromisoformat(row[0]), date.fromisoformat(row[1])
+
+    def record_pushed_range(
+        self, oldest: date, newest: date, budget_id: str, account_id: str
+    ):
+        """Records that the exports of the account were fully pushed from `oldest`
+        to `newest`. Only a contiguous range is kept: if the new one overlaps the
+        recorded one, they are merged. Otherwise, the most recent one is kept (an
+        older export may have been pushed after a more recent one, and the gap
+        between them was never pushed)."""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT oldest, newest FROM pushed_ranges"
+                " WHERE budget_id = ? AND account_id = ?",
+                [budget_id, account_id],
+            ).fetchone()
+            if row is not None:
+                recorded = date.fromisoformat(row[0]), date.fromisoformat(row[1])
+                if oldest <= recorded[1] and newest >= recorded[0]:
+                    oldest, newest = min(oldest, recorded[0]), max(newest, recorded[1])
+                elif newest < recorded[0]:
+                    return
+            self._connection.execute(
+                "INSERT INTO pushed_ranges (budget_id, account_id, oldest, newest)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (budget_id, account_id) DO UPDATE"
+                " SET oldest = excluded.oldest, newest = excluded.newest",
+                [budget_id, account_id, oldest.isoformat(), newest.isoformat()],
+            )
+
+    def get_skip_range(
+        self, budget_id: str, account_id: str, grace_days: int = DEFAULT_GRACE_DAYS
+    ) -> Optional[DateRange]:
+        """The operation dates whose rows don't have to be read from the exports of
+        the account: the pushed range, without its last `grace_days` days for the
+        rows whose `dateVal` settles after their `dateOp` (e.g. because they were
+        dated in the future). The rows operated before the pushed range are still
+        read."""
+        pushed_range = self.get_pushed_range(budget_id, account_id)
+        if pushed_range is None:
+            return None
+        oldest, newest = pushed_range
+        end = newest - timedelta(days=grace_days)
+        return DateRange(oldest, end) if end > oldest else None
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> "ImportLedger":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
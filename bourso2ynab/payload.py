@@ -0,0 +1,115 @@
+import json
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Union
+
+from bourso2ynab.batch import TransactionBatch, _MISSING_AMOUNT, _MISSING_DATE
+from bourso2ynab.transaction import CompactTransaction, Transaction
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library is used instead.
+    orjson = None
+
+
+# The limits that `SaveTransaction` validates (see `SaveTransaction.validations`):
+# YNAB rejects the whole request if a single transaction goes over them.
+MAX_PAYEE_NAME_LENGTH = 50
+MAX_MEMO_LENGTH = 200
+MAX_IMPORT_ID_LENGTH = 36
+
+
+def _json_dumps(payload: Any) -> bytes:
+    # Same bytes as what the generated YNAB client sends (it uses `json.dumps`).
+    return json.dumps(payload).encode("utf-8")
+
+
+# `orjson` is several times faster than `json`. Its output is the same JSON
+# document, but not the same bytes: it is compact (no spaces after "," and ":")
+# and doesn't escape non-ASCII characters. Only `_json_dumps` is byte for byte
+# what the generated client sends.
+dumps: Callable[[Any], bytes] = orjson.dumps if orjson is not None else _json_dumps
+
+
+def transactions_payload(
+    transactions: Union[
+        Iterable[Transaction], Iterable[CompactTransaction], TransactionBatch
+    ],
+    account_id: str,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """The body of a bulk-create request of the YNAB API (`POST
+    /budgets/{budget_id}/transactions`), built straight from the transactions.
+    It is the same as the one of `SaveTransactionsWrapper` (see
+    `ApiClient.sanitize_for_serialization`), without creating and validating a
+    `SaveTransaction` per transaction. A `TransactionBatch` is read column by
+    column, and each of its distinct dates is only formatted once.
+    The payees and the memos that are too long for YNAB are truncated. An import
+    ID that is too long raises a ValueError (it can't be truncated without
+    breaking the deduplication)."""
+    if isinstance(transactions, TransactionBatch):
+        return {"transactions": _batch_rows(transactions, account_id)}
+    return {
+        "transactions": [
+            _row(
+                account_id,
+                transaction.date.isoformat(),
+                transaction.milliunits,
+                transaction.payee,
+                transaction.memo,
+                transaction.import_id,
+            )
+            for transaction in transactions
+        ]
+    }
+
+
+def serialize_transactions(
+    transactions: Union[
+        Iterable[Transaction], Iterable[CompactTransaction], TransactionBatch
+    ],
+    account_id: str,
+) -> bytes:
+    """`transactions_payload`, encoded with `dumps`."""
+    return dumps(transactions_payload(transactions, account_id))
+
+
+def _batch_rows(batch: TransactionBatch, account_id: str) -> List[Dict[str, Any]]:
+    formatted_dates: Dict[int, str] = {}
+    rows = []
+    for ordinal, amount, payee, memo, import_id in zip(
+        batch.dates, batch.amounts, batch.payees, batch.memos, batch.import_ids()
+    ):
+        formatted_date = formatted_dates.get(ordinal)
+        if formatted_date is None:
+            formatted_date = (
+                date.fromordinal(ordinal).isoformat()
+                if ordinal != _MISSING_DATE
+                else None
+            )
+            formatted_dates[ordinal] = formatted_date
+        if amount == _MISSING_AMOUNT:
+            amount = None
+        rows.append(_row(account_id, formatted_date, amount, payee, memo, import_id))
+    return rows
+
+
+def _row(account_id, date_, amount, payee, memo, import_id) -> Dict[str, Any]:
+    if payee is not None and len(payee) > MAX_PAYEE_NAME_LENGTH:
+        payee = payee[:MAX_PAYEE_NAME_LENGTH]
+    if memo is not None and len(memo) > MAX_MEMO_LENGTH:
+        memo = memo[:MAX_MEMO_LENGTH]
+    if len(import_id) > MAX_IMPORT_ID_LENGTH:
+        raise ValueError(
+            f"Invalid import ID {import_id!r}: longer than {MAX_IMPORT_ID_LENGTH}"
+            " characters."
+        )
+    # Same keys, in the same order, as a sanitized `SaveTransaction`.
+    return {
+        "account_id": account_id,
+        "date": date_,
+        "amount": amount,
+        "payee_name": payee,
+        "memo": memo,
+        "approved": True,
+        "cleared": "uncleared",
+        "import_id": import_id,
+    }
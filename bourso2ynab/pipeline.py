@@ -0,0 +1,206 @@
+import time
+import dataclasses
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.dates import DateRange
+from bourso2ynab.ledger import ImportLedger
+from bourso2ynab.transaction import (
+    RowError,
+    iter_unique_import_ids,
+    remove_future_transactions,
+)
+from bourso2ynab.io import (
+    Engine,
+    FilepathOrBuffer,
+    ReadStats,
+    iter_bourso_batches,
+    parse_bourso_batch,
+)
+
+# Pushes a batch of transactions to (account ID, budget ID). See `send_to_ynab`.
+PushFunction = Callable[[List[Any], str, str], Any]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A step of a `Pipeline`: `func` lazily turns an iterator of batches into
+    another one. `count` gives the number of items of an output batch."""
+
+    name: str
+    func: Callable[[Iterator[Any]], Iterator[Any]]
+    count: Callable[[Any], int] = len
+
+
+@dataclass
+class StageStats:
+    name: str
+    batches: int = 0
+    items: int = 0
+    # Time spent in the stage itself.
+    seconds: float = 0.0
+    # Time spent in the stage and in the stages before it.
+    total_seconds: float = 0.0
+
+
+class Pipeline:
+    """Chains stages, e.g. read -> parse -> rename -> dedupe -> filter -> push.
+    Nothing is computed until the output of `run` is iterated over, and only one
+    batch goes through the stages at a time. The stages can be reordered, and the
+    same pipeline can be run several times.
+    Every stage is timed and counts the batches and items it yields (see `stats`)."""
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = list(stages)
+        self._stats = [StageStats(stage.name) for stage in self.stages]
+
+    def run(self, source: Iterable[Any] = ()) -> Iterator[Any]:
+        """Feeds the batches of `source` to the first stage (which can also ignore
+        them, e.g. `read_stage`) and returns the batches of the last stage."""
+        self._stats = [StageStats(stage.name) for stage in self.stages]
+        batches = iter(source)
+        for stage, stats in zip(self.stages, self._stats):
+            batches = _timed(stage.func(batches), stage.count, stats)
+        return batches
+
+    @property
+    def stats(self) -> List[StageStats]:
+        """The stats of the last run, so far."""
+        stats, upstream_seconds = [], 0.0
+        for stage_stats in self._stats:
+            stats.append(
+                dataclasses.replace(
+                    stage_stats, seconds=stage_stats.total_seconds - upstream_seconds
+                )
+            )
+            upstream_seconds = stage_stats.total_seconds
+        return stats
+
+    def report(self) -> str:
+        return "\n".join(
+            f"{s.name}: {s.batches} batches, {s.items} items, {s.seconds:.3f}s"
+            for s in self.stats
+        )
+
+
+def _timed(
+    batches: Iterator[Any], count: Callable[[Any], int], stats: StageStats
+) -> Iterator[Any]:
+    while True:
+        start = time.perf_counter()
+        try:
+            batch = next(batches)
+        except StopIteration:
+            return
+        finally:
+            stats.total_seconds += time.perf_counter() - start
+        stats.batches += 1
+        stats.items += count(batch)
+        yield batch
+
+
+def read_stage(
+    filepath: FilepathOrBuffer,
+    batch_size: Optional[int] = 1_000,
+    engine: Engine = "pandas",
+    skip: Optional[DateRange] = None,
+    stats: Optional[ReadStats] = None,
+) -> Stage:
+    """Source stage: yields the raw batches of an export (see
+    `bourso2ynab.io.iter_bourso_batches`). Its input is ignored."""
+
+    def read(_: Iterator[Any]) -> Iterator[Any]:
+        yield from iter_bourso_batches(
+            filepath, batch_size, engine=engine, skip=skip, stats=stats
+        )
+
+    return Stage("read", read)
+
+
+def parse_stage(
+    compact: bool = False,
+    on_error: Optional[Callable[[List[RowError]], None]] = None,
+) -> Stage:
+    """Parses raw batches into lists of transactions. The errors of the rows that
+    can't be parsed are passed to `on_error`, if provided."""
+
+    def parse(batches: Iterator[Any]) -> Iterator[List[Any]]:
+        for batch in batches:
+            transactions, errors = parse_bourso_batch(batch, compact=compact)
+            if errors and on_error is not None:
+                on_error(errors)
+            yield transactions
+
+    return Stage("parse", parse)
+
+
+def rename_stage(lookup: Callable[[str], Optional[str]]) -> Stage:
+    """Replaces the payees for which `lookup` returns a new name. The batches are
+    turned into `TransactionBatch`es, so the input transactions aren't modified.
+    `lookup` is only called once per distinct payee."""
+
+    def rename(batches: Iterator[Any]) -> Iterator[TransactionBatch]:
+        new_payees: Dict[str, Optional[str]] = {}
+        for batch in batches:
+            batch = TransactionBatch.from_transactions(batch)
+            for transaction in batch:
+                payee = transaction.payee
+                if payee not in new_payees:
+                    new_payees[payee] = lookup(payee)
+                if new_payees[payee] is not None:
+                    transaction.payee = new_payees[payee]
+            yield batch
+
+    return Stage("rename", rename)
+
+
+def dedupe_stage() -> Stage:
+    """Makes the import IDs unique across all the batches (see
+    `iter_unique_import_ids`)."""
+    return Stage("dedupe", iter_unique_import_ids)
+
+
+def filter_stage(
+    ledger: Optional[ImportLedger] = None,
+    budget_id: Optional[str] = None,
+    account_id: Optional[str] = None,
+) -> Stage:
+    """Removes the transactions dated in the future, which YNAB rejects, and the
+    ones that `ledger` (if provided) knows were already pushed to the account."""
+
+    def filter_(batches: Iterator[Any]) -> Iterator[List[Any]]:
+        for batch in batches:
+            batch = remove_future_transactions(batch)
+            if ledger is not None:
+                batch = ledger.filter_new(batch, budget_id, account_id)
+            yield batch
+
+    return Stage("filter", filter_)
+
+
+def push_stage(
+    account_id: str, budget_id: str, push: Optional[PushFunction] = None
+) -> Stage:
+    """Sends each non-empty batch with `push` (`send_to_ynab` by default) and
+    yields its result. The items of this stage are the successful pushes."""
+    # Imported here so that the other stages don't need the YNAB client.
+    from bourso2ynab.ynab import push_succeeded, send_to_ynab
+
+    push = push or send_to_ynab
+
+    def push_(batches: Iterator[Any]) -> Iterator[Any]:
+        for batch in batches:
+            if len(batch) > 0:
+                yield push(batch, account_id, budget_id)
+
+    return Stage("push", push_, count=lambda result: int(push_succeeded(result)))
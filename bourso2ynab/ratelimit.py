@@ -0,0 +1,168 @@
+import os
+import time
+import random
+import threading
+import dataclasses
+from datetime import datetime, timezone
+from dataclasses import dataclass
+from typing import Any, Callable, Mapping, Optional
+
+# YNAB allows 200 requests per hour and per access token (see the README).
+REQUESTS_PER_HOUR = int(os.environ.get("YNAB_REQUESTS_PER_HOUR", 200))
+# Number of times a request is sent again after a 429 (too many requests).
+MAX_THROTTLED_RETRIES = 3
+# Delays are increased by up to this fraction, so that the requests that were
+# throttled together aren't sent again at the same time.
+JITTER = 0.1
+# Delay after a 429 without a `Retry-After` header, doubled at each retry.
+BACKOFF_DELAY = 1.0
+
+
+@dataclass(frozen=True)
+class RateLimiterMetrics:
+    # Number of requests that went through the limiter (retries included).
+    requests: int = 0
+    # Number of requests that had to wait for the quota, and for how long in total.
+    waits: int = 0
+    waited_seconds: float = 0.0
+    # Number of 429 responses.
+    throttled: int = 0
+    # Number of requests that the limiter thinks can be sent right away.
+    remaining: float = 0.0
+
+
+class RateLimiter:
+    """Token bucket that schedules the requests made with an access token: up to
+    `capacity` requests can be sent at once, then `capacity` per `period` seconds.
+    A request for which there is no quota left waits for its turn instead of
+    failing. After a 429 response, no request is sent until the delay given by
+    YNAB (`Retry-After`) or a jittered exponential backoff is over, and the request
+    is sent again, up to `max_retries` times.
+    A lock guards the tokens, the end of the 429 delay and the metrics; the waits
+    themselves happen outside of it."""
+
+    def __init__(
+        self,
+        capacity: int = REQUESTS_PER_HOUR,
+        period: float = 3_600,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        max_retries: int = MAX_THROTTLED_RETRIES,
+    ):
+        self.capacity = capacity
+        self.max_retries = max_retries
+        self.rate = capacity / period
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._blocked_until = 0.0
+        self._metrics = RateLimiterMetrics()
+
+    def acquire(self):
+        """Waits until a request can be sent, and counts it against the quota."""
+        with self._lock:
+            now = self._refill()
+            # The token is taken right away, so that the requests that wait are
+            # served in order.
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate, self._blocked_until - now, 0.0)
+            self._update_metrics(requests=1, waits=int(wait > 0), waited_seconds=wait)
+        if wait > 0:
+            self._sleep(wait)
+
+    def throttle(self, delay: float):
+        """Blocks all the requests for `delay` seconds (e.g. after a 429)."""
+        with self._lock:
+            now = self._refill()
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._update_metrics(throttled=1)
+
+    def sync(self, headers: Optional[Mapping[str, str]]):
+        """Updates the quota from the `X-Rate-Limit` header of a YNAB response
+        (e.g. "36/200": 36 requests were made in the current window)."""
+        used, limit = _parse_rate_limit(headers)
+        if used is None:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, float(limit - used))
+
+    def call(
+        self,
+        func: Callable[..., Any],
+        *args,
+        max_retries: Optional[int] = None,
+        **kwargs,
+    ) -> Any:
+        """Calls `func` once the quota allows it. If it raises an exception with a
+        429 status, it is throttled and called again, up to `max_retries` times
+        (`self.max_retries` by default)."""
+        if max_retries is None:
+            max_retries = self.max_retries
+        for attempt in range(max_retries + 1):
+            self.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                headers = getattr(e, "headers", None)
+                self.sync(headers)
+                if getattr(e, "status", None) != 429 or attempt == max_retries:
+                    raise
+                delay = _parse_retry_after(headers)
+                if delay is None:
+                    delay = BACKOFF_DELAY * 2**attempt
+                self.throttle(delay * (1 + random.uniform(0, JITTER)))
+
+    @property
+    def metrics(self) -> RateLimiterMetrics:
+        with self._lock:
+            self._refill()
+            return dataclasses.replace(self._metrics, remaining=max(self._tokens, 0.0))
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+        return now
+
+    def _update_metrics(self, requests=0, waits=0, waited_seconds=0.0, throttled=0):
+        metrics = self._metrics
+        self._metrics = RateLimiterMetrics(
+            requests=metrics.requests + requests,
+            waits=metrics.waits + waits,
+            waited_seconds=metrics.waited_seconds + waited_seconds,
+            throttled=metrics.throttled + throttled,
+        )
+
+
+def _parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """`Retry-After` is either a number of seconds or an HTTP date."""
+    value = (headers or {}).get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _parse_rate_limit(headers: Optional[Mapping[str, str]]):
+    value = (headers or {}).get("X-Rate-Limit")
+    try:
+        used, limit = map(int, value.split("/"))
+    except (AttributeError, ValueError):
+        return None, None
+    return used, limit
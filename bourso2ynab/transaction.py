@@ -1,10 +1,31 @@
+import os
 import re
 import json
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, replace
 from datetime import date, datetime
-from typing import Literal, Union, Optional, List
-
-import pandas as pd
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Literal,
+    Union,
+    Optional,
+    List,
+    Tuple,
+    Iterable,
+    Iterator,
+)
+
+from bourso2ynab.cache import LRUCache
+from bourso2ynab.dates import parse_iso_date, parse_label_date
+from bourso2ynab.label import (  # noqa: F401
+    TRANSACTION_LABEL_PATTERN,
+    TRANSACTION_LABEL_PROG,
+    match_label,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class UnknownTransactionType(Exception):
@@ -17,24 +38,18 @@ class InvalidBoursoTransaction(Exception):
 
 TransactionType = Literal["VIR", "CARTE", "RETRAIT"]
 
-TRANSACTION_LABEL_PATTERN = (
-    r"^(?P<transaction_type>((CARTE)|(VIR)|(RETRAIT)|(PRLV)))\s"
-    r"(INST\s)?"  # In case of a VIR, the format is: "VIR INST 01/01/70 Payee ..."
-    r"(SEPA\s)?"  # In case of a PRLV, the format is: "PRLV SEPA Payee ..."
-    r"(?P<date>\d{2}/\d{2}/\d{2})?\s?"
-    r"(ZTL\*)?"
-    r"(IZ \*)?"
-    r"(SUMUP \*)?"
-    r"(?P<is_paypal>PAYPAL \*)?"
-    r"(?P<payee>.+?)\s?"
-    r"(SC\s?)?"
-    r"(SA\s?)?"
-    r"(PLC\s?)?"
-    r"(\d+(\D+)?\s?(\d\s?)?)?"  # Catches the random digits and letters after the payee name.
-    r"(-\s?)?"
-    r"(CB\*\d{4})?$"
-).strip()
-TRANSACTION_LABEL_PROG = re.compile(TRANSACTION_LABEL_PATTERN)
+# Parsed labels, keyed on the stripped label. Its statistics are available through
+# `LABEL_CACHE.info()`, and it can be resized (or disabled with 0) at runtime.
+LABEL_CACHE = LRUCache(maxsize=int(os.environ.get("LABEL_CACHE_SIZE", 4096)))
+
+
+@dataclass
+class RowError:
+    """A row of a Bourso export that couldn't be converted into a Transaction.
+    `index` is the index of the row in the original DataFrame."""
+
+    index: int
+    error: Exception
 
 
 @dataclass
@@ -47,61 +62,60 @@ class Transaction:
     index: int = 1  # Used to avoid importing duplicated transactions
 
     @staticmethod
-    def from_pandas(row: pd.Series, format: bool = True):
+    def from_pandas(row: "pd.Series", format: bool = True):
         row = populate_dates(row)
         if not is_valid_bourso_entry(row):
             raise InvalidBoursoTransaction
-        if not format:
-            return Transaction(
-                type=infer_transaction_type(row.label),
-                date=format_date_from_dateVal(row.dateVal),
-                amount=format_amount(row.amount),
-                payee=row.label,
-            )
+        return Transaction.from_fields(
+            label=row.label, date_val=row.dateVal, amount=row.amount, format=format
+        )
 
-        tmp_formatted_transaction = Transaction.from_label(row.label)
-        _date = (
-            tmp_formatted_transaction.date
-            if tmp_formatted_transaction.date is not None
-            else format_date_from_dateVal(row.dateVal)
+    @staticmethod
+    def from_csv_row(row: Dict[str, Optional[str]], format: bool = True):
+        """Same as `from_pandas`, for a row read by `csv.DictReader` (where missing
+        values are empty strings or None)."""
+        row = clean_csv_row(row)
+        return Transaction.from_fields(
+            label=row["label"],
+            date_val=row["dateVal"],
+            amount=row["amount"],
+            format=format,
         )
+
+    @staticmethod
+    def from_fields(
+        label: str, date_val: str, amount: Union[float, str], format: bool = True
+    ):
+        """Creates a Transaction from the `label`, `dateVal` and `amount` fields of
+        a Bourso export."""
         return Transaction(
-            date=_date,
-            amount=format_amount(row.amount),
-            type=tmp_formatted_transaction.type,
-            payee=tmp_formatted_transaction.payee,
-            memo=tmp_formatted_transaction.memo,
+            amount=format_amount(amount), **_fields_from_label(label, date_val, format)
         )
 
+    @staticmethod
+    def from_dataframe(
+        df: "pd.DataFrame", format: bool = True
+    ) -> Tuple[List["Transaction"], List[RowError]]:
+        """Batch equivalent of `from_pandas`, applied to every row of `df` at once.
+        Instead of raising, rows that can't be parsed are reported as `RowError`s."""
+        # Imported here so that this module can be used without pandas.
+        from bourso2ynab.dataframe import transactions_from_dataframe
+
+        return transactions_from_dataframe(df, format=format)
+
     @staticmethod
     def from_label(label: str, errors: Literal["coerce", "raise"] = "coerce"):
-        result = TRANSACTION_LABEL_PROG.match(label.strip())
+        # Bank exports repeat the same labels over and over, so the parsed fields
+        # are cached. A new Transaction is built every time since they are mutable.
+        fields = LABEL_CACHE.get_or_compute(label.strip(), _parse_label_fields)
 
-        if result is None:
+        if fields is None:
             # Unhappy path: parsing has failed.
             if errors == "raise":
                 raise ValueError(f"Can't parse Transaction from label: {label}")
             return Transaction(type=None, date=None, payee=label)
 
-        # Happy path: parsing has succedeed.
-        result = result.groupdict()
-
-        is_VIR = result["transaction_type"] == "VIR"
-
-        formatted_result = {
-            "date": format_date_from_label(result.get("date")),
-            "payee": format_payee_from_label(result.get("payee"), is_VIR=is_VIR),
-            "type": result["transaction_type"],
-        }
-
-        # TODO: add some doc.
-        if is_VIR and formatted_result["payee"] is None:
-            formatted_result["memo"] = result["payee"]
-
-        if not is_VIR and result.get("is_paypal") is not None:
-            formatted_result["memo"] = "(via Paypal)"
-
-        return Transaction(**formatted_result)
+        return Transaction(**dict(fields))
 
     @staticmethod
     def from_flask_json(entry: str):
@@ -203,25 +217,165 @@ class Transaction:
             index=new_index,
         )
 
+    @property
+    def milliunits(self) -> int:
+        """The amount in thousandths of a euro, as expected by YNAB."""
+        return int(round(self.amount * 1_000))
+
     @property
     def import_id(self) -> str:
-        amount_in_mili_currency = int(round(self.amount * 1_000))
-        amount_in_mili_currency_str = str(amount_in_mili_currency)
+        amount_in_mili_currency_str = str(self.milliunits)
         formated_date = self.date.strftime("%Y-%m-%d")
 
         return f"YNAB:{amount_in_mili_currency_str}:{formated_date}:{self.index}"
 
 
-def populate_dates(row: pd.Series) -> pd.Series:
+@dataclass(slots=True)
+class CompactTransaction:
+    """A lighter, slotted variant of `Transaction` that holds its amount as integer
+    milliunits (see `format_amount_to_milliunits`) instead of a float. It has the
+    same API, so it can be pushed and deduplicated like a `Transaction`."""
+
+    type: TransactionType
+    date: date
+    milliunits: int = None
+    payee: str = None
+    memo: str = None
+    index: int = 1
+
+    @staticmethod
+    def from_csv_row(row: Dict[str, Optional[str]], format: bool = True):
+        """Same as `Transaction.from_csv_row`."""
+        row = clean_csv_row(row)
+        return CompactTransaction.from_fields(
+            label=row["label"],
+            date_val=row["dateVal"],
+            amount=row["amount"],
+            format=format,
+        )
+
+    @staticmethod
+    def from_fields(
+        label: str, date_val: str, amount: Union[float, str], format: bool = True
+    ):
+        """Same as `Transaction.from_fields`."""
+        return CompactTransaction(
+            milliunits=format_amount_to_milliunits(amount),
+            **_fields_from_label(label, date_val, format),
+        )
+
+    @staticmethod
+    def from_transaction(transaction: Transaction):
+        return CompactTransaction(
+            type=transaction.type,
+            date=transaction.date,
+            milliunits=transaction.milliunits,
+            payee=transaction.payee,
+            memo=transaction.memo,
+            index=transaction.index,
+        )
+
+    def to_transaction(self) -> Transaction:
+        return Transaction(
+            type=self.type,
+            date=self.date,
+            amount=self.amount,
+            payee=self.payee,
+            memo=self.memo,
+            index=self.index,
+        )
+
+    @property
+    def amount(self) -> Optional[float]:
+        return self.milliunits / 1_000 if self.milliunits is not None else None
+
+    def to_html(self, *args, **kwargs) -> str:
+        return Transaction.to_html(self, *args, **kwargs)
+
+    def copy_with_new_index(self, new_index: int):
+        return replace(self, index=new_index)
+
+    @property
+    def import_id(self) -> str:
+        return f"YNAB:{self.milliunits}:{self.date:%Y-%m-%d}:{self.index}"
+
+
+def clean_csv_row(row: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """Replaces the missing values of a row read by `csv.DictReader` (empty strings)
+    by None, and populates `dateVal` like `populate_dates`. Raises if the row isn't a
+    valid Bourso entry."""
+    row = {key: value if value else None for key, value in row.items()}
+    if row.get("dateVal") is None and "dateVal" in row:
+        row["dateVal"] = row.get("dateOp")
+    for key in ["dateVal", "label", "amount"]:
+        if row.get(key) is None:
+            raise InvalidBoursoTransaction
+    return row
+
+
+def _fields_from_label(
+    label: str, date_val: str, format: bool = True
+) -> Dict[str, object]:
+    """The fields of a Transaction (all but its amount) from the `label` and
+    `dateVal` fields of a Bourso export."""
+    if not format:
+        return {
+            "type": infer_transaction_type(label),
+            "date": format_date_from_dateVal(date_val),
+            "payee": label,
+        }
+
+    tmp_formatted_transaction = Transaction.from_label(label)
+    _date = (
+        tmp_formatted_transaction.date
+        if tmp_formatted_transaction.date is not None
+        else format_date_from_dateVal(date_val)
+    )
+    return {
+        "date": _date,
+        "type": tmp_formatted_transaction.type,
+        "payee": tmp_formatted_transaction.payee,
+        "memo": tmp_formatted_transaction.memo,
+    }
+
+
+def populate_dates(row: "pd.Series") -> "pd.Series":
     """For some transactions, the `dateVal` is set to NaN whilst the `dateOp` is valid.
     bourso2ynab primarily uses `dateVal`. As a quick bypass, we populate the `dateVal`
     field with the content of `dateOp`."""
+    import pandas as pd
+
     if "dateOp" in row.keys() and "dateVal" in row.keys():
         if pd.isnull(row["dateVal"]) and not pd.isnull(row["dateOp"]):
             row["dateVal"] = row["dateOp"]
     return row
 
 
+def _parse_label_fields(label: str) -> Optional[Tuple[Tuple[str, object], ...]]:
+    """Parses a stripped label into the (immutable) fields of a Transaction, or
+    None if the label can't be parsed."""
+    result = match_label(label)
+    if result is None:
+        return None
+
+    is_VIR = result["transaction_type"] == "VIR"
+
+    formatted_result = {
+        "date": format_date_from_label(result.get("date")),
+        "payee": format_payee_from_label(result.get("payee"), is_VIR=is_VIR),
+        "type": result["transaction_type"],
+    }
+
+    # TODO: add some doc.
+    if is_VIR and formatted_result["payee"] is None:
+        formatted_result["memo"] = result["payee"]
+
+    if not is_VIR and result.get("is_paypal") is not None:
+        formatted_result["memo"] = "(via Paypal)"
+
+    return tuple(formatted_result.items())
+
+
 def format_payee_from_label(payee: Optional[str], is_VIR: bool) -> Optional[str]:
     if payee is None:
         return payee
@@ -250,14 +404,14 @@ def format_date_from_label(_date: Optional[str]) -> Optional[date]:
     if _date is None:
         return _date
 
-    return datetime.strptime(_date, "%d/%m/%y").date()
+    return parse_label_date(_date)
 
 
 def format_date_from_dateVal(_date: Optional[str]) -> Optional[date]:
     if _date is None:
         return _date
 
-    return datetime.strptime(_date, "%Y-%m-%d").date()
+    return parse_iso_date(_date)
 
 
 def format_amount(amount: Union[float, str]) -> float:
@@ -269,7 +423,27 @@ def format_amount(amount: Union[float, str]) -> float:
     return float(amount)
 
 
-def is_valid_bourso_entry(row: pd.Series) -> bool:
+def format_amount_to_milliunits(amount: Union[float, str]) -> int:
+    """Same as `format_amount`, in milliunits (thousandths of a euro). French
+    formatted strings (e.g. "-1 234,56") are parsed as integers, without going
+    through a float."""
+    if isinstance(amount, (float, int)):
+        return int(round(amount * 1_000))
+
+    normalized = amount.replace(" ", "")
+    sign = -1 if normalized.startswith("-") else 1
+    units, _, decimals = normalized.lstrip("+-").partition(",")
+    if units.isdecimal() and (decimals == "" or decimals.isdecimal()):
+        if len(decimals) <= 3:
+            return sign * (int(units) * 1_000 + int(decimals.ljust(3, "0")))
+
+    # E.g. "1.5", or more than 3 decimals.
+    return int(round(format_amount(amount) * 1_000))
+
+
+def is_valid_bourso_entry(row: "pd.Series") -> bool:
+    import pandas as pd
+
     for key in ["dateVal", "label", "amount"]:
         if key not in row.keys() or pd.isnull(row[key]):
             return False
@@ -286,24 +460,95 @@ def infer_transaction_type(transaction_label: str) -> TransactionType:
     raise UnknownTransactionType
 
 
-def make_import_ids_unique(transactions: List[Transaction]) -> List[Transaction]:
-    transactions = sorted(transactions, key=lambda t: t.import_id)
-    new_transactions = [transactions[0]]
+def make_import_ids_unique(
+    transactions: List[Transaction], keep_order: bool = False
+) -> List[Transaction]:
+    """Gives a new index to the transactions that share their import ID with a
+    previous one, so that YNAB doesn't discard them as duplicates. The transactions
+    are returned sorted by import ID, or in their original order if `keep_order`.
+    Either way, the n-th occurrence of an import ID gets `index + n - 1`."""
+    # Imported here to avoid a circular import.
+    from bourso2ynab.batch import TransactionBatch
+
+    if isinstance(transactions, TransactionBatch):
+        return transactions.make_import_ids_unique(keep_order=keep_order)
+
+    # `import_id` formats the date and amount every time it's read: it is only
+    # computed once per transaction.
+    import_ids = [transaction.import_id for transaction in transactions]
+    positions = range(len(transactions))
+    if not keep_order:
+        # The sort is stable, so duplicates get the same indices in both orders.
+        positions = sorted(positions, key=import_ids.__getitem__)
+
+    occurrences = {}
+    new_transactions = []
+    for position in positions:
+        transaction = transactions[position]
+        import_id = import_ids[position]
+        occurrence = occurrences[import_id] = occurrences.get(import_id, 0) + 1
+        if occurrence > 1:
+            transaction = transaction.copy_with_new_index(
+                transaction.index + occurrence - 1
+            )
+        new_transactions.append(transaction)
 
-    for left, right in zip(transactions[:-1], transactions[1:]):
-        if left.import_id != right.import_id:
-            # The original transactions were different. Nothing to do.
-            new_transactions.append(right)
-            continue
+    return new_transactions
 
-        new_index = new_transactions[-1].index + 1
-        new_transaction = right.copy_with_new_index(new_index)
-        new_transactions.append(new_transaction)
 
-    return new_transactions
+def merge_overlapping_exports(
+    exports: Iterable[List[Transaction]],
+) -> List[Transaction]:
+    """Merges the transactions of several exports of the same account, whose periods
+    may overlap. A transaction that appears n times in an export (e.g. two coffees
+    of the same price on the same day) is kept as many times as in the export where
+    it appears the most, so overlapping rows are only kept once."""
+    merged, counts = [], {}
+    for transactions in exports:
+        export_counts = Counter()
+        for transaction in transactions:
+            key = (
+                transaction.type,
+                transaction.date,
+                transaction.milliunits,
+                transaction.payee,
+                transaction.memo,
+                transaction.index,
+            )
+            export_counts[key] += 1
+            if export_counts[key] > counts.get(key, 0):
+                counts[key] = export_counts[key]
+                merged.append(transaction)
+    return merged
+
+
+def iter_unique_import_ids(
+    batches: Iterable[List[Transaction]],
+) -> Iterator[List[Transaction]]:
+    """Streaming version of `make_import_ids_unique`, for batches that are consumed
+    as they arrive (see `bourso2ynab.io.iter_bourso_transactions`).
+    Duplicated import IDs are made unique across all the batches, in order of
+    arrival, which gives the same indices as `make_import_ids_unique`. Unlike the
+    latter, the transactions aren't sorted."""
+    occurrences = Counter()
+    for batch in batches:
+        new_batch = []
+        for transaction in batch:
+            import_id = transaction.import_id
+            occurrences[import_id] += 1
+            if occurrences[import_id] > 1:
+                new_index = transaction.index + occurrences[import_id] - 1
+                transaction = transaction.copy_with_new_index(new_index)
+            new_batch.append(transaction)
+        yield new_batch
 
 
 def remove_future_transactions(transactions: List[Transaction]) -> List[Transaction]:
+    from bourso2ynab.batch import TransactionBatch
+
+    if isinstance(transactions, TransactionBatch):
+        return transactions.remove_future_transactions()
+
     today = datetime.today().date()
     return [transaction for transaction in transactions if transaction.date <= today]
 
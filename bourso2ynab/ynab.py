@@ -1,20 +1,89 @@
 import os
 import json
+import atexit
+import time
+import threading
 from pathlib import Path
+from urllib.parse import quote
 from datetime import datetime
-from typing import Literal, Optional, List
-
-import ynab_api as ynab
-from ynab_api.api.transactions_api import TransactionsApi
-from ynab_api.model.save_transaction import SaveTransaction
-from ynab_api.model.save_transactions_wrapper import SaveTransactionsWrapper
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Literal,
+    Optional,
+    List,
+    Tuple,
+    Union,
+)
 
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.ledger import ImportLedger
+from bourso2ynab.payload import serialize_transactions
+from bourso2ynab.ratelimit import REQUESTS_PER_HOUR, RateLimiter
 from bourso2ynab.transaction import (
+    CompactTransaction,
     Transaction,
     make_import_ids_unique,
     remove_future_transactions,
 )
 
+# `ynab_api` (and `urllib3`) are only imported when a request is made: together they
+# take longer to import than the rest of the CLI (see `benchmarks/bench_startup.py`).
+if TYPE_CHECKING:
+    import ynab_api as ynab
+
+
+@dataclass(frozen=True)
+class Secrets:
+    """The content of `secrets.json`, with the usernames and the account types in
+    the order of the file."""
+
+    budgets: Dict[str, str]
+    accounts: Dict[str, Dict[str, str]]
+    usernames: Tuple[str, ...]
+    account_types: Tuple[str, ...]
+
+    @staticmethod
+    def from_dict(secrets: Dict[str, Any]) -> "Secrets":
+        usernames = tuple(secrets["budgets"])
+        # I don't use a `set` because I want to preserve ordering.
+        account_types = {}
+        for username in usernames:
+            account_types.update(dict.fromkeys(secrets["accounts"][username]))
+        return Secrets(
+            budgets=secrets["budgets"],
+            accounts=secrets["accounts"],
+            usernames=usernames,
+            account_types=tuple(account_types),
+        )
+
+
+_secrets: Dict[Path, Tuple[Tuple[int, int, int], Secrets]] = {}
+_secrets_lock = threading.Lock()
+
+
+def load_secrets(secrets_path: Path = Path("secrets.json")) -> Secrets:
+    """Returns the content of `secrets_path`. It is only read again once the file
+    has changed (its inode, modification time or size), so looking IDs up on every
+    request only costs a `stat`."""
+    secrets_path = Path(secrets_path).absolute()
+    stat = secrets_path.stat()
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _secrets_lock:
+        cached = _secrets.get(secrets_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with secrets_path.open("r") as f:
+        secrets = Secrets.from_dict(json.load(f))
+    with _secrets_lock:
+        _secrets[secrets_path] = (version, secrets)
+    return secrets
+
 
 def get_ynab_id(
     id_type: Literal["budget", "account"],
@@ -23,72 +92,404 @@ def get_ynab_id(
     secrets_path: Path = Path("secrets.json"),
 ) -> str:
     """Utility function to retrieve YNAB IDs from within the env vars."""
-    with secrets_path.open("r") as f:
-        secrets = json.load(f)
+    secrets = load_secrets(secrets_path)
     if id_type == "budget":
-        return secrets["budgets"][username]
+        return secrets.budgets[username]
     assert (
         account_type is not None
     ), "An account type (perso/joint) is required when accessing Accounts."
-    return secrets["accounts"][username][account_type]
+    return secrets.accounts[username][account_type]
 
 
 def get_all_available_usernames(secrets_path: Path = Path("secrets.json")) -> List[str]:
-    with secrets_path.open("r") as f:
-        secrets = json.load(f)
-
-    usernames = []
-    for username, _ in secrets["budgets"].items():
-        usernames.append(username)
-
-    return usernames
+    return list(load_secrets(secrets_path).usernames)
 
 
 def get_all_available_account_types(
     secrets_path: Path = Path("secrets.json"),
 ) -> List[str]:
-    with secrets_path.open("r") as f:
-        secrets = json.load(f)
+    return list(load_secrets(secrets_path).account_types)
+
 
-    account_types = []
-    usernames = get_all_available_usernames(secrets_path)
-    for username in usernames:
-        for account_type, _ in secrets["accounts"][username].items():
-            # I don't use a `set` because I want to preserve ordering.
-            if account_type not in account_types:
-                account_types.append(account_type)
+# Can point to a local stand-in, e.g. for load tests (see `tests/support/fake_ynab.py`).
+API_HOST = os.environ.get("YNAB_API_HOST", "https://api.ynab.com/v1")
 
-    return account_types
+NOTHING_TO_PUSH = "All the transactions were already pushed to YNAB."
+
+# Number of transactions sent per request: large backfills would otherwise time out.
+CHUNK_SIZE = int(os.environ.get("YNAB_CHUNK_SIZE", 500))
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("YNAB_MAX_CONCURRENT_REQUESTS", 4))
+# Number of connections kept alive per client. By default, enough for one push.
+CONNECTION_POOL_SIZE = int(
+    os.environ.get("YNAB_CONNECTION_POOL_SIZE", MAX_CONCURRENT_REQUESTS)
+)
+# Number of times a chunk is sent again if it failed.
+MAX_RETRIES = int(os.environ.get("YNAB_MAX_RETRIES", 2))
+RETRY_DELAY = 1.0
 
 
-def push_to_ynab(transactions: List[Transaction], account_id: str, budget_id: str):
-    configuration = ynab.Configuration(host="https://api.ynab.com/v1")
-    configuration.api_key["bearer"] = os.environ["YNAB_API_KEY"]
-    configuration.api_key_prefix["bearer"] = "Bearer"
-    api = TransactionsApi(ynab.ApiClient(configuration))
+def _ynab():
+    """`ynab_api`, only imported when a request is made (see the imports above)."""
+    import ynab_api
 
+    return ynab_api
+
+
+_api_clients: Dict[Tuple[str, str], "ynab.ApiClient"] = {}
+_rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_api_clients_lock = threading.Lock()
+
+
+def get_api_client(
+    api_key: Optional[str] = None,
+    host: Optional[str] = None,
+    pool_maxsize: Optional[int] = None,
+):
+    """Returns the client of the process for `host` and `api_key` (`YNAB_API_KEY` by
+    default). Its connections are kept alive and reused by every push (whatever the
+    user or the chunk), so that only the first request pays for the TCP and TLS
+    handshakes. See `close_api_clients`.
+    It keeps up to `pool_maxsize` connections (`CONNECTION_POOL_SIZE` by default):
+    as many as the requests sent at the same time through it. It is only used when
+    the client is created."""
+    ynab = _ynab()
+
+    if api_key is None:
+        api_key = os.environ["YNAB_API_KEY"]
+    host = host or API_HOST
+    with _api_clients_lock:
+        api_client = _api_clients.get((host, api_key))
+        if api_client is None:
+            configuration = ynab.Configuration(host=host)
+            configuration.api_key["bearer"] = api_key
+            configuration.api_key_prefix["bearer"] = "Bearer"
+            configuration.connection_pool_maxsize = max(
+                configuration.connection_pool_maxsize,
+                pool_maxsize or CONNECTION_POOL_SIZE,
+            )
+            api_client = ynab.ApiClient(configuration)
+            _api_clients[(host, api_key)] = api_client
+    return api_client
+
+
+def get_rate_limiter(api_key: Optional[str] = None, host: Optional[str] = None):
+    """Returns the `RateLimiter` of the process for `host` and `api_key`
+    (`YNAB_API_KEY` by default): YNAB's quota is per access token."""
+    if api_key is None:
+        api_key = os.environ["YNAB_API_KEY"]
+    host = host or API_HOST
+    with _api_clients_lock:
+        rate_limiter = _rate_limiters.get((host, api_key))
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(capacity=REQUESTS_PER_HOUR)
+            _rate_limiters[(host, api_key)] = rate_limiter
+    return rate_limiter
+
+
+def close_api_clients():
+    """Closes the connections of the clients returned by `get_api_client`. The next
+    call to `get_api_client` creates a new client."""
+    with _api_clients_lock:
+        api_clients = list(_api_clients.values())
+        _api_clients.clear()
+    for api_client in api_clients:
+        api_client.close()
+        api_client.rest_client.pool_manager.clear()
+
+
+# The clients are shared by all the pushes of the process: their connections are
+# only closed when it exits.
+atexit.register(close_api_clients)
+
+
+@dataclass
+class PushSummary:
+    """The merged results of the chunks sent by `send_to_ynab`."""
+
+    chunks: int = 0
+    # Number of times a chunk was sent again after failing.
+    retries: int = 0
+    # Import IDs of the transactions that YNAB created or rejected as duplicates.
+    created_import_ids: List[str] = field(default_factory=list)
+    duplicate_import_ids: List[str] = field(default_factory=list)
+    # Import IDs of the transactions of the chunks that couldn't be sent.
+    failed_import_ids: List[str] = field(default_factory=list)
+    errors: List[Exception] = field(default_factory=list)
+    # The response of each chunk that was sent, in order.
+    responses: List[Any] = field(default_factory=list, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def add_response(self, response):
+        created, duplicates = _parse_response(response)
+        self.created_import_ids.extend(created)
+        self.duplicate_import_ids.extend(duplicates)
+        self.responses.append(response)
+
+    def add_failure(self, transactions, error: Exception):
+        self.failed_import_ids.extend(t.import_id for t in transactions)
+        self.errors.append(error)
+
+    def __str__(self) -> str:
+        lines = [
+            f"Sent {self.chunks - len(self.errors)}/{self.chunks} chunks "
+            f"({self.retries} retries).",
+            f"Created: {len(self.created_import_ids)} transactions.",
+            f"Duplicates: {len(self.duplicate_import_ids)} transactions.",
+        ]
+        if self.errors:
+            lines.append(
+                f"Failed: {len(self.failed_import_ids)} transactions "
+                f"({len(self.errors)} chunks)."
+            )
+            lines.extend(f"  {error}" for error in self.errors)
+        return "\n".join(lines)
+
+
+def push_succeeded(result) -> bool:
+    """Whether all the transactions of a push were sent (see `PushSummary.ok`)."""
+    return result is not None and getattr(result, "ok", True)
+
+
+def push_to_ynab(
+    transactions: Union[List[Transaction], List[CompactTransaction], TransactionBatch],
+    account_id: str,
+    budget_id: str,
+    ledger: Optional[ImportLedger] = None,
+):
+    """Pushes `transactions` to the account. If a `ledger` is provided, the
+    transactions that it knows were already pushed are skipped, and it is updated
+    with the import IDs that YNAB created or reported as duplicates."""
     transactions = make_import_ids_unique(transactions)
     # The YNAB API doesn't accept transactions that are dated in the future.
     # We still want to submit all transactions that are dated in the past though,
     # so we filter the future transactions out.
     transactions = remove_future_transactions(transactions)
-    ynab_transactions = SaveTransactionsWrapper(
-        transactions=[
-            SaveTransaction(
-                account_id=account_id,
-                date=transaction.date,
-                amount=int(transaction.amount * 1_000),
-                payee_name=transaction.payee,
-                memo=transaction.memo,
-                approved=True,
-                cleared="uncleared",
-                import_id=transaction.import_id,
-            )
-            for transaction in transactions
-        ]
+    if ledger is not None:
+        transactions = ledger.filter_new(transactions, budget_id, account_id)
+        if not transactions:
+            # Not a failure (which would return None): there's nothing new.
+            return NOTHING_TO_PUSH
+    return send_to_ynab(transactions, account_id, budget_id, ledger=ledger)
+
+
+def send_to_ynab(
+    transactions: Iterable[Union[Transaction, CompactTransaction]],
+    account_id: str,
+    budget_id: str,
+    ledger: Optional[ImportLedger] = None,
+    chunk_size: Optional[int] = None,
+    max_concurrent_requests: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    retry_delay: float = RETRY_DELAY,
+    api_client: Optional["ynab.ApiClient"] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Optional[PushSummary]:
+    """Sends `transactions` as they are: unlike `push_to_ynab`, their import IDs
+    aren't made unique and they aren't filtered.
+
+    They are sent by chunks of `chunk_size`, with at most `max_concurrent_requests`
+    requests at a time (see `CHUNK_SIZE` and `MAX_CONCURRENT_REQUESTS`). A chunk that
+    fails for a reason that may be temporary (e.g. a timeout or a server error) is
+    sent again, up to `max_retries` times, waiting `retry_delay` seconds more each
+    time. The chunks that succeeded aren't sent again.
+
+    Returns the summary of all the chunks, or None if none of them could be sent.
+    If a `ledger` is provided, it is updated with the response of each chunk.
+    The requests go through `api_client` and are scheduled by `rate_limiter`, or the
+    shared ones (see `get_api_client` and `get_rate_limiter`)."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    max_concurrent_requests = max_concurrent_requests or MAX_CONCURRENT_REQUESTS
+    max_retries = max_retries if max_retries is not None else MAX_RETRIES
+
+    api_client = api_client or get_api_client()
+    rate_limiter = rate_limiter or get_rate_limiter()
+
+    if not isinstance(transactions, (list, TransactionBatch)):
+        transactions = list(transactions)
+    chunks = [
+        transactions[start : start + chunk_size]
+        for start in range(0, len(transactions), chunk_size)
+    ]
+
+    def send(chunk):
+        response = _send_chunk(api_client, rate_limiter, chunk, account_id, budget_id)
+        if ledger is not None and not isinstance(response, Exception):
+            ledger.record(_get_known_import_ids(response), budget_id, account_id)
+        return response
+
+    summary = PushSummary(chunks=len(chunks))
+    pending = list(range(len(chunks)))
+    responses = {}
+    with ThreadPoolExecutor(max_workers=max_concurrent_requests) as executor:
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                time.sleep(retry_delay * attempt)
+            results = executor.map(send, [chunks[i] for i in pending])
+            failed = []
+            for i, response in zip(pending, results):
+                if isinstance(response, Exception):
+                    if _is_retryable(response) and attempt < max_retries:
+                        failed.append(i)
+                    else:
+                        summary.add_failure(chunks[i], response)
+                else:
+                    responses[i] = response
+            summary.retries += len(failed)
+            pending = failed
+            if not pending:
+                break
+
+    for i in sorted(responses):
+        summary.add_response(responses[i])
+
+    if chunks and not responses:
+        return None
+    return summary
+
+
+def sync_from_ynab(
+    ledger: ImportLedger,
+    account_id: str,
+    budget_id: str,
+    api_client: Optional["ynab.ApiClient"] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Optional[int]:
+    """Fetches the transactions of the account that changed since the last sync
+    (only the first sync fetches all of them, thanks to `last_knowledge_of_server`)
+    and records their import IDs in `ledger`, so that the transactions that are
+    already in YNAB are dropped before they are sent (see `ImportLedger.filter_new`).
+    Returns the number of import IDs that were fetched, or None if the request
+    failed."""
+    import urllib3
+    from ynab_api.api.transactions_api import TransactionsApi
+
+    ynab = _ynab()
+
+    api = TransactionsApi(api_client or get_api_client())
+    rate_limiter = rate_limiter or get_rate_limiter()
+
+    kwargs = {}
+    server_knowledge = ledger.get_server_knowledge(budget_id, account_id)
+    if server_knowledge is not None:
+        kwargs["last_knowledge_of_server"] = server_knowledge
+    try:
+        # With the headers, for the quota left (`X-Rate-Limit`).
+        response, _, headers = rate_limiter.call(
+            api.get_transactions_by_account,
+            budget_id,
+            account_id,
+            _return_http_data_only=False,
+            **kwargs,
+        )
+    except (ynab.rest.ApiException, urllib3.exceptions.HTTPError) as e:
+        print(
+            "Exception when calling TransactionsApi->get_transactions_by_account: %s\n"
+            % e
+        )
+        return None
+    rate_limiter.sync(headers)
+
+    import_ids = [
+        transaction.import_id
+        for transaction in response.data.transactions
+        if getattr(transaction, "import_id", None)
+        and not getattr(transaction, "deleted", False)
+    ]
+    ledger.record_sync(
+        import_ids, response.data.server_knowledge, budget_id, account_id
     )
+    return len(import_ids)
+
 
+def _send_chunk(
+    api_client: "ynab.ApiClient",
+    rate_limiter: RateLimiter,
+    transactions,
+    account_id: str,
+    budget_id: str,
+):
+    """Returns the response, or the exception if the request failed."""
+    import urllib3
+
+    ynab = _ynab()
+    body = serialize_transactions(transactions, account_id)
     try:
-        return api.create_transaction(budget_id, ynab_transactions)
-    except ynab.rest.ApiException as e:
+        return rate_limiter.call(
+            _post_transactions, api_client, budget_id, body, rate_limiter=rate_limiter
+        )
+    except (ynab.rest.ApiException, urllib3.exceptions.HTTPError) as e:
         print("Exception when calling TransactionsApi->create_transaction: %s\n" % e)
+        return e
+
+
+def _post_transactions(
+    api_client: "ynab.ApiClient",
+    budget_id: str,
+    body: bytes,
+    rate_limiter: Optional[RateLimiter] = None,
+):
+    """Same as `TransactionsApi.create_transaction`, with a body that is already
+    serialized (see `bourso2ynab.payload`): the generated client only accepts
+    `SaveTransaction` models, which are slow to create and to serialize.
+    The quota left (`X-Rate-Limit`) is passed on to `rate_limiter`."""
+    from ynab_api.model.save_transactions_response import SaveTransactionsResponse
+
+    ynab = _ynab()
+
+    configuration = api_client.configuration
+    resource_path = "/budgets/%s/transactions" % quote(
+        str(budget_id), safe=configuration.safe_chars_for_path_param
+    )
+    headers = {
+        **api_client.default_headers,
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+    }
+    api_client.update_params_for_auth(
+        headers, [], ["bearer"], resource_path, "POST", body
+    )
+    response = ynab.rest.RESTResponse(
+        api_client.rest_client.pool_manager.request(
+            "POST", configuration.host + resource_path, body=body, headers=headers
+        )
+    )
+    if not 200 <= response.status <= 299:
+        error = ynab.rest.ApiException(http_resp=response)
+        error.body = error.body.decode("utf-8")
+        raise error
+    if rate_limiter is not None:
+        rate_limiter.sync({"X-Rate-Limit": response.getheader("X-Rate-Limit")})
+    response.data = response.data.decode("utf-8")
+    return api_client.deserialize(response, (SaveTransactionsResponse,), True)
+
+
+def _is_retryable(error: Exception) -> bool:
+    ynab = _ynab()
+
+    if isinstance(error, ynab.rest.ApiException):
+        # Network errors have no status. 4xx errors would fail again, and 429s (too
+        # many requests) were already retried by the rate limiter, after the delay
+        # given by YNAB.
+        return error.status is None or error.status >= 500
+    return True
+
+
+def _get_known_import_ids(response) -> List[str]:
+    """The import IDs that YNAB knows of after a push: the ones of the created
+    transactions, and the ones it rejected as duplicates."""
+    created, duplicates = _parse_response(response)
+    return created + duplicates
+
+
+def _parse_response(response) -> Tuple[List[str], List[str]]:
+    """The import IDs of the created transactions and the duplicated ones."""
+    data = getattr(response, "data", None)
+    created = getattr(data, "transactions", None) or []
+    duplicates = getattr(data, "duplicate_import_ids", None) or []
+    import_ids = [getattr(transaction, "import_id", None) for transaction in created]
+    return [import_id for import_id in import_ids if import_id], [
+        import_id for import_id in duplicates if import_id
+    ]
@@ -1,12 +1,20 @@
+import atexit
 import shutil
 from pathlib import Path
 from datetime import date
 
 from flask import session
 
-from bourso2ynab.ynab import get_ynab_id
+from app import create_app
+
+from bourso2ynab.ynab import MAX_CONCURRENT_REQUESTS, close_api_clients, get_ynab_id
+from bourso2ynab.ledger import ImportLedger
 from bourso2ynab.transaction import Transaction
+from app.database import SqlitePayeeRenames
 from app.main import (
+    MAX_CONCURRENT_JOBS,
+    MAX_CONCURRENT_PUSHES,
+    _get_api_client,
     _update_transactions_based_on_db,
     _update_transactions_based_on_form,
     _update_db_based_on_transactions_changes,
@@ -216,6 +224,38 @@ def test_push_to_ynab_with_joint_account_updates_two_accounts(
     assert call_counter == 2
 
 
+def test_push_to_ynab_with_joint_account_shows_every_result(
+    client,
+    mocker,
+    ynab_secrets_filepath,
+    ynab_mocker,
+):
+    def mock_push_to_ynab(transactions, account_id, budget_id):
+        return f"Pushed to {account_id}"
+
+    mocker.patch("app.main._push_to_ynab", mock_push_to_ynab)
+
+    with client.session_transaction() as session:
+        session["transactions"] = [
+            Transaction(
+                type="CARTE",
+                amount=-12.34,
+                date=date(year=1970, month=1, day=1),
+                payee="Monsieur",
+            ),
+        ]
+        session["username"] = "user1"
+        session["account-type"] = "joint"
+
+    response = client.post(
+        "/ynab/push",
+        data={"payee-input-text-0": "Monsieur", "memo-input-text-0": ""},
+    )
+
+    assert "user1" in response.text and "Pushed to 4567" in response.text
+    assert "user2" in response.text and "Pushed to 1111" in response.text
+
+
 def test_update_transactions_based_on_form():
     transactions = [
         Transaction(
@@ -338,6 +378,33 @@ def test_push_to_ynab_when_modifying_entries_updates_the_db(client, ynab_mocker,
     assert entry["adjusted"] == "John"
 
 
+def test_payee_renames_can_be_stored_in_sqlite(client, ynab_mocker, db, mocker):
+    renames = SqlitePayeeRenames()
+    renames.set("Madame", "Jane")
+    mocker.patch("app.main.renames", renames)
+    transactions = [
+        Transaction(type="CARTE", date=date(1970, 1, 1), amount=-1.0, payee="Sncf"),
+        Transaction(type="CARTE", date=date(1970, 1, 2), amount=-2.0, payee="Madame"),
+    ]
+
+    # The PysonDB isn't used anymore.
+    updated = _update_transactions_based_on_db(transactions)
+    assert [t.payee for t in updated] == ["Sncf", "Jane"]
+
+    updated = _update_transactions_based_on_form(
+        transactions,
+        {
+            "payee-input-text-0": "SNCF",
+            "memo-input-text-0": "",
+            "payee-input-text-1": "Jeanne",
+            "memo-input-text-1": "",
+        },
+    )
+    _update_db_based_on_transactions_changes(transactions, updated)
+    assert renames.items() == {"Sncf": "SNCF", "Madame": "Jeanne"}
+    assert len(db.get_all()) == 2
+
+
 def test_db_is_used_to_update_payee_name(
     client, ynab_mocker, db, transactions_csv_filepath, tmpdir
 ):
@@ -716,3 +783,60 @@ def test_db_doesnt_get_updated_with_useless_entries(
         # We still should have no "Monsieur"-related entries in the db.
         entries = db.get_by_query(lambda data: data["original"] == "Monsieur")
         assert len(entries) == 0
+
+
+def test_uploads_do_not_read_the_pushed_range_again(
+    client, ynab_mocker, ynab_secrets_filepath, transactions_csv_filepath, mocker
+):
+    ledger = ImportLedger()
+    mocker.patch("app.main.ledger", ledger)
+    mocker.patch("app.main.GRACE_DAYS", 3)
+
+    def upload():
+        with client:
+            client.post(
+                "/csv/upload",
+                data={
+                    "transactions-file": transactions_csv_filepath.open("rb"),
+                    "username": "user1",
+                    "account-type": "perso",
+                },
+            )
+            return len(session["transactions"])
+
+    assert upload() == 5
+    client.post(
+        "/ynab/push",
+        data={
+            key: ""
+            for i in range(5)
+            for key in [f"payee-input-text-{i}", f"memo-input-text-{i}"]
+        },
+    )
+    budget_id = get_ynab_id("budget", "user1", secrets_path=ynab_secrets_filepath)
+    assert ledger.get_pushed_range(budget_id, "0123") == (
+        date(2022, 6, 8),
+        date(2022, 6, 15),
+    )
+
+    # Only the rows of the last 3 days of the range are read again.
+    assert upload() == 2
+
+
+def test_api_client_has_a_connection_per_concurrent_request(monkeypatch):
+    monkeypatch.setenv("YNAB_API_KEY", "1234")
+    close_api_clients()
+
+    maxsize = _get_api_client().configuration.connection_pool_maxsize
+    assert (
+        maxsize == MAX_CONCURRENT_JOBS * MAX_CONCURRENT_PUSHES * MAX_CONCURRENT_REQUESTS
+    )
+    close_api_clients()
+
+
+def test_create_app_doesnt_register_exit_handlers(mocker):
+    # `close_api_clients` is registered once, when `bourso2ynab.ynab` is imported.
+    register = mocker.spy(atexit, "register")
+    create_app()
+    create_app()
+    register.assert_not_called()
@@ -1,3 +1,17 @@
+import sqlite3
+
+from click.testing import CliRunner
+from pysondb import PysonDB
+
+from app.database import (
+    PayeeRenames,
+    SqlitePayeeRenames,
+    get_payee_renames,
+    migrate_from_pysondb,
+    migrate_renames,
+)
+
+
 def test_db_exists(db):
     assert len(db.get_all()) == 2
 
@@ -7,3 +21,81 @@ def test_db_exists(db):
     key = list(results.keys())[0]
     assert results[key]["original"] == "Sncf"
     assert results[key]["adjusted"] == "SNCF"
+
+
+def test_payee_renames(db):
+    payee_renames = PayeeRenames(db)
+    assert payee_renames.get("Sncf") == "SNCF"
+    assert payee_renames.get("Monsieur") is None
+
+    payee_renames.set("Monsieur", "John")
+    payee_renames.set("Sncf", "Train")
+    assert payee_renames.get("Monsieur") == "John"
+    assert payee_renames.get("Sncf") == "Train"
+
+    # The DB is updated, without duplicates.
+    entries = PysonDB(db.filename).get_all().values()
+    assert sorted((e["original"], e["adjusted"]) for e in entries) == [
+        ("Monsieur", "John"),
+        ("Redemption Ro", "Redemption Roasters"),
+        ("Sncf", "Train"),
+    ]
+
+
+def test_payee_renames_are_loaded_again_when_the_file_changes(db, mocker):
+    payee_renames = PayeeRenames(db)
+    get_all = mocker.spy(db, "get_all")
+    for _ in range(3):
+        assert payee_renames.get("Sncf") == "SNCF"
+    assert get_all.call_count == 1
+
+    # E.g. from another worker.
+    PysonDB(db.filename).add({"original": "Monsieur", "adjusted": "John"})
+    assert payee_renames.get("Monsieur") == "John"
+    assert get_all.call_count == 2
+
+
+def test_get_payee_renames_is_shared_per_file(db):
+    assert get_payee_renames(db) is get_payee_renames(PysonDB(db.filename))
+
+
+def test_sqlite_payee_renames(tmpdir):
+    filepath = tmpdir / "renames.sqlite"
+    with SqlitePayeeRenames(filepath) as renames:
+        renames.set_many({"Sncf": "SNCF", "Monsieur": "John"})
+        renames.set("Sncf", "Train")
+        assert renames.get("Sncf") == "Train"
+        assert renames.get("Madame") is None
+
+    # The renames are persistent, and other connections can read them.
+    with SqlitePayeeRenames(filepath) as renames:
+        assert renames.items() == {"Sncf": "Train", "Monsieur": "John"}
+    with sqlite3.connect(str(filepath)) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_migrate_from_pysondb(tmpdir):
+    db = PysonDB(str(tmpdir / "db.json"))
+    db.add_many(
+        [
+            {"original": "Sncf", "adjusted": "SNCF"},
+            {"original": "Monsieur", "adjusted": "John"},
+            # Ignored by the app: the first entry of a payee wins.
+            {"original": "Sncf", "adjusted": "Train"},
+        ]
+    )
+
+    with SqlitePayeeRenames() as renames:
+        migrate_from_pysondb(db.filename, renames)
+        assert renames.items() == {"Sncf": "SNCF", "Monsieur": "John"}
+
+    sqlite_filepath = tmpdir / "renames.sqlite"
+    result = CliRunner().invoke(migrate_renames, [db.filename, str(sqlite_filepath)])
+    assert result.exit_code == 0, result.output
+    assert "Copied 2 payee renames" in result.output
+    with SqlitePayeeRenames(sqlite_filepath) as renames:
+        assert renames.get("Monsieur") == "John"
+
+
+def test_migrate_renames_is_a_command_of_the_app(app):
+    assert app.cli.get_command(None, "migrate-renames") is migrate_renames
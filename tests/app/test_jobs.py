@@ -0,0 +1,119 @@
+import re
+import time
+import threading
+from datetime import date
+
+from app import create_app
+from app.jobs import JobQueue, JobStore
+from bourso2ynab.transaction import Transaction
+
+
+def test_job_queue_runs_jobs_in_the_background():
+    queue = JobQueue(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def func(value):
+        started.set()
+        release.wait()
+        return [{"value": value}]
+
+    job = queue.submit(func, 1)
+    started.wait()
+    assert queue.get(job.id).status == "running"
+
+    release.set()
+    queue.shutdown()
+    assert job.status == "done"
+    assert job.results == [{"value": 1}]
+
+
+def test_job_queue_reports_failures():
+    def func():
+        raise ValueError("Oops")
+
+    job = JobQueue().submit(func, sync=True)
+
+    assert job.status == "failed"
+    assert "Oops" in job.error
+
+
+def test_job_queue_only_keeps_the_last_jobs():
+    queue = JobQueue(max_jobs=2)
+    jobs = [queue.submit(list, sync=True) for _ in range(3)]
+
+    assert queue.get(jobs[0].id) is None
+    assert queue.get(jobs[2].id) is jobs[2]
+
+
+def test_jobs_can_be_polled_from_another_worker(tmp_path):
+    filepath = tmp_path / "jobs.sqlite"
+    queue = JobQueue(store=JobStore(filepath))
+    other_worker = JobQueue(store=JobStore(filepath))
+
+    job = queue.submit(lambda: [{"username": "user1"}], sync=True)
+
+    polled = other_worker.get(job.id)
+    assert polled is not job
+    assert polled.to_dict() == job.to_dict()
+    assert other_worker.get("unknown") is None
+
+
+def test_job_store_only_keeps_the_last_jobs():
+    store = JobStore()
+    queue = JobQueue(max_jobs=2, store=store)
+    jobs = [queue.submit(list, sync=True) for _ in range(3)]
+
+    assert store.get(jobs[0].id) is None
+    assert store.get(jobs[2].id).status == "done"
+
+
+def test_pushes_run_in_the_background_by_default():
+    assert create_app().config["PUSH_JOBS_SYNC"] is False
+
+
+def test_push_to_ynab_returns_a_job_to_poll(app, client, mocker, ynab_mocker):
+    # The test app runs the pushes in the request, see `tests/conftest.py`.
+    app.config["PUSH_JOBS_SYNC"] = False
+    release = threading.Event()
+
+    def mock_push_to_ynab(transactions, account_id, budget_id):
+        release.wait()
+        return f"Pushed to {account_id}"
+
+    mocker.patch("app.main._push_to_ynab", mock_push_to_ynab)
+
+    with client.session_transaction() as session:
+        session["transactions"] = [
+            Transaction(
+                type="CARTE",
+                amount=-12.34,
+                date=date(year=1970, month=1, day=1),
+                payee="Monsieur",
+            ),
+        ]
+        session["username"] = "user1"
+        session["account-type"] = "joint"
+
+    response = client.post(
+        "/ynab/push",
+        data={"payee-input-text-0": "Monsieur", "memo-input-text-0": ""},
+    )
+    assert "Sending to YNAB" in response.text
+    # The page doesn't wait forever if a poll fails (e.g. 404 from another worker).
+    assert "if (!response.ok)" in response.text
+    (job_url,) = re.findall(r"/ynab/jobs/\w+", response.text)
+    assert client.get(job_url).json["status"] in ["pending", "running"]
+
+    release.set()
+    for _ in range(100):
+        job = client.get(job_url).json
+        if job["status"] == "done":
+            break
+        time.sleep(0.05)
+
+    assert job["status"] == "done"
+    assert [(r["username"], r["result"]) for r in job["results"]] == [
+        ("user1", "Pushed to 4567"),
+        ("user2", "Pushed to 1111"),
+    ]
+    assert client.get("/ynab/jobs/unknown").status_code == 404
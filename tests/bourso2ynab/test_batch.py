@@ -0,0 +1,123 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.ynab import push_to_ynab
+from bourso2ynab.transaction import (
+    Transaction,
+    make_import_ids_unique,
+    remove_future_transactions,
+    transactions_to_html,
+)
+
+
+@pytest.fixture
+def transactions(make_transactions):
+    # Including a row without type, date nor amount.
+    return make_transactions(
+        3,
+        type=["CARTE", "VIR", None],
+        date=[date(1971, 1, 1), date(1970, 1, 1), None],
+        amount=[-0.29, 1234.5, None],
+        payee=["Franprix", None, "ZEN 01/01/70 Something"],
+        memo=["Test", "Loyer", None],
+    )
+
+
+def test_batch_views_behave_like_transactions(transactions):
+    batch = TransactionBatch.from_transactions(transactions)
+
+    assert len(batch) == 3
+    assert batch == transactions
+    assert batch.to_transactions() == transactions
+    for view, transaction in zip(batch, transactions):
+        assert view.type == transaction.type
+        assert view.date == transaction.date
+        assert view.amount == transaction.amount
+        assert view.payee == transaction.payee
+        assert view.memo == transaction.memo
+        assert view.index == transaction.index
+    assert batch[0].import_id == transactions[0].import_id
+    assert batch[-1].payee == "ZEN 01/01/70 Something"
+    assert batch[1:] == transactions[1:]
+
+
+def test_batch_views_can_be_edited(transactions):
+    batch = TransactionBatch.from_transactions(transactions)
+    copy = batch.copy()
+
+    copy[0].payee = "John"
+    copy[1].memo = None
+
+    assert copy[0].payee == "John"
+    assert copy[1].memo is None
+    assert batch[0].payee == "Franprix"
+    assert batch[1].memo == "Loyer"
+
+
+def test_batch_make_import_ids_unique():
+    random.seed(0)
+    transactions = [
+        Transaction(
+            type="CARTE",
+            date=date(year=2023, month=1, day=1) + timedelta(days=random.randint(0, 3)),
+            amount=random.choice([-1.0, -2.5, -0.29]),
+            payee="Test",
+        )
+        for _ in range(200)
+    ]
+    batch = TransactionBatch.from_transactions(transactions)
+
+    unique = make_import_ids_unique(batch)
+    assert isinstance(unique, TransactionBatch)
+    assert unique == make_import_ids_unique(transactions)
+    assert unique.import_ids() == [t.import_id for t in unique]
+    assert len(set(unique.import_ids())) == len(unique)
+
+
+def test_batch_remove_future_transactions():
+    today = date.today()
+    transactions = [
+        Transaction(type="CARTE", date=today + timedelta(days=days), amount=1.0)
+        for days in [-1, 0, 1]
+    ]
+    batch = TransactionBatch.from_transactions(transactions)
+
+    assert remove_future_transactions(batch) == remove_future_transactions(transactions)
+
+
+def test_batch_transactions_to_html(transactions):
+    transactions = transactions[:2]
+    batch = TransactionBatch.from_transactions(transactions)
+
+    kwargs = {"with_table_tag": True, "with_title": True, "editable": True}
+    assert transactions_to_html(batch, **kwargs) == transactions_to_html(
+        transactions, **kwargs
+    )
+
+
+def test_push_batch_to_ynab(ynab_post_mocker, transactions):
+    batch = TransactionBatch.from_transactions(transactions[:2])
+
+    ynab_post_mocker()
+
+    summary = push_to_ynab(batch, account_id="01234", budget_id="1230")
+    returned_transactions = summary.responses[0]
+
+    # Transactions are sorted by import ID.
+    # -0.29 * 1000 isn't exactly -290 with floats.
+    assert returned_transactions[0]["amount"] == -290
+    assert returned_transactions[0]["import_id"] == "YNAB:-290:1971-01-01:1"
+    assert returned_transactions[1]["amount"] == 1_234_500
+    assert returned_transactions[1]["import_id"] == "YNAB:1234500:1970-01-01:1"
+
+
+def test_batch_make_import_ids_unique_keeps_order(transactions):
+    transactions = transactions[:2] * 3
+    batch = TransactionBatch.from_transactions(transactions)
+
+    assert make_import_ids_unique(batch, keep_order=True) == make_import_ids_unique(
+        transactions, keep_order=True
+    )
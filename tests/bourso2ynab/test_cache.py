@@ -0,0 +1,62 @@
+import threading
+
+from bourso2ynab.cache import LRUCache
+
+
+def test_lru_cache_counts_hits_and_misses():
+    cache = LRUCache(maxsize=2)
+    assert cache.get_or_compute("a", str.upper) == "A"
+    assert cache.get_or_compute("a", str.upper) == "A"
+
+    info = cache.info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+    assert info.hit_rate == 0.5
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.get_or_compute("a", str.upper)
+    cache.get_or_compute("b", str.upper)
+    cache.get_or_compute("a", str.upper)  # "b" is now the least recently used.
+    cache.get_or_compute("c", str.upper)
+
+    assert cache.info().evictions == 1
+    cache.get_or_compute("a", str.upper)
+    assert cache.info().hits == 2
+    cache.get_or_compute("b", str.upper)
+    assert cache.info().misses == 4
+
+
+def test_lru_cache_can_be_resized_and_disabled():
+    cache = LRUCache(maxsize=3)
+    for key in "abc":
+        cache.get_or_compute(key, str.upper)
+
+    cache.resize(1)
+    assert cache.info().currsize == 1
+    assert cache.info().evictions == 2
+
+    cache.resize(0)
+    assert cache.get_or_compute("d", str.upper) == "D"
+    assert cache.info().currsize == 0
+
+    cache.clear()
+    assert cache.info().hits == cache.info().misses == 0
+
+
+def test_lru_cache_is_thread_safe():
+    cache = LRUCache(maxsize=10)
+
+    def work():
+        for i in range(1_000):
+            cache.get_or_compute(i % 20, lambda key: key * 2)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    info = cache.info()
+    assert info.hits + info.misses == 8_000
+    assert info.currsize == 10
@@ -0,0 +1,125 @@
+import sys
+import subprocess
+from datetime import date
+
+from click.testing import CliRunner
+
+from bourso2ynab.cli import push
+from bourso2ynab.ledger import ImportLedger
+
+
+def test_push_several_exports(transactions_csv_filepath, tmpdir, mocker):
+    lines = transactions_csv_filepath.read_text("utf-8").split("\n")
+    # Two exports that overlap on their 2nd row, in a directory.
+    (tmpdir / "recent.csv").write_text("\n".join(lines[:3]), encoding="utf-8")
+    (tmpdir / "older.csv").write_text(
+        "\n".join([lines[0]] + lines[2:]), encoding="utf-8"
+    )
+    send_to_ynab = mocker.patch("bourso2ynab.cli.send_to_ynab", return_value="OK")
+
+    result = CliRunner().invoke(
+        push,
+        [str(tmpdir), "--budget-id", "1", "--account-id", "2", "--workers", "1"],
+    )
+
+    assert result.exit_code == 0, result.output
+    send_to_ynab.assert_called_once()
+    transactions = send_to_ynab.call_args.args[0]
+    assert len(transactions) == len(lines) - 1
+    assert len({t.import_id for t in transactions}) == len(transactions)
+
+
+def test_push_refuses_batch_size_with_several_exports(transactions_csv_filepath):
+    result = CliRunner().invoke(
+        push,
+        [
+            str(transactions_csv_filepath),
+            str(transactions_csv_filepath),
+            "--batch-size",
+            "2",
+        ],
+    )
+
+    assert result.exit_code != 0
+    assert "--batch-size" in result.output
+
+
+def test_push_does_not_read_the_pushed_range_again(
+    transactions_csv_filepath, tmpdir, mocker
+):
+    send_to_ynab = mocker.patch("bourso2ynab.cli.send_to_ynab", return_value="OK")
+    ledger_filepath = tmpdir / "ledger.sqlite"
+    args = [str(transactions_csv_filepath), "--budget-id", "1", "--account-id", "2"]
+    args += ["--ledger", str(ledger_filepath), "--grace-days", "3"]
+
+    result = CliRunner().invoke(push, args)
+    assert result.exit_code == 0, result.output
+    with ImportLedger(ledger_filepath) as ledger:
+        assert ledger.get_pushed_range("1", "2") == (
+            date(2022, 6, 8),
+            date(2022, 6, 15),
+        )
+    assert len(send_to_ynab.call_args.args[0]) == 5
+
+    # Only the rows of the last 3 days of the range are read again.
+    result = CliRunner().invoke(push, args)
+    assert result.exit_code == 0, result.output
+    assert len(send_to_ynab.call_args.args[0]) == 2
+    assert "3 rows operated from 2022-06-08 to 2022-06-11" in result.output
+
+    result = CliRunner().invoke(push, args + ["--full"])
+    assert result.exit_code == 0, result.output
+    assert len(send_to_ynab.call_args.args[0]) == 5
+
+
+def test_push_reads_an_older_export_pushed_after_a_recent_one(
+    transactions_csv_filepath, tmpdir, mocker
+):
+    send_to_ynab = mocker.patch("bourso2ynab.cli.send_to_ynab", return_value="OK")
+    lines = transactions_csv_filepath.read_text("utf-8").split("\n")
+    recent, older = tmpdir / "recent.csv", tmpdir / "older.csv"
+    recent.write_text("\n".join(lines[:3]), encoding="utf-8")  # 15th and 13th.
+    older.write_text("\n".join([lines[0]] + lines[3:]), encoding="utf-8")
+    ledger_filepath = tmpdir / "ledger.sqlite"
+    args = ["--budget-id", "1", "--account-id", "2", "--ledger", str(ledger_filepath)]
+    args += ["--grace-days", "0"]
+
+    result = CliRunner().invoke(push, [str(recent)] + args)
+    assert result.exit_code == 0, result.output
+    assert len(send_to_ynab.call_args.args[0]) == 2
+
+    # None of its rows were pushed: they are all read and sent.
+    result = CliRunner().invoke(push, [str(older)] + args)
+    assert result.exit_code == 0, result.output
+    assert len(send_to_ynab.call_args.args[0]) == 3
+    assert "already pushed" not in result.output
+
+
+def test_push_does_not_record_the_pushed_range_on_failure(
+    transactions_csv_filepath, tmpdir, mocker
+):
+    mocker.patch("bourso2ynab.cli.send_to_ynab", return_value=None)
+    ledger_filepath = tmpdir / "ledger.sqlite"
+
+    result = CliRunner().invoke(
+        push,
+        [str(transactions_csv_filepath), "--budget-id", "1", "--account-id", "2"]
+        + ["--ledger", str(ledger_filepath)],
+    )
+
+    assert result.exit_code == 0, result.output
+    with ImportLedger(ledger_filepath) as ledger:
+        assert ledger.get_pushed_range("1", "2") is None
+
+
+def test_cli_does_not_import_heavy_dependencies_at_startup():
+    # In a fresh interpreter: other tests have already imported them.
+    code = (
+        "import sys\n"
+        "import bourso2ynab.cli\n"
+        "print(*[m for m in ['pandas', 'ynab_api', 'urllib3'] if m in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,68 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from bourso2ynab.dates import (
+    ISO_FORMAT,
+    LABEL_FORMAT,
+    parse_date_column,
+    parse_iso_date,
+    parse_label_date,
+)
+
+# Every day from 1960 to 2080, which covers the pivot of `%y`.
+ALL_DATES = [date(1960, 1, 1) + timedelta(days=i) for i in range(0, 44_000, 7)]
+
+
+def test_parse_iso_date_matches_strptime():
+    for _date in ALL_DATES:
+        value = _date.strftime(ISO_FORMAT)
+        assert parse_iso_date(value) == datetime.strptime(value, ISO_FORMAT).date()
+
+
+def test_parse_label_date_matches_strptime():
+    for _date in ALL_DATES:
+        value = _date.strftime(LABEL_FORMAT)
+        assert parse_label_date(value) == datetime.strptime(value, LABEL_FORMAT).date()
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("2022-6-9", date(2022, 6, 9)),
+        ("1/6/22", date(2022, 6, 1)),
+        ("01/01/69", date(1969, 1, 1)),
+        ("31/12/68", date(2068, 12, 31)),
+    ],
+)
+def test_parse_dates_falls_back_to_strptime(value, expected):
+    parse = parse_iso_date if "-" in value else parse_label_date
+    assert parse(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value", ["2022-02-30", "2022-13-01", "2022/06/09", "2022-W01-1", "31/02/22", ""]
+)
+def test_parse_dates_fail_like_strptime(value):
+    parse = parse_label_date if "/" in value and len(value) == 8 else parse_iso_date
+    with pytest.raises(ValueError):
+        parse(value)
+
+
+def test_parse_date_column():
+    values = ["2022-06-09", None, "2022-06-09", "2022-06-10"]
+    assert parse_date_column(values) == [
+        date(2022, 6, 9),
+        None,
+        date(2022, 6, 9),
+        date(2022, 6, 10),
+    ]
+
+    values = ["09/06/22", "31/02/22", None]
+    assert parse_date_column(values, kind="label", errors="coerce") == [
+        date(2022, 6, 9),
+        None,
+        None,
+    ]
+    with pytest.raises(ValueError):
+        parse_date_column(values, kind="label")
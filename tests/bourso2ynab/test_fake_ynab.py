@@ -0,0 +1,110 @@
+import pytest
+
+from tests.support.fake_ynab import FakeYnab, FakeYnabServer
+from bourso2ynab.ledger import ImportLedger
+from bourso2ynab.ratelimit import RateLimiter
+from bourso2ynab.ynab import get_api_client, push_to_ynab, send_to_ynab, sync_from_ynab
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("YNAB_API_KEY", "1234")
+    with FakeYnabServer(FakeYnab()) as server:
+        yield server
+
+
+def test_push_to_the_fake_server(server, make_transactions):
+    api_client = get_api_client(api_key="1234", host=server.url)
+    transactions = make_transactions(5, debit=True)
+
+    summary = send_to_ynab(
+        transactions, "account", "budget", api_client=api_client, chunk_size=2
+    )
+    assert summary.created_import_ids == [t.import_id for t in transactions]
+
+    # Sending them again: YNAB rejects them as duplicates.
+    summary = send_to_ynab(transactions, "account", "budget", api_client=api_client)
+    assert summary.duplicate_import_ids == [t.import_id for t in transactions]
+    assert server.fake.requests["create_transactions"] == 4
+
+
+def test_throttled_pushes_are_retried(server, make_transactions):
+    server.fake.error_rate = 0.5
+    api_client = get_api_client(api_key="1234", host=server.url)
+    transactions = make_transactions(10, debit=True)
+
+    summary = send_to_ynab(
+        transactions,
+        "account",
+        "budget",
+        api_client=api_client,
+        # The 429s are retried by the rate limiter.
+        rate_limiter=RateLimiter(max_retries=20),
+        chunk_size=1,
+        retry_delay=0,
+    )
+
+    assert summary.ok
+    assert len(summary.created_import_ids) == 10
+    assert server.fake.throttled > 0
+
+
+def test_throttled_chunks_are_only_retried_by_the_rate_limiter(
+    server, make_transactions
+):
+    server.fake.error_rate = 1.0
+    api_client = get_api_client(api_key="1234", host=server.url)
+
+    summary = send_to_ynab(
+        make_transactions(1, debit=True),
+        "account",
+        "budget",
+        api_client=api_client,
+        rate_limiter=RateLimiter(max_retries=3),
+        max_retries=2,
+        retry_delay=0,
+    )
+
+    # The first request and the 3 retries of the rate limiter: the chunk isn't
+    # sent again by `send_to_ynab`.
+    assert summary is None
+    assert server.fake.requests["create_transactions"] == 4
+
+
+def test_delta_sync_with_the_fake_server(server, mocker, make_transactions):
+    api_client = get_api_client(api_key="1234", host=server.url)
+    mocker.patch("bourso2ynab.ynab.get_api_client", return_value=api_client)
+    transactions = make_transactions(3, debit=True)
+    ledger = ImportLedger()
+
+    # Pushed from somewhere else.
+    send_to_ynab(transactions[:2], "account", "budget", api_client=api_client)
+    assert sync_from_ynab(ledger, "account", "budget", api_client=api_client) == 2
+
+    # Only the new transaction is sent.
+    summary = push_to_ynab(transactions, "account", "budget", ledger=ledger)
+    assert summary.created_import_ids == [transactions[2].import_id]
+
+    # Only the transactions created since the last sync are fetched.
+    assert sync_from_ynab(ledger, "account", "budget", api_client=api_client) == 1
+
+
+def test_rate_limiter_tracks_the_quota_left(server, make_transactions):
+    server.fake.rate_limit = 10
+    api_client = get_api_client(api_key="1234", host=server.url)
+    rate_limiter = RateLimiter(capacity=200)
+
+    send_to_ynab(
+        make_transactions(1, debit=True),
+        "account",
+        "budget",
+        api_client=api_client,
+        rate_limiter=rate_limiter,
+    )
+    # 1 request out of 10 was used according to YNAB.
+    assert 8 < rate_limiter.metrics.remaining < 10
+
+    sync_from_ynab(
+        ImportLedger(), "account", "budget", api_client, rate_limiter=rate_limiter
+    )
+    assert 7 < rate_limiter.metrics.remaining < 9
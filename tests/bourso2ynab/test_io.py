@@ -1,6 +1,20 @@
+from pathlib import Path
+from datetime import date
+
+import pytest
 import pandas as pd
 
-from bourso2ynab.io import read_bourso_transactions
+from bourso2ynab.dates import DateRange
+from bourso2ynab.transaction import CompactTransaction, Transaction
+from bourso2ynab.io import (
+    ReadStats,
+    iter_bourso_transactions,
+    list_bourso_exports,
+    parse_bourso_exports,
+    parse_bourso_transactions,
+    read_bourso_rows,
+    read_bourso_transactions,
+)
 
 
 def test_read_bourso_transactions(tmpdir):
@@ -17,3 +31,171 @@ def test_read_bourso_transactions(tmpdir):
     assert isinstance(df, pd.DataFrame)
     assert len(df) == 2
     assert "dateOp" in df.columns
+
+
+def test_iter_bourso_transactions(transactions_csv_filepath):
+    batches = list(iter_bourso_transactions(transactions_csv_filepath, batch_size=2))
+
+    assert [len(transactions) for transactions, _ in batches] == [2, 2, 1]
+    assert all(errors == [] for _, errors in batches)
+
+    df = read_bourso_transactions(transactions_csv_filepath)
+    expected_transactions, _ = Transaction.from_dataframe(df)
+    transactions = [t for batch, _ in batches for t in batch]
+    assert transactions == expected_transactions
+
+
+def test_iter_bourso_transactions_from_stream(transactions_csv_filepath):
+    with transactions_csv_filepath.open("rb") as f:
+        batches = list(iter_bourso_transactions(f, batch_size=3))
+
+    assert [len(transactions) for transactions, _ in batches] == [3, 2]
+
+
+def test_iter_bourso_transactions_without_batch_size(transactions_csv_filepath):
+    batches = list(iter_bourso_transactions(transactions_csv_filepath, batch_size=None))
+
+    assert len(batches) == 1
+    assert len(batches[0][0]) == 5
+
+
+def test_iter_bourso_transactions_reports_errors_with_file_indices(tmpdir):
+    lines = [
+        "dateOp;dateVal;label;amount",
+        '1970-01-01;1970-01-01;"CARTE 13/06/22 VELIB METROPOLE 2 CB*1040";-2,00',
+        '1970-01-01;1970-01-01;"CARTE 11/06/22 RATP CB*1040";-3,80',
+        '1970-01-01;1970-01-01;"CARTE 11/06/22 RATP CB*1040";',
+    ]
+    filepath = tmpdir / "transactions.csv"
+    filepath.write_text("\n".join(lines), encoding="utf-8")
+
+    batches = list(iter_bourso_transactions(filepath, batch_size=2))
+
+    assert batches[0][1] == []
+    assert [row_error.index for row_error in batches[1][1]] == [2]
+
+
+def test_read_bourso_rows(transactions_csv_filepath):
+    rows = list(read_bourso_rows(transactions_csv_filepath))
+
+    assert len(rows) == 5
+    # The BOM at the beginning of the file shouldn't be part of the first column.
+    assert rows[0]["dateOp"] == "2022-06-15"
+    assert rows[0]["label"] == "CARTE 13/06/22 VELIB METROPOLE 2 CB*0000"
+    assert rows[0]["amount"] == "-2,00"
+
+
+@pytest.mark.parametrize("mode", ["rb", "r"])
+def test_read_bourso_rows_from_stream(transactions_csv_filepath, mode):
+    encoding = None if mode == "rb" else "utf-8"
+    with transactions_csv_filepath.open(mode, encoding=encoding) as f:
+        rows = list(read_bourso_rows(f))
+        assert not f.closed
+
+    assert len(rows) == 5
+    assert rows[0]["dateOp"] == "2022-06-15"
+
+
+def test_csv_engine_matches_pandas_engine(transactions_csv_filepath, tmpdir):
+    lines = transactions_csv_filepath.read_text("utf-8").split("\n")
+    lines += [
+        '2022-06-09;;"VIR Virement de MONSIEUR";;;-10,00;;0;;0',
+        '2022-06-09;2022-06-09;"ZEN Blabla";;;-1 234,56;;0;;0',
+        "2022-06-09;2022-06-09;;;;-10,00;;0;;0",
+        '2022-06-09;2022-06-09;"CARTE 31/02/22 SNCF";;;-10,00;;0;;0',
+    ]
+    filepath = tmpdir / "transactions.csv"
+    filepath.write_text("\n".join(lines), encoding="utf-8")
+
+    transactions, errors = parse_bourso_transactions(filepath, engine="csv")
+    expected_transactions, expected_errors = parse_bourso_transactions(
+        filepath, engine="pandas"
+    )
+
+    assert len(transactions) == 7
+    assert transactions == expected_transactions
+    assert [e.index for e in errors] == [e.index for e in expected_errors] == [7, 8]
+    assert [type(e.error) for e in errors] == [type(e.error) for e in expected_errors]
+
+
+def test_iter_bourso_transactions_with_csv_engine(transactions_csv_filepath):
+    with transactions_csv_filepath.open("rb") as f:
+        batches = list(iter_bourso_transactions(f, batch_size=2, engine="csv"))
+
+    assert [len(transactions) for transactions, _ in batches] == [2, 2, 1]
+    transactions = [t for batch, _ in batches for t in batch]
+    assert transactions == parse_bourso_transactions(transactions_csv_filepath)[0]
+
+
+@pytest.mark.parametrize("engine", ["pandas", "csv"])
+def test_iter_bourso_transactions_compact(transactions_csv_filepath, engine):
+    batches = iter_bourso_transactions(
+        transactions_csv_filepath, batch_size=2, engine=engine, compact=True
+    )
+    transactions = [t for batch, _ in batches for t in batch]
+
+    assert all(isinstance(t, CompactTransaction) for t in transactions)
+    expected_transactions = parse_bourso_transactions(transactions_csv_filepath)[0]
+    assert [t.to_transaction() for t in transactions] == expected_transactions
+
+
+def test_list_bourso_exports(transactions_csv_filepath, tmpdir):
+    for name in ["2022-02.csv", "2022-01.csv", "notes.txt"]:
+        (tmpdir / name).write_text("", encoding="utf-8")
+
+    assert list_bourso_exports([transactions_csv_filepath, tmpdir]) == [
+        transactions_csv_filepath,
+        Path(tmpdir) / "2022-01.csv",
+        Path(tmpdir) / "2022-02.csv",
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_bourso_exports(transactions_csv_filepath, tmpdir, workers):
+    lines = transactions_csv_filepath.read_text("utf-8").split("\n")
+    other_filepath = tmpdir / "transactions.csv"
+    other_filepath.write_text("\n".join(lines[:3]), encoding="utf-8")
+
+    exports = parse_bourso_exports(
+        [transactions_csv_filepath, other_filepath], engine="csv", workers=workers
+    )
+
+    assert [len(transactions) for transactions, _, _ in exports] == [5, 2]
+    assert exports[0][:2] == parse_bourso_transactions(transactions_csv_filepath)
+    assert [stats.rows for _, _, stats in exports] == [5, 2]
+
+
+@pytest.mark.parametrize("engine", ["pandas", "csv"])
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_iter_bourso_transactions_skip(transactions_csv_filepath, engine, batch_size):
+    stats = ReadStats()
+    batches = iter_bourso_transactions(
+        transactions_csv_filepath,
+        batch_size=batch_size,
+        engine=engine,
+        skip=DateRange(date(2022, 6, 9), date(2022, 6, 13)),
+        stats=stats,
+    )
+    transactions = [t for batch, _ in batches for t in batch]
+
+    # The rows operated on the 9th and the 10th aren't read, the older ones are.
+    assert [t.payee for t in transactions] == [
+        "Velib Metropole",
+        "Ratp",
+        "Franprix",
+    ]
+    assert stats.rows == 3
+    assert stats.skipped == 2
+    assert (stats.oldest_date_op, stats.latest_date_op) == (
+        date(2022, 6, 8),
+        date(2022, 6, 15),
+    )
+
+
+def test_iter_bourso_transactions_stats(transactions_csv_filepath):
+    stats = ReadStats()
+    list(iter_bourso_transactions(transactions_csv_filepath, stats=stats))
+
+    assert stats == ReadStats(
+        rows=5, oldest_date_op=date(2022, 6, 8), latest_date_op=date(2022, 6, 15)
+    )
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from bourso2ynab.label import MAX_REGEX_LABEL_LENGTH, match_label, parse_label
+from bourso2ynab.transaction import TRANSACTION_LABEL_PROG
+
+
+def parse_label_with_regex(label):
+    result = TRANSACTION_LABEL_PROG.match(label)
+    if result is None:
+        return None
+    result = result.groupdict()
+    return {
+        key: result[key] for key in ["transaction_type", "date", "is_paypal", "payee"]
+    }
+
+
+@pytest.mark.parametrize(
+    "label",
+    [
+        "CARTE 09/06/22 SNCF INTERNET CB*5537",
+        "CARTE 01/01/70 TFL TRAVEL CH CB*0000",
+        "CARTE 01/01/70 M&S SIMPLY FOOD - CB*0000",
+        "CARTE 01/01/70 ZTL*NM BURGER OPS CB*0000",
+        "CARTE 01/01/70 IZ *TOSSED CB*0000",
+        "CARTE 01/01/70 MARKS&SPENCER PLC CB*0000",
+        "CARTE 01/01/70 PAYPAL *ROMAIN.S CB*0000",
+        "CARTE 01/01/70 PHARM REPUBLIQUE2 CB*0000",
+        "CARTE 01/01/70 RELAY 340356SC 4 CB*0000",
+        "CARTE 01/01/70 FNAC SC 4 CB*0000",
+        "CARTE 01/01/70 SC-ESSENTIEL DA CB*0000",
+        "CARTE 01/01/70 SUMUP *DOCTEUR R CB*0000",
+        "CARTE 01/01/70 ECGCOSTA4017507 CB*0000",
+        "CARTE 01/12/22 AMAZON PAYMEN PARIS FR",
+        "VIR INST ALAN SA",
+        "VIR Virement de Monsieur MACHIN",
+        "VIR Remboursemnt loyer (63) electric",
+        "PRLV SEPA Bouygues Telecom",
+        "RETRAIT 01/01/70 DAB CB*0000",
+        "ZEN 01/01/70 DOCKYARDS_TICKETS CB*0000",
+        "VIREMENT INST ALAN SA",
+        # Labels where the regex has to backtrack into the prefixes.
+        "CARTE 01/01/70",
+        "VIR INST",
+        "CARTE PAYPAL *",
+        "CARTE 01/01/70 \nX",
+    ],
+)
+def test_parse_label_matches_regex(label):
+    assert parse_label(label) == parse_label_with_regex(label)
+
+
+def test_parse_label_matches_regex_on_random_labels():
+    tokens = [
+        *["CARTE ", "VIR ", "PRLV ", "RETRAIT ", "INST ", "SEPA ", "01/01/70"],
+        *["ZTL*", "IZ *", "SUMUP *", "PAYPAL *", "SC", "SA", "PLC", "-", "CB*"],
+        *["0000", "1", "23", "A", "b", "é", " ", "  ", "\t", "\n", ".", "X Y"],
+    ]
+    rng = random.Random(0)
+    for _ in range(5_000):
+        label = "".join(rng.choices(tokens, k=rng.randint(1, 15))).strip()
+        assert parse_label(label) == parse_label_with_regex(label), label
+
+
+def test_parse_label_on_pathological_label():
+    # The regex needs several seconds for this one.
+    label = "CARTE " + "1" * 5_000 + "a" * 5_000 + "12"
+
+    result = parse_label(label)
+
+    assert result["transaction_type"] == "CARTE"
+    assert result["payee"] == label[6:-2]
+
+
+@pytest.mark.parametrize(
+    "label",
+    [
+        "CARTE 01/01/70 PAYPAL *ROMAIN.S CB*0000",
+        "VIR INST ALAN SA",
+        "PRLV SEPA Bouygues Telecom",
+        "ZEN 01/01/70 DOCKYARDS_TICKETS CB*0000",
+        "CARTE 01/01/70 " + "A" * MAX_REGEX_LABEL_LENGTH + " CB*0000",
+        "VIR Virement de " + "MONSIEUR " * MAX_REGEX_LABEL_LENGTH,
+    ],
+)
+def test_match_label_matches_regex(label):
+    assert match_label(label) == parse_label_with_regex(label)
+
+
+def test_match_label_only_uses_the_parser_on_long_labels(mocker):
+    parse_label = mocker.patch("bourso2ynab.label.parse_label", return_value=None)
+
+    match_label("C" * MAX_REGEX_LABEL_LENGTH)
+    parse_label.assert_not_called()
+
+    match_label("C" * (MAX_REGEX_LABEL_LENGTH + 1))
+    parse_label.assert_called_once_with("C" * (MAX_REGEX_LABEL_LENGTH + 1))
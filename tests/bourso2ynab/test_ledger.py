@@ -0,0 +1,156 @@
+from datetime import date
+from types import SimpleNamespace
+
+from bourso2ynab.dates import DateRange
+from bourso2ynab.ledger import ImportLedger
+from bourso2ynab.ynab import push_to_ynab, sync_from_ynab
+
+
+def test_ledger_records_import_ids_per_account(tmpdir):
+    filepath = tmpdir / "ledger.sqlite"
+    with ImportLedger(filepath) as ledger:
+        ledger.record(["a", "b"], budget_id="budget", account_id="account")
+        ledger.record(["b", "c"], budget_id="budget", account_id="other")
+
+    # The ledger is persistent.
+    with ImportLedger(filepath) as ledger:
+        known = ledger.known_import_ids(["a", "b", "c"], "budget", "account")
+        assert known == {"a", "b"}
+        assert ledger.known_import_ids(["a", "c"], "other", "account") == set()
+
+
+def test_ledger_filter_new(make_transactions):
+    transactions = make_transactions(3, days_apart=1)
+    ledger = ImportLedger()
+    ledger.record([transactions[1].import_id], "budget", "account")
+
+    assert ledger.filter_new(transactions, "budget", "account") == [
+        transactions[0],
+        transactions[2],
+    ]
+    assert ledger.filter_new(transactions, "budget", "other") == transactions
+
+
+def test_ledger_handles_many_import_ids():
+    ledger = ImportLedger()
+    import_ids = [f"YNAB:{i}:1970-01-01:1" for i in range(2_000)]
+    ledger.record(import_ids[::2], "budget", "account")
+
+    assert ledger.known_import_ids(import_ids, "budget", "account") == set(
+        import_ids[::2]
+    )
+
+
+def test_push_to_ynab_skips_known_transactions(ynab_post_mocker, make_transactions):
+    sent = []
+
+    def handler(transactions):
+        import_ids = [t["import_id"] for t in transactions]
+        sent.append(import_ids)
+        # The first transaction was already imported from somewhere else.
+        created = [SimpleNamespace(import_id=import_id) for import_id in import_ids[1:]]
+        return SimpleNamespace(
+            data=SimpleNamespace(
+                transactions=created, duplicate_import_ids=import_ids[:1]
+            )
+        )
+
+    ynab_post_mocker(handler)
+    ledger = ImportLedger()
+    transactions = make_transactions(3, days_apart=1)
+
+    push_to_ynab(transactions[:2], account_id="0", budget_id="1", ledger=ledger)
+    assert len(sent[0]) == 2
+
+    # Only the new transaction is sent.
+    push_to_ynab(transactions, account_id="0", budget_id="1", ledger=ledger)
+    assert sent[1] == [transactions[2].import_id]
+
+    # Nothing new: YNAB isn't called at all.
+    assert push_to_ynab(transactions, "0", "1", ledger=ledger) is not None
+    assert len(sent) == 2
+
+
+def test_ledger_pushed_ranges():
+    ledger = ImportLedger()
+    assert ledger.get_pushed_range("budget", "account") is None
+    assert ledger.get_skip_range("budget", "account") is None
+
+    ledger.record_pushed_range(date(2022, 6, 1), date(2022, 6, 10), "budget", "account")
+    # Overlapping: merged.
+    ledger.record_pushed_range(date(2022, 5, 1), date(2022, 6, 2), "budget", "account")
+    ledger.record_pushed_range(date(2022, 1, 1), date(2022, 1, 5), "budget", "other")
+
+    assert ledger.get_pushed_range("budget", "account") == (
+        date(2022, 5, 1),
+        date(2022, 6, 10),
+    )
+    assert ledger.get_pushed_range("budget", "other") == (
+        date(2022, 1, 1),
+        date(2022, 1, 5),
+    )
+    assert ledger.get_skip_range("budget", "account", grace_days=2) == DateRange(
+        date(2022, 5, 1), date(2022, 6, 8)
+    )
+    # Nothing left to skip once the grace days are removed.
+    assert ledger.get_skip_range("budget", "other", grace_days=4) is None
+
+
+def test_ledger_only_keeps_a_contiguous_pushed_range():
+    ledger = ImportLedger()
+    ledger.record_pushed_range(date(2022, 6, 1), date(2022, 6, 10), "budget", "account")
+
+    # An older export, pushed afterwards: the gap between them wasn't pushed.
+    ledger.record_pushed_range(date(2022, 4, 1), date(2022, 5, 20), "budget", "account")
+    assert ledger.get_pushed_range("budget", "account") == (
+        date(2022, 6, 1),
+        date(2022, 6, 10),
+    )
+
+    # A more recent one replaces it.
+    ledger.record_pushed_range(date(2022, 7, 1), date(2022, 7, 10), "budget", "account")
+    assert ledger.get_pushed_range("budget", "account") == (
+        date(2022, 7, 1),
+        date(2022, 7, 10),
+    )
+
+
+def test_sync_from_ynab_only_fetches_the_changes(mocker, monkeypatch):
+    calls = []
+
+    def mock_get_transactions_by_account(
+        self, budget_id, account_id, _return_http_data_only=True, **kwargs
+    ):
+        calls.append(kwargs)
+        if "last_knowledge_of_server" not in kwargs:
+            transactions = [
+                SimpleNamespace(import_id="YNAB:1000:2022-01-01:1", deleted=False),
+                SimpleNamespace(import_id=None, deleted=False),
+            ]
+        else:
+            transactions = [
+                SimpleNamespace(import_id="YNAB:2000:2022-01-02:1", deleted=False),
+                SimpleNamespace(import_id="YNAB:3000:2022-01-03:1", deleted=True),
+            ]
+        response = SimpleNamespace(
+            data=SimpleNamespace(transactions=transactions, server_knowledge=10)
+        )
+        return response, 200, {"X-Rate-Limit": "1/200"}
+
+    monkeypatch.setenv("YNAB_API_KEY", "1234")
+    mocker.patch(
+        "ynab_api.api.transactions_api.TransactionsApi.get_transactions_by_account",
+        mock_get_transactions_by_account,
+    )
+    ledger = ImportLedger()
+
+    assert sync_from_ynab(ledger, "account", "budget") == 1
+    assert ledger.get_server_knowledge("budget", "account") == 10
+    assert sync_from_ynab(ledger, "account", "budget") == 1
+
+    assert calls == [{}, {"last_knowledge_of_server": 10}]
+    assert ledger.known_import_ids(
+        ["YNAB:1000:2022-01-01:1", "YNAB:2000:2022-01-02:1", "YNAB:3000:2022-01-03:1"],
+        "budget",
+        "account",
+    ) == {"YNAB:1000:2022-01-01:1", "YNAB:2000:2022-01-02:1"}
@@ -0,0 +1,117 @@
+import json
+from datetime import date
+
+import pytest
+from ynab_api import ApiClient
+from ynab_api.model.save_transaction import SaveTransaction
+from ynab_api.model.save_transactions_wrapper import SaveTransactionsWrapper
+
+from bourso2ynab import payload
+from bourso2ynab.batch import TransactionBatch
+from bourso2ynab.payload import serialize_transactions, transactions_payload
+from bourso2ynab.transaction import CompactTransaction, Transaction
+
+
+@pytest.fixture
+def transactions(make_transactions):
+    # Including non-ASCII characters, and amounts that aren't exact floats.
+    return make_transactions(
+        3,
+        type=["CARTE", "VIR", "PRLV"],
+        date=[date(1970, 1, 1), date(1971, 1, 1), date(1971, 1, 1)],
+        amount=[1234.5, -0.29, 10.0],
+        payee=['Café "L\'Étoile"', None, "EDF"],
+        memo=["Memo", None, None],
+        index=[1, 2, 1],
+    )
+
+
+def model_payload(transactions, account_id):
+    """What the generated client sends for the `SaveTransaction`s of the
+    transactions."""
+    wrapper = SaveTransactionsWrapper(
+        transactions=[
+            SaveTransaction(
+                account_id=account_id,
+                date=transaction.date,
+                amount=transaction.milliunits,
+                payee_name=transaction.payee,
+                memo=transaction.memo,
+                approved=True,
+                cleared="uncleared",
+                import_id=transaction.import_id,
+            )
+            for transaction in transactions
+        ]
+    )
+    return ApiClient.sanitize_for_serialization(wrapper)
+
+
+@pytest.mark.parametrize(
+    "convert",
+    [
+        list,
+        lambda transactions: [
+            CompactTransaction.from_transaction(t) for t in transactions
+        ],
+        TransactionBatch.from_transactions,
+    ],
+    ids=["transactions", "compact", "batch"],
+)
+def test_payload_is_the_same_as_the_models(transactions, convert):
+    transactions = convert(transactions)
+    expected = model_payload(transactions, "account")
+
+    assert transactions_payload(transactions, "account") == expected
+    assert list(transactions_payload(transactions, "account")["transactions"][0]) == (
+        list(expected["transactions"][0])
+    )
+    # Whatever the encoder, the same JSON document is sent.
+    body = serialize_transactions(transactions, "account")
+    assert json.loads(body) == json.loads(json.dumps(expected))
+
+
+@pytest.mark.parametrize(
+    "convert",
+    [list, TransactionBatch.from_transactions],
+    ids=["transactions", "batch"],
+)
+def test_payload_without_orjson_is_what_the_client_sends(
+    monkeypatch, transactions, convert
+):
+    monkeypatch.setattr(payload, "dumps", payload._json_dumps)
+    transactions = convert(transactions)
+
+    # The generated client encodes the body with `json.dumps`: only the `json`
+    # fallback gives the same bytes.
+    expected = json.dumps(model_payload(transactions, "account")).encode("utf-8")
+    assert serialize_transactions(transactions, "account") == expected
+
+
+def test_payload_limits_are_the_ones_of_the_models():
+    assert SaveTransaction.validations == {
+        ("payee_name",): {"max_length": payload.MAX_PAYEE_NAME_LENGTH},
+        ("memo",): {"max_length": payload.MAX_MEMO_LENGTH},
+        ("import_id",): {"max_length": payload.MAX_IMPORT_ID_LENGTH},
+    }
+
+
+@pytest.mark.parametrize("convert", [list, TransactionBatch.from_transactions])
+def test_payload_truncates_long_payees_and_memos(transactions, convert):
+    transactions[0].payee = "P" * 60
+    transactions[0].memo = "M" * 250
+
+    row, *_ = transactions_payload(convert(transactions), "account")["transactions"]
+
+    assert row["payee_name"] == "P" * 50
+    assert row["memo"] == "M" * 200
+    # The models accept it.
+    SaveTransaction(**{**row, "date": transactions[0].date})
+
+
+def test_payload_refuses_long_import_ids():
+    transaction = Transaction(
+        type="CARTE", date=date(1970, 1, 1), amount=1e16, index=123456
+    )
+    with pytest.raises(ValueError, match="import ID"):
+        transactions_payload([transaction], "account")
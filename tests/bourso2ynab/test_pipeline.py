@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+
+from bourso2ynab.ledger import ImportLedger
+from bourso2ynab.transaction import Transaction
+from bourso2ynab.pipeline import (
+    Pipeline,
+    Stage,
+    dedupe_stage,
+    filter_stage,
+    parse_stage,
+    push_stage,
+    read_stage,
+    rename_stage,
+)
+
+
+def _transaction(payee="Payee", index=0, days_ago=1):
+    return Transaction(
+        type="CARTE",
+        date=date.today() - timedelta(days=days_ago),
+        amount=-1.0,
+        payee=payee,
+        index=index,
+    )
+
+
+def test_pipeline_reads_and_parses_an_export(transactions_csv_filepath):
+    pipeline = Pipeline([read_stage(transactions_csv_filepath, 2), parse_stage()])
+
+    batches = list(pipeline.run())
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [(s.name, s.batches, s.items) for s in pipeline.stats] == [
+        ("read", 3, 5),
+        ("parse", 3, 5),
+    ]
+    assert all(s.seconds >= 0 for s in pipeline.stats)
+    assert "parse: 3 batches, 5 items" in pipeline.report()
+
+
+def test_pipeline_is_lazy():
+    consumed = []
+
+    def source(_):
+        for i in range(3):
+            consumed.append(i)
+            yield [i]
+
+    batches = Pipeline([Stage("source", source)]).run()
+
+    assert consumed == []
+    next(batches)
+    assert consumed == [0]
+
+
+def test_pipeline_stages_can_be_reordered():
+    transactions = [_transaction(), _transaction(), _transaction(days_ago=-1)]
+
+    for stages in [
+        [dedupe_stage(), filter_stage()],
+        [filter_stage(), dedupe_stage()],
+    ]:
+        (batch,) = Pipeline(stages).run([transactions])
+        assert [t.index for t in batch] == [0, 1]
+
+
+def test_rename_stage_looks_up_each_payee_once():
+    lookups = []
+
+    def lookup(payee):
+        lookups.append(payee)
+        return "New" if payee == "Old" else None
+
+    transactions = [_transaction("Old"), _transaction("Old"), _transaction("Other")]
+    (batch,) = Pipeline([rename_stage(lookup)]).run([transactions])
+
+    assert [t.payee for t in batch] == ["New", "New", "Other"]
+    assert [t.payee for t in transactions] == ["Old", "Old", "Other"]
+    assert lookups == ["Old", "Other"]
+
+
+def test_filter_stage_skips_the_transactions_known_to_the_ledger():
+    transactions = [_transaction(index=0), _transaction(index=1)]
+    ledger = ImportLedger()
+    ledger.record([transactions[0].import_id], "budget", "account")
+
+    (batch,) = Pipeline([filter_stage(ledger, "budget", "account")]).run([transactions])
+
+    assert batch == [transactions[1]]
+
+
+def test_push_stage_skips_empty_batches_and_counts_successes():
+    calls = []
+
+    def push(transactions, account_id, budget_id):
+        calls.append((len(transactions), account_id, budget_id))
+        return None if len(calls) == 2 else "OK"
+
+    pipeline = Pipeline([push_stage("account", "budget", push=push)])
+    results = list(pipeline.run([[_transaction()], [], [_transaction()]]))
+
+    assert results == ["OK", None]
+    assert calls == [(1, "account", "budget"), (1, "account", "budget")]
+    assert (pipeline.stats[0].batches, pipeline.stats[0].items) == (2, 1)
@@ -0,0 +1,83 @@
+import pytest
+
+from bourso2ynab.ratelimit import RateLimiter, _parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class TooManyRequests(Exception):
+    def __init__(self, headers=None):
+        self.status = 429
+        self.headers = headers or {}
+
+
+def test_rate_limiter_queues_requests_once_the_quota_is_used():
+    clock = FakeClock()
+    limiter = RateLimiter(capacity=2, period=10, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        limiter.acquire()
+
+    # 2 requests right away, then one every 5 seconds.
+    assert clock.now == pytest.approx(10)
+    metrics = limiter.metrics
+    assert (metrics.requests, metrics.waits) == (4, 2)
+    assert metrics.waited_seconds == pytest.approx(10)
+
+
+def test_rate_limiter_honours_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(capacity=10, period=10, clock=clock, sleep=clock.sleep)
+    calls = []
+
+    def func():
+        calls.append(clock.now)
+        if len(calls) == 1:
+            raise TooManyRequests({"Retry-After": "30", "X-Rate-Limit": "10/10"})
+        return "OK"
+
+    assert limiter.call(func) == "OK"
+    # Retry-After plus up to 10% of jitter.
+    assert 30 <= calls[1] <= 33
+    assert limiter.metrics.throttled == 1
+
+
+def test_rate_limiter_gives_up_after_max_retries():
+    clock = FakeClock()
+    limiter = RateLimiter(capacity=10, period=10, clock=clock, sleep=clock.sleep)
+
+    def func():
+        raise TooManyRequests()
+
+    with pytest.raises(TooManyRequests):
+        limiter.call(func, max_retries=2)
+    assert limiter.metrics.requests == 3
+    assert limiter.metrics.throttled == 2
+
+
+def test_rate_limiter_does_not_retry_other_errors():
+    limiter = RateLimiter()
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        limiter.call(func)
+    assert len(calls) == 1
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after({"Retry-After": "12"}) == 12
+    assert _parse_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert _parse_retry_after({}) is None
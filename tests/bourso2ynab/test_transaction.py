@@ -1,17 +1,26 @@
-from datetime import date
+import random
+from datetime import date, timedelta
 
 import pytest
 import numpy as np
 import pandas as pd
 
+from tests.support.import_ids import original_make_import_ids_unique
+from bourso2ynab.io import read_bourso_transactions
 from bourso2ynab.transaction import (
     InvalidBoursoTransaction,
     UnknownTransactionType,
+    RowError,
+    LABEL_CACHE,
+    CompactTransaction,
     Transaction,
     infer_transaction_type,
     is_valid_bourso_entry,
     make_import_ids_unique,
+    merge_overlapping_exports,
+    iter_unique_import_ids,
     format_amount,
+    format_amount_to_milliunits,
     transactions_to_html,
 )
 
@@ -227,6 +236,31 @@ def test_transaction_recognizes_paypal():
     assert transaction.memo == expected_memo
 
 
+def test_from_label_is_cached():
+    LABEL_CACHE.clear()
+    label = "CARTE 01/01/70 RATP CB*0000"
+
+    first = Transaction.from_label(label)
+    second = Transaction.from_label(f"  {label} ")
+    assert LABEL_CACHE.info().hits == 1
+    assert LABEL_CACHE.info().misses == 1
+
+    # Transactions are mutable, so they must not be shared.
+    assert first == second
+    assert first is not second
+    first.payee = "Other"
+    assert Transaction.from_label(label).payee == "Ratp"
+
+
+def test_from_label_keeps_raw_label_of_cached_failures():
+    LABEL_CACHE.clear()
+    Transaction.from_label("ZEN RATP")
+    assert Transaction.from_label(" ZEN RATP").payee == " ZEN RATP"
+    assert LABEL_CACHE.info().hits == 1
+    with pytest.raises(ValueError):
+        Transaction.from_label("ZEN RATP", errors="raise")
+
+
 def test_import_id():
     transaction = Transaction(
         type="CARTE", date=date(year=2022, month=6, day=14), amount=16.33
@@ -269,6 +303,95 @@ def test_make_import_ids_unique():
     assert transactions[5].import_id == "YNAB:20000:1972-01-01:3"
 
 
+def test_make_import_ids_unique_keeps_order():
+    transactions = [
+        Transaction(type="CARTE", date=date(year=1972, month=1, day=1), amount=20.0),
+        Transaction(type="CARTE", date=date(year=1970, month=1, day=1), amount=10.0),
+        Transaction(type="CARTE", date=date(year=1972, month=1, day=1), amount=20.0),
+    ]
+    transactions = make_import_ids_unique(transactions, keep_order=True)
+    assert transactions[0].import_id == "YNAB:20000:1972-01-01:1"
+    assert transactions[1].import_id == "YNAB:10000:1970-01-01:1"
+    assert transactions[2].import_id == "YNAB:20000:1972-01-01:2"
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_make_import_ids_unique_matches_reference(seed):
+    rng = random.Random(seed)
+    transactions = [
+        Transaction(
+            type="CARTE",
+            date=date(year=2023, month=1, day=1) + timedelta(days=rng.randint(0, 5)),
+            amount=rng.choice([-0.29, -1.0, 2.5, 1234.56]),
+            payee=str(i),
+            index=rng.choice([1, 1, 1, 2]),
+        )
+        for i in range(500)
+    ]
+    expected = original_make_import_ids_unique(transactions)
+
+    assert make_import_ids_unique(transactions) == expected
+    # Same transactions, with the same new indices, in the original order.
+    in_order = make_import_ids_unique(transactions, keep_order=True)
+    assert [t.payee for t in in_order] == [t.payee for t in transactions]
+    assert sorted(in_order, key=lambda t: int(t.payee)) == sorted(
+        expected, key=lambda t: int(t.payee)
+    )
+    # `iter_unique_import_ids` is the streaming version of `keep_order=True`.
+    batches = [transactions[:100], transactions[100:]]
+    assert [t for batch in iter_unique_import_ids(batches) for t in batch] == in_order
+
+
+def test_make_import_ids_unique_on_empty_list():
+    assert make_import_ids_unique([]) == []
+
+
+def test_merge_overlapping_exports():
+    coffee = Transaction(
+        type="CARTE", date=date(2022, 1, 31), amount=-2.0, payee="Cafe"
+    )
+    rent = Transaction(type="VIR", date=date(2022, 2, 1), amount=-800.0, memo="Loyer")
+    train = Transaction(type="CARTE", date=date(2022, 2, 2), amount=-9.5, payee="Sncf")
+    january = [coffee, coffee]
+    january_to_february = [train, rent, coffee, coffee]
+    february = [train, rent]
+
+    merged = merge_overlapping_exports([january, january_to_february, february])
+    assert merged == [coffee, coffee, train, rent]
+
+    # Two coffees in one export and three in another: there were three of them.
+    merged = merge_overlapping_exports([[coffee, coffee], [coffee] * 3])
+    assert merged == [coffee] * 3
+
+
+def test_iter_unique_import_ids():
+    transactions = [
+        Transaction(type="CARTE", date=date(year=1970, month=1, day=1), amount=10.0),
+        Transaction(type="CARTE", date=date(year=1972, month=1, day=1), amount=20.0),
+        Transaction(type="CARTE", date=date(year=1971, month=1, day=1), amount=10.0),
+        Transaction(type="CARTE", date=date(year=1972, month=1, day=1), amount=20.0),
+        Transaction(type="CARTE", date=date(year=1970, month=1, day=1), amount=10.0),
+        Transaction(type="CARTE", date=date(year=1972, month=1, day=1), amount=20.0),
+    ]
+    batches = [transactions[:2], transactions[2:3], [], transactions[3:]]
+
+    new_batches = list(iter_unique_import_ids(batches))
+
+    assert [len(batch) for batch in new_batches] == [2, 1, 0, 3]
+    import_ids = [t.import_id for batch in new_batches for t in batch]
+    assert import_ids == [
+        "YNAB:10000:1970-01-01:1",
+        "YNAB:20000:1972-01-01:1",
+        "YNAB:10000:1971-01-01:1",
+        "YNAB:20000:1972-01-01:2",
+        "YNAB:10000:1970-01-01:2",
+        "YNAB:20000:1972-01-01:3",
+    ]
+    assert sorted(import_ids) == [
+        t.import_id for t in make_import_ids_unique(transactions)
+    ]
+
+
 def test_transaction_to_html_non_editable():
     transaction = Transaction(
         type="CARTE",
@@ -359,6 +482,50 @@ def test_format_amount():
     assert format_amount("1 234.56") == 1234.56
 
 
+def test_format_amount_to_milliunits():
+    assert format_amount_to_milliunits("-2,00") == -2_000
+    assert format_amount_to_milliunits("-2") == -2_000
+    assert format_amount_to_milliunits("-2.00") == -2_000
+    assert format_amount_to_milliunits("2,12") == 2_120
+    assert format_amount_to_milliunits("-0,29") == -290
+    assert format_amount_to_milliunits("1 234") == 1_234_000
+    assert format_amount_to_milliunits("1 234.56") == 1_234_560
+    assert format_amount_to_milliunits("-1 234,5") == -1_234_500
+    assert format_amount_to_milliunits(-0.29) == -290
+    with pytest.raises(ValueError):
+        format_amount_to_milliunits("abc")
+
+
+def test_milliunits_are_rounded():
+    # -0.29 * 1000 == -289.99999999999994
+    transaction = Transaction(type="CARTE", date=date(1970, 1, 1), amount=-0.29)
+    assert transaction.milliunits == -290
+    assert transaction.import_id == "YNAB:-290:1970-01-01:1"
+
+
+def test_compact_transaction_behaves_like_transaction():
+    transaction = Transaction.from_fields(
+        label="CARTE 01/01/70 PAYPAL *ROMAIN.S CB*0000",
+        date_val="1970-01-02",
+        amount="-1 234,56",
+    )
+    compact = CompactTransaction.from_fields(
+        label="CARTE 01/01/70 PAYPAL *ROMAIN.S CB*0000",
+        date_val="1970-01-02",
+        amount="-1 234,56",
+    )
+
+    assert compact.milliunits == -1_234_560
+    assert compact.to_transaction() == transaction
+    assert CompactTransaction.from_transaction(transaction) == compact
+    assert compact.import_id == transaction.import_id
+    assert compact.to_html(editable=True) == transaction.to_html(editable=True)
+    assert compact.copy_with_new_index(2).import_id == (
+        transaction.copy_with_new_index(2).import_id
+    )
+    assert not hasattr(compact, "__dict__")
+
+
 def test_transaction_to_html_with_empty_fields():
     transaction = Transaction(
         type="CARTE",
@@ -597,3 +764,71 @@ def test_read_transaction_with_no_dateval():
     assert transaction.payee == "Amazon Paymen Paris Fr"
     assert transaction.memo is None
     assert transaction.type == "CARTE"
+
+
+def test_from_dataframe_matches_from_pandas(transactions_csv_filepath):
+    df = read_bourso_transactions(transactions_csv_filepath)
+    transactions, errors = Transaction.from_dataframe(df)
+
+    assert errors == []
+    assert transactions == [Transaction.from_pandas(row) for _, row in df.iterrows()]
+
+
+@pytest.mark.parametrize("format", [True, False])
+def test_from_dataframe_matches_from_pandas_on_various_labels(format):
+    labels = [
+        "CARTE 09/06/22 SNCF INTERNET CB*5537",
+        "CARTE 01/01/70 PAYPAL *ROMAIN.S CB*0000",
+        "VIR Virement de Monsieur MACHIN",
+        "VIR INST ALAN SA",
+        "VIR Blabla",
+        "CARTE 01/01/70 ZTL*NM BURGER OPS CB*0000",
+        "RETRAIT 01/01/70 DAB CB*0000",
+    ]
+    df = pd.DataFrame(
+        {
+            "dateOp": ["2022-06-10"] * len(labels),
+            "dateVal": ["2022-06-11", np.nan] * 3 + ["2022-06-11"],
+            "label": labels,
+            "amount": ["7,5", "-1 234,56", "2", "-0,01", "10.5", "3", "-20,00"],
+        }
+    )
+
+    transactions, errors = Transaction.from_dataframe(df, format=format)
+
+    assert errors == []
+    assert transactions == [
+        Transaction.from_pandas(row, format=format) for _, row in df.iterrows()
+    ]
+
+
+def test_from_dataframe_reports_invalid_rows():
+    df = pd.DataFrame(
+        {
+            "dateVal": ["2022-06-11", np.nan, "2022-06-11", "2022-06-11"],
+            "label": ["VIR Blabla", "VIR Blabla", "CARTE 31/02/22 SNCF", "VIR Blabla"],
+            "amount": ["7,5", "7,5", "7,5", "abc"],
+        },
+        index=[10, 11, 12, 13],
+    )
+
+    transactions, errors = Transaction.from_dataframe(df)
+
+    assert len(transactions) == 1
+    assert transactions[0].memo == "Blabla"
+    assert [row_error.index for row_error in errors] == [11, 12, 13]
+    assert isinstance(errors[0], RowError)
+    assert isinstance(errors[0].error, InvalidBoursoTransaction)
+    assert isinstance(errors[1].error, ValueError)
+    assert isinstance(errors[2].error, ValueError)
+
+
+def test_from_dataframe_reports_unknown_types_without_formatting():
+    df = pd.DataFrame(
+        {"dateVal": ["2022-06-11"], "label": ["ZEN Transaction"], "amount": ["7,5"]}
+    )
+
+    transactions, errors = Transaction.from_dataframe(df, format=False)
+
+    assert transactions == []
+    assert isinstance(errors[0].error, UnknownTransactionType)
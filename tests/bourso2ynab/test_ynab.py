@@ -1,15 +1,23 @@
-import os
 import json
 from typing import List
+from pathlib import Path
 from datetime import date
+from collections import Counter
+from types import SimpleNamespace
 
-from ynab_api.model.save_transactions_wrapper import SaveTransactionsWrapper
+from ynab_api.exceptions import ApiException
 
 from bourso2ynab.transaction import Transaction
 from bourso2ynab.ynab import (
+    CONNECTION_POOL_SIZE,
+    close_api_clients,
+    get_api_client,
     get_all_available_account_types,
     get_ynab_id,
+    load_secrets,
     push_to_ynab,
+    push_succeeded,
+    send_to_ynab,
     get_all_available_usernames,
 )
 
@@ -36,7 +44,25 @@ def test_get_all_available_account_types(ynab_secrets_filepath):
     assert account_types == ["perso", "joint", "fancy"]
 
 
-def test_push_to_ynab(mocker):
+def test_secrets_are_only_read_again_when_they_change(ynab_secrets_filepath, mocker):
+    secrets_path = Path(ynab_secrets_filepath)
+    json_load = mocker.spy(json, "load")
+
+    assert get_ynab_id("budget", "user1", secrets_path=secrets_path) == "abcd"
+    assert get_all_available_usernames(secrets_path) == ["user1", "user2"]
+    assert get_all_available_account_types(secrets_path) == ["perso", "joint", "fancy"]
+    assert json_load.call_count == 1
+
+    secrets = json.loads(secrets_path.read_text())
+    secrets["budgets"]["user3"] = "efgh"
+    secrets["accounts"]["user3"] = {"perso": "2222"}
+    secrets_path.write_text(json.dumps(secrets))
+
+    assert get_ynab_id("budget", "user3", secrets_path=secrets_path) == "efgh"
+    assert load_secrets(secrets_path).usernames == ("user1", "user2", "user3")
+
+
+def test_push_to_ynab(ynab_post_mocker):
     transactions = [
         Transaction(
             type="CARTE",
@@ -61,19 +87,10 @@ def test_push_to_ynab(mocker):
         ),
     ]
 
-    def mock_create_transaction(
-        self, budget_id: str, transactions: SaveTransactionsWrapper, **kwargs
-    ):
-        return transactions.to_dict()["transactions"]
+    ynab_post_mocker()
 
-    os.environ["YNAB_API_KEY"] = "1234"
-    mocker.patch(
-        "bourso2ynab.ynab.TransactionsApi.create_transaction", mock_create_transaction
-    )
-
-    returned_transactions = push_to_ynab(
-        transactions, account_id="01234", budget_id="1230"
-    )
+    summary = push_to_ynab(transactions, account_id="01234", budget_id="1230")
+    returned_transactions = summary.responses[0]
 
     assert returned_transactions[0]["import_id"] == "YNAB:10000:1970-01-01:1"
     assert returned_transactions[1]["import_id"] == "YNAB:20000:1971-01-01:1"
@@ -84,7 +101,7 @@ def test_push_to_ynab(mocker):
     assert returned_transactions[0]["payee_name"] == "TestUser1"
 
 
-def test_push_to_ynab_filter_out_future_transactions(mocker):
+def test_push_to_ynab_filter_out_future_transactions(ynab_post_mocker):
     transactions = [
         Transaction(
             type="CARTE",
@@ -102,22 +119,92 @@ def test_push_to_ynab_filter_out_future_transactions(mocker):
         ),
     ]
 
-    def mock_create_transaction(
-        self, budget_id: str, transactions: SaveTransactionsWrapper, **kwargs
-    ):
-        return transactions.to_dict()["transactions"]
+    ynab_post_mocker()
 
-    os.environ["YNAB_API_KEY"] = "1234"
-    mocker.patch(
-        "bourso2ynab.ynab.TransactionsApi.create_transaction", mock_create_transaction
-    )
-
-    returned_transactions = push_to_ynab(
-        transactions, account_id="01234", budget_id="1230"
-    )
+    summary = push_to_ynab(transactions, account_id="01234", budget_id="1230")
+    returned_transactions = summary.responses[0]
 
     assert len(returned_transactions) == 1
     assert returned_transactions[0]["import_id"] == "YNAB:10000:1970-01-01:1"
     assert returned_transactions[0]["approved"] == True
     assert returned_transactions[0]["cleared"] == "uncleared"
     assert returned_transactions[0]["payee_name"] == "TestUser1"
+
+
+def _mock_created_response(transactions: List[dict]):
+    import_ids = [t["import_id"] for t in transactions]
+    created = [SimpleNamespace(import_id=import_id) for import_id in import_ids]
+    return SimpleNamespace(
+        data=SimpleNamespace(transactions=created, duplicate_import_ids=[])
+    )
+
+
+def test_send_to_ynab_by_chunks(ynab_post_mocker, make_transactions):
+    sizes = []
+
+    def handler(transactions):
+        sizes.append(len(transactions))
+        return _mock_created_response(transactions)
+
+    ynab_post_mocker(handler)
+    transactions = make_transactions(5)
+
+    summary = send_to_ynab(
+        transactions, "01234", "1230", chunk_size=2, max_concurrent_requests=2
+    )
+
+    assert sorted(sizes) == [1, 2, 2]
+    assert summary.ok
+    assert summary.chunks == 3
+    assert summary.created_import_ids == [t.import_id for t in transactions]
+
+
+def test_send_to_ynab_only_retries_failed_chunks(ynab_post_mocker, make_transactions):
+    attempts = Counter()
+
+    def handler(transactions):
+        first_import_id = transactions[0]["import_id"]
+        attempts[first_import_id] += 1
+        if first_import_id == "YNAB:3000:1970-01-01:1":
+            if attempts[first_import_id] == 1:
+                raise ApiException(status=503, reason="Service Unavailable")
+        if first_import_id == "YNAB:5000:1970-01-01:1":
+            raise ApiException(status=400, reason="Bad Request")
+        return _mock_created_response(transactions)
+
+    ynab_post_mocker(handler)
+    transactions = make_transactions(5)
+
+    summary = send_to_ynab(transactions, "01234", "1230", chunk_size=2, retry_delay=0)
+
+    # The 2nd chunk failed once, the 3rd one can't be sent.
+    assert [attempts[transactions[i].import_id] for i in [0, 2, 4]] == [1, 2, 1]
+    assert summary.retries == 1
+    assert not summary.ok
+    assert not push_succeeded(summary)
+    assert summary.created_import_ids == [t.import_id for t in transactions[:4]]
+    assert summary.failed_import_ids == [transactions[4].import_id]
+
+
+def test_get_api_client_is_shared_until_closed():
+    api_client = get_api_client(api_key="1234")
+
+    assert get_api_client(api_key="1234") is api_client
+    assert get_api_client(api_key="5678") is not api_client
+    assert get_api_client(api_key="1234", host="http://localhost") is not api_client
+
+    close_api_clients()
+    assert get_api_client(api_key="1234") is not api_client
+    close_api_clients()
+
+
+def test_get_api_client_keeps_a_connection_per_concurrent_request():
+    api_client = get_api_client(api_key="1234", pool_maxsize=64)
+    assert api_client.configuration.connection_pool_maxsize == 64
+    # Only used when the client is created.
+    assert get_api_client(api_key="1234", pool_maxsize=8) is api_client
+    close_api_clients()
+
+    api_client = get_api_client(api_key="1234")
+    assert api_client.configuration.connection_pool_maxsize >= CONNECTION_POOL_SIZE
+    close_api_clients()
@@ -4,6 +4,7 @@ import socket
 import functools
 import subprocess
 from pathlib import Path
+from datetime import date, timedelta
 
 import pytest
 from flask import request
@@ -12,6 +13,7 @@ import flask.json as flask_json
 from dotenv import load_dotenv
 
 from app import create_app
+from bourso2ynab.transaction import Transaction
 from bourso2ynab.ynab import (
     get_ynab_id,
     get_all_available_usernames,
@@ -23,7 +25,7 @@ from bourso2ynab.ynab import (
 def app(tmpdir):
     app = create_app()
 
-    app.config.update({"TESTING": True})
+    app.config.update({"TESTING": True, "PUSH_JOBS_SYNC": True})
     yield app
 
 
@@ -138,6 +140,54 @@ def ynab_mocker(mocker, ynab_secrets_filepath):
     yield
 
 
+@pytest.fixture
+def make_transactions():
+    """Returns a function that builds `n` distinct transactions: card payments of
+    1.0, 2.0, ... (negated with `debit`) to the payees "P0", "P1", ..., operated
+    `days_apart` days apart from `start`. Each of `fields` overrides an attribute
+    of all the transactions, or of each of them if it is a list."""
+
+    def make(
+        n: int = 3,
+        start: date = date(1970, 1, 1),
+        days_apart: int = 0,
+        debit: bool = False,
+        **fields,
+    ):
+        transactions = []
+        for i in range(n):
+            values = {
+                "type": "CARTE",
+                "date": start + timedelta(days=i * days_apart),
+                "amount": (-1 if debit else 1) * float(i + 1),
+                "payee": f"P{i}",
+            }
+            for key, value in fields.items():
+                values[key] = value[i] if isinstance(value, list) else value
+            transactions.append(Transaction(**values))
+        return transactions
+
+    return make
+
+
+@pytest.fixture
+def ynab_post_mocker(monkeypatch, mocker):
+    """Returns a function that replaces the requests creating transactions in YNAB:
+    `handler` is called with the transactions (dicts) of each request, and returns
+    its response (by default, the transactions themselves)."""
+    monkeypatch.setenv("YNAB_API_KEY", "1234")
+
+    def mock(handler=lambda transactions: transactions):
+        def mock_post_transactions(api_client, budget_id: str, body: bytes, **kwargs):
+            return handler(json.loads(body)["transactions"])
+
+        return mocker.patch(
+            "bourso2ynab.ynab._post_transactions", mock_post_transactions
+        )
+
+    return mock
+
+
 @pytest.fixture
 def env_mocker(mocker):
     def mocked_load_dotenv():
@@ -0,0 +1,212 @@
+"""A local stand-in for the parts of the YNAB API that bourso2ynab uses: creating
+and listing the transactions of an account, and listing payees. It can add latency,
+answer with 429s and report some created transactions as duplicates, so that the
+pushes can be tested (and measured by the benchmarks) offline.
+"""
+
+import time
+import uuid
+import random
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class FakeYnab:
+    """The state of the fake API, and the faults to inject:
+    - `latency`: seconds added to every response;
+    - `error_rate`: probability that a request is answered with a 429, which tells
+      to retry after `retry_after` (whole) seconds;
+    - `duplicate_rate`: probability that a new transaction is reported as a
+      duplicate (as if it had already been imported from somewhere else).
+    Like YNAB, every response tells how much of the `rate_limit` was used
+    (`X-Rate-Limit`)."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        duplicate_rate: float = 0.0,
+        retry_after: int = 0,
+        rate_limit: int = 200,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.duplicate_rate = duplicate_rate
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server_knowledge = 0
+        # Transactions per budget, in order of creation, with the server knowledge
+        # at which they were created.
+        self.transactions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.payees: Dict[str, Dict[str, str]] = defaultdict(dict)
+        # Number of requests per endpoint, and number of 429s.
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.throttled = 0
+
+    def create_app(self) -> Flask:
+        app = Flask(__name__)
+
+        @app.before_request
+        def inject_faults():
+            self.requests[request.endpoint] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                throttled = self._rng.random() < self.error_rate
+                self.throttled += throttled
+            if throttled:
+                response = _error(429, "too_many_requests", "Too many requests")
+                response.headers["Retry-After"] = str(self.retry_after)
+                return response
+
+        @app.after_request
+        def add_rate_limit(response):
+            used = sum(self.requests.values())
+            response.headers["X-Rate-Limit"] = f"{used}/{self.rate_limit}"
+            return response
+
+        @app.post("/budgets/<budget_id>/transactions")
+        def create_transactions(budget_id: str):
+            body = request.get_json()
+            transactions = body.get("transactions") or [body["transaction"]]
+            with self._lock:
+                return (
+                    jsonify(
+                        {"data": self._create_transactions(budget_id, transactions)}
+                    ),
+                    201,
+                )
+
+        @app.get("/budgets/<budget_id>/accounts/<account_id>/transactions")
+        def get_account_transactions(budget_id: str, account_id: str):
+            knowledge = request.args.get("last_knowledge_of_server", 0, type=int)
+            with self._lock:
+                transactions = [
+                    _without_knowledge(t)
+                    for t in self.transactions[budget_id]
+                    if t["account_id"] == account_id and t["knowledge"] > knowledge
+                ]
+                data = {
+                    "transactions": transactions,
+                    "server_knowledge": self.server_knowledge,
+                }
+            return jsonify({"data": data})
+
+        @app.get("/budgets/<budget_id>/payees")
+        def get_payees(budget_id: str):
+            with self._lock:
+                payees = [
+                    {"id": payee_id, "name": name, "deleted": False}
+                    for name, payee_id in self.payees[budget_id].items()
+                ]
+                data = {"payees": payees, "server_knowledge": self.server_knowledge}
+            return jsonify({"data": data})
+
+        return app
+
+    def _create_transactions(
+        self, budget_id: str, transactions: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        existing = {t["import_id"] for t in self.transactions[budget_id]}
+        self.server_knowledge += 1
+        created, duplicate_import_ids = [], []
+        for transaction in transactions:
+            import_id = transaction.get("import_id")
+            if import_id in existing or (
+                import_id and self._rng.random() < self.duplicate_rate
+            ):
+                duplicate_import_ids.append(import_id)
+                continue
+            existing.add(import_id)
+            created.append(self._create_transaction(budget_id, transaction))
+
+        self.transactions[budget_id].extend(created)
+        created = [_without_knowledge(t) for t in created]
+        return {
+            "transaction_ids": [t["id"] for t in created],
+            "transactions": created,
+            "duplicate_import_ids": duplicate_import_ids,
+            "server_knowledge": self.server_knowledge,
+        }
+
+    def _create_transaction(
+        self, budget_id: str, transaction: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        payee_name = transaction.get("payee_name")
+        payee_id = None
+        if payee_name:
+            payee_id = self.payees[budget_id].setdefault(payee_name, uuid.uuid4().hex)
+        return {
+            "id": uuid.uuid4().hex,
+            "date": transaction["date"],
+            "amount": transaction["amount"],
+            "memo": transaction.get("memo"),
+            "cleared": transaction.get("cleared", "uncleared"),
+            "approved": transaction.get("approved", False),
+            "flag_color": None,
+            "account_id": transaction["account_id"],
+            "account_name": "Account",
+            "payee_id": payee_id,
+            "payee_name": payee_name,
+            "category_id": None,
+            "category_name": None,
+            "transfer_account_id": None,
+            "transfer_transaction_id": None,
+            "matched_transaction_id": None,
+            "import_id": transaction.get("import_id"),
+            "deleted": False,
+            "subtransactions": [],
+            "knowledge": self.server_knowledge,
+        }
+
+
+def _without_knowledge(transaction: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in transaction.items() if k != "knowledge"}
+
+
+def _error(status: int, name: str, detail: str):
+    response = jsonify({"error": {"id": str(status), "name": name, "detail": detail}})
+    response.status_code = status
+    return response
+
+
+class FakeYnabServer:
+    """Serves a `FakeYnab` from a background thread, e.g.:
+
+    with FakeYnabServer(FakeYnab(latency=0.1)) as server:
+        send_to_ynab(..., api_client=get_api_client(host=server.url))
+    """
+
+    def __init__(
+        self, fake: Optional[FakeYnab] = None, host: str = "127.0.0.1", port: int = 0
+    ):
+        self.fake = fake or FakeYnab()
+        self._server = make_server(
+            host,
+            port,
+            self.fake.create_app(),
+            threaded=True,
+            request_handler=_QuietRequestHandler,
+        )
+        self.url = f"http://{host}:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeYnabServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._thread.join()
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
@@ -0,0 +1,16 @@
+def original_make_import_ids_unique(transactions):
+    """The original implementation of `make_import_ids_unique`, the reference of its
+    tests and benchmark."""
+    transactions = sorted(transactions, key=lambda t: t.import_id)
+    new_transactions = [transactions[0]]
+
+    for left, right in zip(transactions[:-1], transactions[1:]):
+        if left.import_id != right.import_id:
+            new_transactions.append(right)
+            continue
+
+        new_index = new_transactions[-1].index + 1
+        new_transaction = right.copy_with_new_index(new_index)
+        new_transactions.append(new_transaction)
+
+    return new_transactions